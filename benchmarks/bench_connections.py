@@ -0,0 +1,65 @@
+"""
+obj: count the sqlite connections opened (and time taken) by the queries behind a typical page render,
+with and without the per-thread connection pool. run from the repository root:
+
+    python benchmarks/bench_connections.py --rows 20000 --requests 20
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from synthetic import plaid_frame
+from self_finance.back_end.data import Data
+from self_finance.back_end.date_range import DateRange
+from self_finance.back_end.plot_cache import PlotCache
+from self_finance.back_end.sqlite_helper import SqliteHelper
+from self_finance.constants import BankSchema
+from self_finance.constants import Defaults
+from self_finance.constants import Sqlite
+
+_SQL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sql')
+# the number of plot ids registered in `ImageRegistry`
+_N_PLOTS = 17
+
+
+def simulate_request(db_path):
+    """
+    obj: the queries of a /visuals redraw and render followed by an insights refresh
+    """
+    date_range = DateRange(Defaults.DATE_RANGE_START_DEFAULT, Defaults.DATE_RANGE_END_DEFAULT)
+    for i in range(_N_PLOTS):
+        PlotCache.hit(f'plot {i}', date_range.start, date_range.end, 0, db_path=db_path)
+        Data.get_html_from_id(f'plot {i}', *date_range.key, db_path=db_path)
+    for _ in range(5):
+        Data.get_table_as_df(date_range, BankSchema.BANK_TB_NAME, db_path=db_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, 'bench.db')
+        SqliteHelper.execute_sqlite(os.path.join(_SQL_DIR, 'create_db.sql'), db_path)
+        SqliteHelper.migrate(os.path.join(_SQL_DIR, 'migrations'), db_path)
+        Data.merge(plaid_frame(args.rows, start='2018-01-01', n_days=365 * 2), db_path)
+
+        for pooled in [False, True]:
+            Sqlite.POOL_CONNECTIONS = pooled
+            SqliteHelper.close_all()
+            opened_before = SqliteHelper.connections_opened
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                simulate_request(db_path)
+            seconds = time.perf_counter() - start
+            opened = SqliteHelper.connections_opened - opened_before
+            print(f"{'pooled' if pooled else 'unpooled':>8}: {opened / args.requests:6.1f} connections/request  "
+                  f"{seconds / args.requests * 1000:8.1f} ms/request")
+        SqliteHelper.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+obj: compare the per row python and vectorized implementations of the cumulative sum by group that backs the
+line plots (`_PlotHelper.group_cumsums` and `_PlotHelper.long_form`). run from the repository root:
+
+    python benchmarks/bench_cumsum.py --rows 10000 100000 1000000 --groups 8 50
+"""
+import argparse
+import time
+from collections import defaultdict
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+import synthetic  # noqa: F401 - puts the repository on the path
+from self_finance.back_end.insights._plot import _PlotHelper
+
+
+def legacy_cumsum_by_conditional_group(values, corresponding_categories):
+    """
+    obj: the original per row implementation, kept here as the baseline
+    """
+    unique_groups = list(set(corresponding_categories))
+    group_cumsum, group_curr_cumsum = defaultdict(list), defaultdict(int)
+    for val, cat in zip(values, corresponding_categories):
+        group_curr_cumsum[cat] += val
+        for group in unique_groups:
+            group_cumsum[group].append(group_curr_cumsum[group])
+    return group_cumsum
+
+
+def legacy_long_form(main_df, x, y, hue):
+    df_y, df_hue = list(main_df[y].values), list(main_df[hue].values)
+    cumsum_hue = legacy_cumsum_by_conditional_group(df_y, df_hue)
+    return pd.DataFrame({y: reduce(lambda l1, l2: l1 + l2, cumsum_hue.values()),
+                         hue: reduce(lambda l1, l2: l1 + l2,
+                                     [[group] * len(values) for group, values in cumsum_hue.items()]),
+                         x: list(main_df[x].values) * len(cumsum_hue)})
+
+
+def vectorized_long_form(main_df, x, y, hue):
+    groups, sums = _PlotHelper.group_cumsums(main_df[y].values, main_df[hue].values)
+    return _PlotHelper.long_form(main_df[x].values, groups, sums, x, y, hue)
+
+
+def _frame(n_rows, n_groups, seed=0):
+    rng = np.random.RandomState(seed)
+    dates = pd.date_range('2015-01-01', periods=365 * 4).strftime('%Y-%m-%d')
+    return pd.DataFrame({'date': np.sort(rng.choice(dates, n_rows)),
+                         'amount': rng.randint(-50000, 50000, n_rows) / 100,
+                         'c1': np.array([f'category {i}' for i in range(n_groups)], dtype=object)[
+                             rng.randint(0, n_groups, n_rows)]})
+
+
+def _time(func, df):
+    start = time.perf_counter()
+    out = func(df, 'date', 'amount', 'c1')
+    return time.perf_counter() - start, out
+
+
+def _same(legacy, vectorized):
+    key = ['c1', 'date']
+    vectorized = vectorized.astype({'c1': object})
+    legacy = legacy.sort_values(key, kind='mergesort').reset_index(drop=True)
+    vectorized = vectorized.sort_values(key, kind='mergesort').reset_index(drop=True)
+    return (legacy[key].equals(vectorized[key]) and
+            np.allclose(legacy['amount'].values, vectorized['amount'].values))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--groups', type=int, nargs='+', default=[8, 50])
+    parser.add_argument('--legacy-max-cells', type=int, default=5000000,
+                        help='skip the legacy implementation beyond this many rows x groups')
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'groups':>6} {'legacy':>10} {'vectorized':>11} {'speedup':>8}")
+    for n_rows in args.rows:
+        for n_groups in args.groups:
+            df = _frame(n_rows, n_groups)
+            vectorized_seconds, vectorized = _time(vectorized_long_form, df)
+            if n_rows * n_groups > args.legacy_max_cells:
+                print(f'{n_rows:9d} {n_groups:6d} {"skipped":>10} {vectorized_seconds:10.3f}s {"":>8}')
+                continue
+            legacy_seconds, legacy = _time(legacy_long_form, df)
+            assert _same(legacy, vectorized), 'vectorized output differs from the legacy output'
+            print(f'{n_rows:9d} {n_groups:6d} {legacy_seconds:9.3f}s {vectorized_seconds:10.3f}s '
+                  f'{legacy_seconds / vectorized_seconds:7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+obj: time a full insights refresh (the dynamic and static insights of one date range), as separate `RawInsights`
+calls and as a single `InsightsEngine.run`, and print the engine's timing breakdown per insight. run from the
+repository root:
+
+    python benchmarks/bench_insights.py --rows 20000 100000 --repeat 5
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from synthetic import plaid_frame
+from self_finance.back_end.data import Data
+from self_finance.back_end.date_range import DateRange
+from self_finance.back_end.insights.insights_engine import InsightsEngine
+from self_finance.back_end.insights.raw_insights import RawInsights
+from self_finance.back_end.sqlite_helper import SqliteHelper
+from self_finance.constants import BankSchema
+
+_SQL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sql')
+
+
+def separate_calls(date_range, db_path):
+    """
+    obj: the insights as they were refreshed before the engine, one call per insight
+    """
+    table_name = BankSchema.BANK_TB_NAME
+    return [RawInsights.Dynammic.table_summary_statistics(table_name, date_range, db_path),
+            RawInsights.Dynammic.get_top_n_income_categories(date_range, table_name, db_path=db_path),
+            RawInsights.Dynammic.get_top_n_expense_categories(date_range, table_name, db_path=db_path),
+            RawInsights.Static.get_money_gain_and_spent_this_month_vs_last_month(
+                date_range, table_name, as_dataframe=True, db_path=db_path),
+            RawInsights.Static.summarize_this_and_last_months_spending(date_range, table_name, db_path=db_path)]
+
+
+def _best_of(repeat, func):
+    best, out = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = func()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[20000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = os.path.join(tmpdir, 'bench.db')
+            SqliteHelper.execute_sqlite(os.path.join(_SQL_DIR, 'create_db.sql'), db_path)
+            SqliteHelper.migrate(os.path.join(_SQL_DIR, 'migrations'), db_path)
+            Data.merge(plaid_frame(n_rows), db_path)
+            date_range = DateRange('min', 'max')
+
+            separate_seconds, separate = _best_of(args.repeat, lambda: separate_calls(date_range, db_path))
+            engine_seconds, (results, timings) = _best_of(
+                args.repeat, lambda: InsightsEngine.run(date_range, BankSchema.BANK_TB_NAME, db_path=db_path))
+            SqliteHelper.close_all()
+
+        for expected, actual in zip(separate, results.values()):
+            same = expected.equals(actual) if hasattr(expected, 'equals') else expected == actual
+            assert same, 'the engine differs from the separate calls'
+        print(f'rows: {n_rows}, separate calls: {separate_seconds * 1000:.1f}ms, '
+              f'engine: {engine_seconds * 1000:.1f}ms, {separate_seconds / engine_seconds:.1f}x')
+        for name, seconds in timings.items():
+            print(f'    {name:<40} {seconds * 1000:8.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
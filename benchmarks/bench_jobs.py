@@ -0,0 +1,83 @@
+"""
+obj: how long a request blocks on a plaid sync of every linked item (against `FakePlaidClient`) when the sync runs
+within the request, versus when the request only submits it to `JobRunner`, along with the progress a polling
+page sees and the number of syncs actually run when the same sync is requested several times at once (at most
+one more, for the requests that came in once the first sync was running). run from the repository root:
+
+    python benchmarks/bench_jobs.py --items 4 --rows 5000 --latency 0.1 --requests 5
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+from fake_plaid import FakePlaidClient
+from fake_plaid import plaid_transactions
+from self_finance.back_end.jobs import JobRunner
+from self_finance.back_end.plaid_sync import PlaidSync
+from self_finance.back_end.sqlite_helper import SqliteHelper
+from self_finance.constants import Jobs
+
+_SQL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sql')
+
+
+def _fresh_db(tmpdir, name, items):
+    db_path = os.path.join(tmpdir, f'{name}.db')
+    SqliteHelper.execute_sqlite(os.path.join(_SQL_DIR, 'create_db.sql'), db_path)
+    SqliteHelper.migrate(os.path.join(_SQL_DIR, 'migrations'), db_path)
+    for access_token, (item_id, _) in items.items():
+        PlaidSync.add_item(item_id, access_token, db_path)
+    return db_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=5000, help='transactions per item')
+    parser.add_argument('--latency', type=float, default=0.1, help='seconds per plaid request')
+    parser.add_argument('--requests', type=int, default=5, help='identical sync requests submitted at once')
+    args = parser.parse_args()
+
+    n_days = 365 * 2
+    start = datetime.date.today() - datetime.timedelta(days=n_days)
+    items = {f'token_{i}': (f'item_{i}', plaid_transactions(args.rows, seed=i, start=str(start), n_days=n_days))
+             for i in range(args.items)}
+    client = FakePlaidClient(items, latency=args.latency)
+    print(f'items: {args.items}, transactions: {args.rows} per item, latency per request: {args.latency}s, '
+          f'job workers: {Jobs.WORKERS}')
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = _fresh_db(tmpdir, 'within_request', items)
+        start = time.perf_counter()
+        PlaidSync.sync_all(client, db_path=db_path)
+        print(f'{"sync within the request":<28} blocks {time.perf_counter() - start:8.3f}s')
+
+        db_path = _fresh_db(tmpdir, 'job', items)
+        runs = []
+
+        def sync(job):
+            runs.append(job.id)
+            return PlaidSync.sync_all(client, db_path=db_path, progress=job.progress)
+
+        start = time.perf_counter()
+        jobs = [JobRunner.submit('Syncing transactions', sync, key='plaid_sync') for _ in range(args.requests)]
+        submitted = time.perf_counter() - start
+        fractions = []
+        while not jobs[0].finished:
+            fractions.append(jobs[0].as_dict()['fraction'])
+            time.sleep(Jobs.POLL_MILLISECONDS / 1000.)
+        finished = time.perf_counter() - start
+        jobs[-1].wait()
+        SqliteHelper.close_all()
+
+    assert len({job.id for job in jobs}) == len(runs) <= 2, 'identical syncs were not coalesced'
+    assert all(summary['transactions'] == args.rows for summary in jobs[0].result), jobs[0].result
+    print(f'{"sync as a background job":<28} blocks {submitted:8.3f}s, finished after {finished:.3f}s')
+    print(f'progress seen while polling: {", ".join("?" if f is None else f"{f:.0%}" for f in fractions)}')
+    coalesced = sum(job.coalesced for job in {job.id: job for job in jobs}.values())
+    print(f'{args.requests} identical requests ran {len(runs)} sync ({coalesced} coalesced)')
+
+
+if __name__ == '__main__':
+    main()
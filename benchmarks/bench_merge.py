@@ -0,0 +1,82 @@
+"""
+obj: compare the database writes of the former to_sql/__tmp table merge with the executemany upsert
+engine behind `Data.merge`. both are timed on a fresh database (all inserts) and then again on the same frame (all updates).
+run from the repository root:
+
+    python benchmarks/bench_merge.py --rows 100000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from synthetic import plaid_frame
+from self_finance.back_end.data import Data
+from self_finance.back_end.sqlite_helper import SqliteHelper
+from self_finance.constants import BankSchema
+from self_finance.constants import Schema
+
+_CREATE_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sql', 'create_db.sql')
+
+
+def legacy_write(sub_tables, db_name):
+    """
+    obj: the original sub-table write, kept here as the baseline
+    """
+    tmp_tb_id = '__tmp'
+    conn = None
+    for tb_name, df in sub_tables:
+        if df is not None and df.shape[0] > 0:
+            column_order = Schema.get_names(BankSchema.get_schema_table(tb_name))
+            df = df[column_order]
+            columns_schema = ', '.join(column_order)
+            conn = sqlite3.connect(db_name)
+            df.to_sql(tmp_tb_id, con=conn, if_exists='replace', index=False)
+            merge_query = f'INSERT OR REPLACE INTO {tb_name} ({columns_schema})\n' \
+                f'SELECT * FROM {tmp_tb_id}'
+            conn.execute(merge_query)
+            conn.commit()
+    if conn:
+        conn.close()
+
+
+def upsert_write(sub_tables, db_name):
+    """
+    obj: the write half of `Data.merge`, on a single connection and transaction
+    """
+    key_name = BankSchema.SCHEMA_BANK_TRANSACTION_ID.name
+    conn = sqlite3.connect(db_name)
+    for tb_name, df in sub_tables:
+        column_order = Schema.get_names(BankSchema.get_schema_table(tb_name))
+        df = df.reindex(columns=column_order).drop_duplicates(subset=[key_name], keep='last')
+        SqliteHelper.upsert_many(conn, tb_name, column_order, SqliteHelper.df_to_rows(df), key_name)
+    conn.commit()
+    conn.close()
+
+
+def _time(func, sub_tables, db_name):
+    start = time.perf_counter()
+    func(sub_tables, db_name)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    # preprocessing is shared by both paths, so only the database writes are timed
+    sub_tables = list(Data._split_sub_tables(plaid_frame(args.rows, free_form_date_every=0)))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, func in [('legacy', legacy_write), ('upsert', upsert_write)]:
+            db_name = os.path.join(tmpdir, f'{name}.db')
+            SqliteHelper.execute_sqlite(_CREATE_DB, db_name)
+            insert_seconds = _time(func, sub_tables, db_name)
+            update_seconds = _time(func, sub_tables, db_name)
+            print(f'{name:>6}: insert {insert_seconds:7.3f}s ({args.rows / insert_seconds:10,.0f} rows/s)  '
+                  f'update {update_seconds:7.3f}s ({args.rows / update_seconds:10,.0f} rows/s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+obj: wall-clock of a plaid transaction sync against `FakePlaidClient`, comparing the original sequential sync
+(default page size, one giant frame merged at the end) with `PlaidSync` at a varying number of concurrent
+requests, followed by an incremental re-sync. then every linked item is synced at once (`PlaidSync.sync_all`) at
+a varying number of items in flight, checking that every item's transactions arrived. run from the repository
+root:
+
+    python benchmarks/bench_plaid_sync.py --rows 20000 --latency 0.2 --workers 1 4 8 --items 4 --item-workers 1 4
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from fake_plaid import FakePlaidClient
+from fake_plaid import plaid_transactions
+from self_finance.back_end.data import Data
+from self_finance.back_end.plaid_sync import PlaidSync
+from self_finance.back_end.sqlite_helper import SqliteHelper
+from self_finance.constants import BankSchema
+
+_SQL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sql')
+
+
+def legacy_sync(client, access_token, db_path):
+    """
+    obj: the original sync, pages requested one at a time at the default page size
+    """
+    start_date, end_date = '{:%Y-%m-%d}'.format(datetime.date.min), '{:%Y-%m-%d}'.format(datetime.datetime.now())
+    response = client.Transactions.get(access_token, start_date=start_date, end_date=end_date)
+    transactions = response['transactions']
+    while len(transactions) < response['total_transactions']:
+        response = client.Transactions.get(access_token, start_date=start_date, end_date=end_date,
+                                           offset=len(transactions))
+        transactions.extend(response['transactions'])
+    Data.merge(pd.DataFrame.from_dict(transactions), db_path)
+
+
+def _fresh_db(tmpdir, name):
+    db_path = os.path.join(tmpdir, f'{name}.db')
+    SqliteHelper.execute_sqlite(os.path.join(_SQL_DIR, 'create_db.sql'), db_path)
+    SqliteHelper.migrate(os.path.join(_SQL_DIR, 'migrations'), db_path)
+    return db_path
+
+
+def _timed(client, func):
+    client.requests = 0
+    start = time.perf_counter()
+    out = func()
+    return time.perf_counter() - start, client.requests, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds per plaid request')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--items', type=int, default=4, help='linked items, every one with --rows transactions')
+    parser.add_argument('--item-workers', type=int, nargs='+', default=[1, 4])
+    args = parser.parse_args()
+
+    # transactions up to yesterday, so the incremental re-sync only fetches the `Plaid.SYNC_OVERLAP_DAYS` again
+    n_days = 365 * 2
+    start = datetime.date.today() - datetime.timedelta(days=n_days)
+    items = {f'token_{i}': (f'item_{i}', plaid_transactions(args.rows, seed=i, start=str(start), n_days=n_days))
+             for i in range(max(1, args.items))}
+    client = FakePlaidClient(items, latency=args.latency)
+    print(f'transactions: {args.rows} per item, latency per request: {args.latency}s')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        seconds, requests, _ = _timed(client, lambda: legacy_sync(client, 'token_0', _fresh_db(tmpdir, 'legacy')))
+        print(f'{"sequential (legacy)":<22} {seconds:8.2f}s  {requests:4d} requests')
+        for workers in args.workers:
+            db_path = _fresh_db(tmpdir, f'workers_{workers}')
+            seconds, requests, summary = _timed(client, lambda: PlaidSync.sync(client, 'token_0', workers=workers,
+                                                                                db_path=db_path))
+            assert summary['transactions'] == args.rows, summary
+            print(f'{f"sync, {workers} workers":<22} {seconds:8.2f}s  {requests:4d} requests')
+        seconds, requests, summary = _timed(client, lambda: PlaidSync.sync(client, 'token_0', db_path=db_path))
+        print(f'{"incremental re-sync":<22} {seconds:8.2f}s  {requests:4d} requests  '
+              f'{summary["transactions"]} transactions')
+
+        print(f'\nitems: {len(items)}')
+        for item_workers in args.item_workers:
+            db_path = _fresh_db(tmpdir, f'items_{item_workers}')
+            for access_token, (item_id, _) in items.items():
+                PlaidSync.add_item(item_id, access_token, db_path)
+            seconds, requests, summaries = _timed(client, lambda: PlaidSync.sync_all(
+                client, item_workers=item_workers, db_path=db_path))
+            n_bank_rows = SqliteHelper.query(f'SELECT COUNT(*) FROM {BankSchema.BANK_TB_NAME}', db_path)[0][0]
+            assert all(summary.get('transactions') == args.rows for summary in summaries), summaries
+            assert n_bank_rows == args.rows * len(items), n_bank_rows
+            print(f'{f"sync all, {item_workers} at once":<22} {seconds:8.2f}s  {requests:4d} requests')
+            for summary in summaries:
+                bank_counts = summary['row_counts'][BankSchema.BANK_TB_NAME]
+                print(f'    {summary["item_id"]:<10} {summary["seconds"]:8.2f}s  {bank_counts.get("inserted", 0):6d} '
+                      f'inserted  {bank_counts.get("updated", 0):6d} updated')
+        SqliteHelper.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+obj: cost of the first /visuals redraw after a change of the data, with and without `PlotWarmer` drawing the plots
+ahead of time. a few merges (as the pages of a sync would) are followed by a redraw of the default and of the
+recently drawn date ranges, and the warmer's own report (plots drawn and seconds) is printed. run from the
+repository root:
+
+    python benchmarks/bench_plot_warm.py --rows 20000 --merges 3
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+from synthetic import plaid_frame
+from self_finance.back_end.data import Data
+from self_finance.back_end.date_range import DateRange
+from self_finance.back_end.insights.image_registry import ImageRegistry
+from self_finance.back_end.insights.plot_warmer import PlotWarmer
+from self_finance.back_end.jobs import JobRunner
+from self_finance.back_end.sqlite_helper import SqliteHelper
+from self_finance.constants import BankSchema
+from self_finance.constants import Visuals
+
+_SQL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sql')
+
+
+def _fresh_db(tmpdir, name):
+    db_path = os.path.join(tmpdir, f'{name}.db')
+    SqliteHelper.execute_sqlite(os.path.join(_SQL_DIR, 'create_db.sql'), db_path)
+    SqliteHelper.migrate(os.path.join(_SQL_DIR, 'migrations'), db_path)
+    return db_path
+
+
+def _merge_in_pages(frame, merges, db_path):
+    page_rows = -(-frame.shape[0] // merges)
+    for i in range(0, frame.shape[0], page_rows):
+        Data.merge(frame.iloc[i:i + page_rows].copy(), db_path)
+
+
+def _redraw(db_path):
+    """
+    obj: what the visuals page draws after the change, every range the warmer would draw
+    :return: (float, int) - seconds and plots drawn
+    """
+    start, n_plots = time.perf_counter(), 0
+    for start_date, end_date, plot_ids in PlotWarmer.ranges():
+        df = Data.get_table_as_df(DateRange(start_date, end_date), BankSchema.BANK_TB_NAME, db_path=db_path)
+        n_plots += ImageRegistry.plot_all(plot_ids, df, start_date, end_date, db_path=db_path)
+    return time.perf_counter() - start, n_plots
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--merges', type=int, default=3, help='merges the rows are split into')
+    parser.add_argument('--quiet-seconds', type=float, default=0.5, help='`Visuals.PLOT_WARM_QUIET_SECONDS`')
+    args = parser.parse_args()
+    Visuals.PLOT_WARM_QUIET_SECONDS = args.quiet_seconds
+
+    n_days = 365 * 2
+    start = datetime.date.today() - datetime.timedelta(days=n_days)
+    frame = plaid_frame(args.rows, start=str(start), n_days=n_days, free_form_date_every=None)
+    plot_ids = ImageRegistry.get_all_plot_ids()
+    PlotWarmer.record('1 year ago', 'today', plot_ids)
+    print(f'rows: {args.rows}, merges: {args.merges}, date ranges: {len(PlotWarmer.ranges())}, '
+          f'plots per range: {len(plot_ids)}')
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = _fresh_db(tmpdir, 'cold')
+        _merge_in_pages(frame, args.merges, db_path)
+        seconds, n_plots = _redraw(db_path)
+        print(f'{"redraw, cold cache":<24} {seconds:8.2f}s  {n_plots:3d} plots drawn')
+
+        db_path = _fresh_db(tmpdir, 'warm')
+        changes = []
+        Data.add_change_listener(changes.append)
+        Data.add_change_listener(PlotWarmer.schedule)
+        _merge_in_pages(frame, args.merges, db_path)
+        PlotWarmer.wait_idle(db_path)
+        seconds, n_plots = _redraw(db_path)
+        runs = [job.result for job in JobRunner._jobs.values() if job.key == PlotWarmer._key(db_path)]
+        print(f'{"warmer":<24} {sum(stats["seconds"] for stats in runs):8.2f}s  '
+              f'{sum(stats["plots"] for stats in runs):3d} plots drawn in {len(runs)} job(s) for {len(changes)} '
+              f'changes')
+        print(f'{"redraw, warmed cache":<24} {seconds:8.2f}s  {n_plots:3d} plots drawn')
+        SqliteHelper.close_all()
+    assert n_plots == 0, 'the warmed redraw missed the plot cache'
+
+
+if __name__ == '__main__':
+    main()
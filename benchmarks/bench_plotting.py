@@ -0,0 +1,49 @@
+"""
+obj: wall-clock of a full /visuals redraw (every matplotlib plot, bypassing the plot cache) with a varying
+number of rendering processes. the spending heatmap is left out since it reads the database rather than the
+frame. run from the repository root:
+
+    python benchmarks/bench_plotting.py --rows 20000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from synthetic import plaid_frame
+from self_finance.back_end.data import Data
+from self_finance.back_end.insights.image_registry import ImageRegistry
+from self_finance.back_end.sqlite_helper import SqliteHelper
+from self_finance.constants import BankSchema
+
+_SQL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sql')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, 'bench.db')
+        SqliteHelper.execute_sqlite(os.path.join(_SQL_DIR, 'create_db.sql'), db_path)
+        SqliteHelper.migrate(os.path.join(_SQL_DIR, 'migrations'), db_path)
+        Data.merge(plaid_frame(args.rows), db_path)
+        df = Data.get_table_as_df(None, BankSchema.BANK_TB_NAME, db_path=db_path)
+        SqliteHelper.close_all()
+
+    plot_ids = [plt_id for plt_id in ImageRegistry.get_all_plot_ids() if ImageRegistry._parse_plot_id(plt_id)[1]]
+    start_date, end_date = df[BankSchema.SCHEMA_BANK_DATE.name].min(), df[BankSchema.SCHEMA_BANK_DATE.name].max()
+    print(f'rows: {df.shape[0]}, plots: {len(plot_ids)}')
+    baseline = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        rendered = ImageRegistry.render_all(plot_ids, df, start_date, end_date, workers=workers)
+        seconds = time.perf_counter() - start
+        baseline = baseline or seconds
+        print(f'{workers:3d} workers: {seconds:8.2f}s  {len(rendered):3d} plots  {baseline / seconds:5.1f}x')
+
+
+if __name__ == '__main__':
+    main()
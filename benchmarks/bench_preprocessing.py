@@ -0,0 +1,65 @@
+"""
+obj: compare the row-wise and columnar implementations of `Data._column_preprocessing_pt2`
+on a synthetic plaid export. run from the repository root:
+
+    python benchmarks/bench_preprocessing.py --rows 100000
+"""
+import argparse
+import time
+
+import dateparser
+
+from synthetic import plaid_frame
+from self_finance.back_end.data import Data
+from self_finance.constants import BankSchema
+
+
+def legacy_column_preprocessing_pt2(df):
+    """
+    obj: the original row-wise implementation, kept here as the baseline
+    """
+    df[BankSchema.SCHEMA_BANK_DATE.name] = df.apply(
+        lambda row: dateparser.parse(row[BankSchema.SCHEMA_BANK_DATE.name]).date(), axis=1)
+    df[BankSchema.SCHEMA_BANK_AMOUNT.name] = df[BankSchema.SCHEMA_BANK_AMOUNT.name] * -1
+    df[BankSchema.SCHEMA_BANK_INC_OR_EXP.name] = df.apply(lambda row: 'expense' if
+    row[BankSchema.SCHEMA_BANK_AMOUNT.name] < 0 else 'income', axis=1)
+    list_categories = [eval(elm) if isinstance(elm, str) else elm for elm in
+                       list(df[BankSchema.SCHEMA_FULL_CATEGORY.name])]
+
+    def add_category_col_to_db(cat_name, cat_index):
+        df[cat_name] = [c[cat_index] if cat_index < len(c) else None for c in list_categories]
+
+    cat_cols = [BankSchema.SCHEMA_BANK_C1.name, BankSchema.SCHEMA_BANK_C2.name, BankSchema.SCHEMA_BANK_C3.name]
+    for cat_name, i in zip(cat_cols, range(len(cat_cols))):
+        add_category_col_to_db(cat_name, i)
+    return df
+
+
+def _time(func, df):
+    start = time.perf_counter()
+    out = func(df.copy())
+    return time.perf_counter() - start, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    df = plaid_frame(args.rows)
+    legacy_seconds, legacy_df = _time(legacy_column_preprocessing_pt2, df)
+    columnar_seconds, columnar_df = _time(Data._column_preprocessing_pt2, df)
+
+    columns = [BankSchema.SCHEMA_BANK_DATE.name, BankSchema.SCHEMA_BANK_AMOUNT.name,
+               BankSchema.SCHEMA_BANK_INC_OR_EXP.name, BankSchema.SCHEMA_BANK_C1.name,
+               BankSchema.SCHEMA_BANK_C2.name, BankSchema.SCHEMA_BANK_C3.name]
+    assert legacy_df[columns].equals(columnar_df[columns]), 'columnar output differs from the legacy output'
+
+    print(f'rows: {args.rows}')
+    print(f'legacy:   {legacy_seconds:8.3f}s  {args.rows / legacy_seconds:12,.0f} rows/s')
+    print(f'columnar: {columnar_seconds:8.3f}s  {args.rows / columnar_seconds:12,.0f} rows/s')
+    print(f'speedup:  {legacy_seconds / columnar_seconds:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
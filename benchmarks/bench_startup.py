@@ -0,0 +1,82 @@
+"""
+obj: startup time of `self-finance` (everything `run_app` does before the server binds its port) on a database
+of the given size, along with the sqlite connections opened by importing the routes (none are expected, the
+route states are only computed on their first request) and the time of those first requests. the app is
+started from a fresh interpreter in a scratch directory, since the database path is relative to the working
+directory. run from the repository root:
+
+    python benchmarks/bench_startup.py --rows 100000
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from synthetic import plaid_frame
+from self_finance.back_end.data import Data
+from self_finance.back_end.sqlite_helper import SqliteHelper
+from self_finance.constants import App
+from self_finance.constants import BankSchema
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# note: runs within the scratch directory, prints its timings as json
+_STARTUP = """
+import json
+import time
+
+start = time.perf_counter()
+from self_finance.back_end.sqlite_helper import SqliteHelper
+from self_finance.front_end import app
+imported = time.perf_counter()
+connections = SqliteHelper.connections_opened
+from self_finance.app_setup import init_all
+init_all()
+initialized = time.perf_counter()
+
+first_requests = {}
+with app.test_client() as client:
+    for route in ('/data', '/insights'):
+        request_start = time.perf_counter()
+        client.get(route)
+        first_requests[route] = time.perf_counter() - request_start
+print(json.dumps({'import': imported - start, 'init': initialized - imported, 'connections': connections,
+                  'first_requests': first_requests}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        shutil.copytree(os.path.join(_ROOT, 'sql'), os.path.join(tmpdir, 'sql'),
+                        ignore=shutil.ignore_patterns(f'{BankSchema.BASE_DB_NAME}*'))
+        shutil.copytree(os.path.join(_ROOT, 'config'), os.path.join(tmpdir, 'config'))
+        db_path = os.path.join(tmpdir, 'sql', BankSchema.BASE_DB_NAME)
+        SqliteHelper.execute_sqlite(os.path.join(tmpdir, 'sql', 'create_db.sql'), db_path)
+        SqliteHelper.migrate(os.path.join(tmpdir, 'sql', 'migrations'), db_path)
+        Data.merge(plaid_frame(args.rows), db_path)
+        SqliteHelper.close_all()
+
+        env = dict(os.environ, PYTHONPATH=_ROOT)
+        # note: the index routes read the plaid credentials at import, any value will do here
+        for key in (App.PLAID_CLIENT_ID_ENV_VAR_KEY, App.PLAID_PUBLIC_KEY_ENV_VAR_KEY, App.PLAID_SECRET_ENV_VAR_KEY):
+            env.setdefault(key, 'benchmark')
+        out = subprocess.run([sys.executable, '-c', _STARTUP], cwd=tmpdir, env=env, check=True,
+                             stdout=subprocess.PIPE).stdout
+        timings = json.loads(out.decode().strip().splitlines()[-1])
+
+    print(f'rows: {args.rows}')
+    print(f"import routes: {timings['import']:8.3f}s  ({timings['connections']} sqlite connections opened)")
+    print(f"init_all:      {timings['init']:8.3f}s")
+    for route, seconds in timings['first_requests'].items():
+        print(f'first {route:<8} {seconds:8.3f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+obj: in process stand-in for `plaid.Client` that serves synthetic, paginated transaction responses of any number
+of items (keyed by their access token) with a simulated round trip latency, so the plaid sync can be benchmarked
+without the plaid sandbox
+"""
+import ast
+import threading
+import time
+
+from synthetic import plaid_frame
+from self_finance.constants import BankSchema
+
+# most transactions plaid returns per request
+_MAX_COUNT = 500
+
+
+class _FakeItem:
+    def __init__(self, client):
+        self._client = client
+
+    def get(self, access_token):
+        self._client._request()
+        return {'item': {'item_id': self._client.items[access_token][0]}}
+
+
+class _FakeTransactions:
+    def __init__(self, client):
+        self._client = client
+
+    def get(self, access_token, start_date, end_date, account_ids=None, count=100, offset=0):
+        if count > _MAX_COUNT:
+            raise ValueError(f'count must be at most {_MAX_COUNT}')
+        self._client._request()
+        item_id, transactions = self._client.items[access_token]
+        matched = [t for t in transactions if start_date <= t['date'] <= end_date]
+        return {'transactions': matched[offset:offset + count], 'total_transactions': len(matched),
+                'item': {'item_id': item_id}}
+
+
+class FakePlaidClient:
+    def __init__(self, items, latency=0.05):
+        """
+        :param items: dict - access token to the item id and its transactions in the shape of the plaid api
+        :param latency: float - seconds every request takes
+        """
+        # note: like plaid, newest transactions first
+        self.items = {access_token: (item_id, sorted(transactions, key=lambda t: (t['date'], t['transaction_id']),
+                                                     reverse=True))
+                      for access_token, (item_id, transactions) in items.items()}
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.Item = _FakeItem(self)
+        self.Transactions = _FakeTransactions(self)
+
+    def _request(self):
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency)
+
+
+def plaid_transactions(n_rows, seed=0, start='2015-01-01', n_days=365 * 4):
+    """
+    obj: synthetic transactions as the plaid api returns them, nested fields as python objects
+    """
+    df = plaid_frame(n_rows, seed=seed, start=start, n_days=n_days, free_form_date_every=0)
+    nested = [BankSchema.SCHEMA_FULL_CATEGORY.name, BankSchema.SCHEMA_FULL_LOCATION.name,
+              BankSchema.SCHEMA_FULL_PAYMENT_META.name]
+    transactions = df.to_dict('records')
+    for transaction in transactions:
+        for column in nested:
+            transaction[column] = ast.literal_eval(transaction[column])
+        transaction[BankSchema.SCHEMA_FULL_CATEGORY_ID.name] = str(transaction[BankSchema.SCHEMA_FULL_CATEGORY_ID.name])
+    return transactions
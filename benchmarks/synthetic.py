@@ -0,0 +1,63 @@
+"""
+obj: synthetic plaid shaped data shared by the benchmarks
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from self_finance.constants import BankSchema
+
+CATEGORIES = [
+    ['Food and Drink', 'Restaurants'],
+    ['Food and Drink', 'Restaurants', 'Coffee Shop'],
+    ['Shops', 'Supermarkets and Groceries'],
+    ['Travel', 'Airlines and Aviation Services'],
+    ['Transfer', 'Payroll'],
+    ['Payment', 'Credit Card'],
+    ['Recreation', 'Gyms and Fitness Centers'],
+    ['Service', 'Utilities'],
+]
+
+
+def plaid_frame(n_rows, seed=0, start='2015-01-01', n_days=365 * 4, free_form_date_every=1000):
+    """
+    obj: frame in the full plaid schema, as it looks after being read back from a csv export
+    (nested columns are python literal strings)
+    """
+    random.seed(seed)
+    rng = np.random.RandomState(seed)
+    start = pd.Timestamp(start)
+    days = rng.randint(0, n_days, size=n_rows)
+    dates = [BankSchema.DATE_FORMAT.format(start + pd.Timedelta(days=int(d))) for d in days]
+    # sprinkle in a few free form dates so the dateparser fallback path is exercised
+    if free_form_date_every:
+        for i in range(0, n_rows, free_form_date_every):
+            dates[i] = 'March 3, 2017'
+    lats, lons = rng.uniform(32, 42, size=n_rows).round(4), rng.uniform(-124, -114, size=n_rows).round(4)
+    return pd.DataFrame({
+        BankSchema.SCHEMA_FULL_ACCOUNT_ID.name: [f'account_{i % 3}' for i in range(n_rows)],
+        BankSchema.SCHEMA_FULL_ACCOUNT_OWNER.name: None,
+        BankSchema.SCHEMA_FULL_AMOUNT.name: rng.normal(0, 200, size=n_rows).round(2),
+        BankSchema.SCHEMA_FULL_CATEGORY.name: [str(random.choice(CATEGORIES)) for _ in range(n_rows)],
+        BankSchema.SCHEMA_FULL_CATEGORY_ID.name: rng.randint(10000000, 20000000, size=n_rows),
+        BankSchema.SCHEMA_FULL_DATE.name: dates,
+        BankSchema.SCHEMA_FULL_ISO_CURRENCY_CODE.name: 'USD',
+        BankSchema.SCHEMA_FULL_LOCATION.name: [
+            str({'address': None, 'city': 'San Francisco', 'lat': None if i % 5 == 0 else lat, 'lon': lon,
+                 'state': 'CA', 'store_number': None, 'zip': None})
+            for i, (lat, lon) in enumerate(zip(lats, lons))],
+        BankSchema.SCHEMA_FULL_NAME.name: [f'merchant {i % 250}' for i in range(n_rows)],
+        BankSchema.SCHEMA_FULL_PAYMENT_META.name: str(
+            {'by_order_of': None, 'payee': None, 'payer': None, 'payment_method': None,
+             'payment_processor': None, 'ppd_id': None, 'reason': None, 'reference_number': None}),
+        BankSchema.SCHEMA_FULL_PENDING.name: False,
+        BankSchema.SCHEMA_FULL_PENDING_TRANSACTION_ID.name: None,
+        BankSchema.SCHEMA_FULL_TRANSACTION_ID.name: [f'txn_{seed}_{i}' for i in range(n_rows)],
+        BankSchema.SCHEMA_FULL_TRANSACTION_TYPE.name: 'place',
+        BankSchema.SCHEMA_FULL_UNOFFICIAL_CURRENCY_CODE.name: None,
+    })
@@ -13,6 +13,7 @@ dirs = utils.SelfReferentialDict({
     'models': join('{static}', 'models'),
     'insights': join('{static}', 'insights'),
     'logs': join(ROOT, 'logs'),
+    'migrations': join(ROOT, 'sql', 'migrations'),
     'template_folder': join(ROOT, os.path.join('self_finance', 'front_end', 'templates'))
 })
 
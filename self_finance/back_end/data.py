@@ -1,20 +1,50 @@
 import logging
 import re
-import sqlite3
+import threading
+from collections import Counter
+from collections import defaultdict
 
-import dateparser
+import numpy as np
 import pandas as pd
 from pandas.io.json import json_normalize
 
+from config.files import dirs
 from config.files import files
+from self_finance.back_end.data_version import DataVersion
+from self_finance.back_end.plot_cache import PlotCache
+from self_finance.back_end.preprocess import Preprocess
+from self_finance.back_end.query import Query
+from self_finance.back_end.rollup import Rollup
 from self_finance.back_end.sqlite_helper import SqliteHelper
 from self_finance.constants import BankSchema
+from self_finance.constants import Data as ConstData
 from self_finance.constants import Schema
 
 logger = logging.getLogger(__name__)
 
 
 class Data:
+    # serializes the writes to the bank tables of this process. they read (e.g. the rollup days) before they
+    # write, and sqlite fails rather than waits when two such transactions upgrade to writing at the same time
+    _write_lock = threading.RLock()
+    # called with the database path after every committed change of the bank data, see `add_change_listener`
+    _change_listeners = []
+
+    @staticmethod
+    def add_change_listener(listener):
+        """
+        obj: have `listener` called with the database path once a change of the bank data has been committed
+        """
+        Data._change_listeners.append(listener)
+
+    @staticmethod
+    def _notify_change(db_path):
+        for listener in Data._change_listeners:
+            try:
+                listener(db_path)
+            except Exception:
+                logger.exception(f'Data change listener {listener} failed.')
+
     @staticmethod
     def _column_preprocessing_pt1(df):
         """
@@ -32,24 +62,17 @@ class Data:
         obj: when a new table comes in, preprocess the columns that are generally not
         changed by the user, such as converting the date column into a standard readable format
         """
-        df[BankSchema.SCHEMA_BANK_DATE.name] = df.apply(
-            lambda row: dateparser.parse(row[BankSchema.SCHEMA_BANK_DATE.name]).date(), axis=1)
+        df[BankSchema.SCHEMA_BANK_DATE.name] = Preprocess.parse_dates(df[BankSchema.SCHEMA_BANK_DATE.name])
         # counter intuitive :: - == income and + == expense, so reverse it
         df[BankSchema.SCHEMA_BANK_AMOUNT.name] = df[BankSchema.SCHEMA_BANK_AMOUNT.name] * -1
-        df[BankSchema.SCHEMA_BANK_INC_OR_EXP.name] = df.apply(lambda row: 'expense' if
-        row[BankSchema.SCHEMA_BANK_AMOUNT.name] < 0 else 'income', axis=1)
+        df[BankSchema.SCHEMA_BANK_INC_OR_EXP.name] = Preprocess.inc_or_exp(df[BankSchema.SCHEMA_BANK_AMOUNT.name])
 
         # add additional columns if they are missing
         # note the caveat - when the dataframe source comes from a csv, it needs to be reevaluated
-        list_categories = [eval(elm) if isinstance(elm, str) else elm for elm in
-                           list(df[BankSchema.SCHEMA_FULL_CATEGORY.name])]
-
-        def add_category_col_to_db(cat_name, cat_index):
-            df[cat_name] = [c[cat_index] if cat_index < len(c) else None for c in list_categories]
-
         cat_cols = [BankSchema.SCHEMA_BANK_C1.name, BankSchema.SCHEMA_BANK_C2.name, BankSchema.SCHEMA_BANK_C3.name]
-        for cat_name, i in zip(cat_cols, range(len(cat_cols))):
-            add_category_col_to_db(cat_name, i)
+        split_categories = Preprocess.split_categories(df[BankSchema.SCHEMA_FULL_CATEGORY.name], len(cat_cols))
+        for cat_name, cat_values in zip(cat_cols, split_categories):
+            df[cat_name] = cat_values
         return df
 
     @staticmethod
@@ -60,19 +83,16 @@ class Data:
         return df_bank
 
     @staticmethod
-    def merge(csv_path_or_df, db_name=files['base_db']):
+    def _split_sub_tables(tmp_df):
         """
-        obj: inner join chase csv expenses with current database, updating it in the process
+        obj: break an incoming frame into the frames of the location, payment_meta and bank tables
         """
-        # read static and add additional columns to match schema
-        tmp_df = pd.read_csv(csv_path_or_df, index_col=False) if isinstance(csv_path_or_df, str) else csv_path_or_df
-
         # grab other sub-tables
         def eval_json_and_add_transaction_id(column_pull):
-            data_column = list(tmp_df[column_pull])
-            data_column_evaled = [eval(d) if isinstance(d, str) else d for d in data_column]
+            data_column_evaled = Preprocess.parse_literals(tmp_df[column_pull])
             df = json_normalize(data_column_evaled)
-            df[BankSchema.SCHEMA_BANK_TRANSACTION_ID.name] = tmp_df[BankSchema.SCHEMA_BANK_TRANSACTION_ID.name]
+            # note: by value, since the index of a chunk does not necessarily start at zero
+            df[BankSchema.SCHEMA_BANK_TRANSACTION_ID.name] = tmp_df[BankSchema.SCHEMA_BANK_TRANSACTION_ID.name].values
             return df
 
         # if this is an update for example, the user will be working with the the public table
@@ -88,31 +108,83 @@ class Data:
         else:
             # otherwise this is an update operatation
             bank_df = tmp_df
-        # merge the static and close the connection
-        tmp_tb_id = '__tmp'
-        conn = None
         inline_tb_names = [BankSchema.LOCATION_TB_NAME, BankSchema.PAYMENT_META_TB_NAME, BankSchema.BANK_TB_NAME]
-        for df, tb_name in zip([locations_df, payment_meta_df, bank_df], inline_tb_names):
+        return zip(inline_tb_names, [locations_df, payment_meta_df, bank_df])
+
+    @staticmethod
+    def _merge_frame(conn, tmp_df):
+        """
+        obj: upsert a single frame through an open connection, the caller owns the transaction
+        :return: dict - inserted and updated row counts per table
+        """
+        row_counts = {}
+        key_name = BankSchema.SCHEMA_BANK_TRANSACTION_ID.name
+        for tb_name, df in Data._split_sub_tables(tmp_df):
             if df is not None and df.shape[0] > 0:
+                # rearrange columns to match schema, last occurrence of a transaction wins
                 column_order = Schema.get_names(BankSchema.get_schema_table(tb_name))
-                df = df[column_order]
-                columns_schema = ', '.join(column_order)
-                conn = sqlite3.connect(db_name)
-                df.to_sql(tmp_tb_id, con=conn, if_exists='replace', index=False)
-                # rearrange columns to match schema
-                merge_query = f'INSERT OR REPLACE INTO {tb_name} ({columns_schema})\n' \
-                    f'SELECT * FROM {tmp_tb_id}'
-                conn.execute(merge_query)
-                conn.commit()
-        if conn:
-            conn.close()
+                df = df.reindex(columns=column_order).drop_duplicates(subset=[key_name], keep='last')
+                is_bank = tb_name == BankSchema.BANK_TB_NAME
+                if is_bank:
+                    # dates are stored as iso strings so they can be range filtered through an index
+                    date_col = BankSchema.SCHEMA_BANK_DATE.name
+                    df[date_col] = Preprocess.iso_dates(df[date_col])
+                    # updated transactions may move away from the days they currently fall on
+                    affected_days = Rollup.days_of(conn, df[key_name].values)
+                inserted, updated = SqliteHelper.upsert_many(conn, tb_name, column_order, SqliteHelper.df_to_rows(df),
+                                                             key_name)
+                if is_bank:
+                    Rollup.refresh_days(conn, affected_days | set(df[date_col].values))
+                row_counts[tb_name] = {'inserted': inserted, 'updated': updated}
+        return row_counts
+
+    @staticmethod
+    def merge(csv_path_or_df, db_name=files['base_db']):
+        """
+        obj: inner join chase csv expenses with current database, updating it in the process
+        :return: dict - inserted and updated row counts per table
+        """
+        # read static and add additional columns to match schema
+        tmp_df = pd.read_csv(csv_path_or_df, index_col=False) if isinstance(csv_path_or_df, str) else csv_path_or_df
+
+        with Data._write_lock, SqliteHelper.transaction(db_name) as conn:
+            row_counts = Data._merge_frame(conn, tmp_df)
+            DataVersion.bump(conn)
+        Data._notify_change(db_name)
+        return row_counts
+
+    @staticmethod
+    def merge_stream(csv_path_or_buffer, db_name=files['base_db'], chunk_size=ConstData.IMPORT_CHUNK_ROWS,
+                     progress=None):
+        """
+        obj: streaming version of `merge` for large csv files. the file is read and preprocessed in
+        chunks of `chunk_size` rows so peak memory is independent of the file size, and every chunk
+        is written within a single transaction so a failure half way through leaves the database untouched
+        :param progress: callable - called with the number of rows merged so far after every chunk
+        :return: dict - inserted and updated row counts per table
+        """
+        row_counts, n_rows = defaultdict(Counter), 0
+        with Data._write_lock, SqliteHelper.transaction(db_name) as conn:
+            for i, chunk in enumerate(pd.read_csv(csv_path_or_buffer, index_col=False, chunksize=chunk_size)):
+                for tb_name, counts in Data._merge_frame(conn, chunk).items():
+                    row_counts[tb_name].update(counts)
+                n_rows += chunk.shape[0]
+                logger.info(f'Merged chunk {i + 1} ({n_rows} rows read so far).')
+                if progress is not None:
+                    progress(n_rows)
+            DataVersion.bump(conn)
+        Data._notify_change(db_name)
+        row_counts = {tb_name: dict(counts) for tb_name, counts in row_counts.items()}
+        logger.info(f'Finished streaming merge of {n_rows} rows: {row_counts}.')
+        return row_counts
 
     @staticmethod
     def create_base_db():
         """
-        obj: create standard base database
+        obj: create standard base database and bring its schema up to date
         """
         SqliteHelper.execute_sqlite(files['create_db'], files['base_db'])
+        SqliteHelper.migrate(dirs['migrations'], files['base_db'])
 
     @staticmethod
     def truncate(table_name):
@@ -120,12 +192,30 @@ class Data:
         obj: drop table in database
         """
         query = f"DELETE FROM {table_name};"
+        if table_name == BankSchema.BANK_TB_NAME:
+            query += f"DELETE FROM {BankSchema.BANK_DAILY_TB_NAME};"
         SqliteHelper.execute_sqlite(query, files['base_db'])
+        if table_name == BankSchema.PLOT_CACHE_TB_NAME:
+            PlotCache.invalidate_memory()
 
     @staticmethod
     def truncate_all_tables():
         for table in BankSchema.get_all_table_names():
             Data.truncate(table)
+        with Data._write_lock, SqliteHelper.transaction(files['base_db']) as conn:
+            DataVersion.bump(conn)
+        Data._notify_change(files['base_db'])
+
+    @staticmethod
+    def _table_query(date_range, table_name, order_by_col_name=BankSchema.SCHEMA_BANK_DATE.name, order='DESC'):
+        """
+        obj: parameterized query behind `get_table_as_df`
+        :return: (str, tuple) - query and its parameters
+        """
+        between = BankSchema.SCHEMA_BANK_DATE.name if date_range else None
+        params = (str(date_range.start), str(date_range.end)) if date_range else ()
+        return Query.select(table_name, between=between, order_by=order_by_col_name if order else None,
+                            order=order), params
 
     @staticmethod
     def get_table_as_df(date_range, table_name, order_by_col_name=BankSchema.SCHEMA_BANK_DATE.name,
@@ -134,87 +224,200 @@ class Data:
         obj: a common request for the application. get a table from base db using two high
         level parameters
         """
-        query_select = f"SELECT * FROM {table_name}\n"
-        query_where = f"WHERE DATE({BankSchema.SCHEMA_BANK_DATE.name}) BETWEEN " \
-            f"'{date_range.start}' AND '{date_range.end}'\n" if date_range else ''
-        query_order = f"ORDER BY {order_by_col_name} {order}" if order else ''
-        query = query_select + query_where + query_order
-
         # this is useful in the scenario of not breaking down the app if there
         # is no database to begin with (static initializers in /front_end/routes.py)
         try:
-            return SqliteHelper.execute_sqlite(query, db_path, as_dataframe=True)
+            query, params = Data._table_query(date_range, table_name, order_by_col_name, order)
+            return SqliteHelper.query(query, db_path, params, as_dataframe=True)
         except Exception:
             return None
 
     @staticmethod
-    def get_missing_categories(as_dataframe=True):
+    def get_table_page(date_range, table_name, order_by_col_name=BankSchema.SCHEMA_BANK_DATE.name, order='DESC',
+                       after=None, page_size=ConstData.TABLE_PAGE_ROWS, db_path=files['base_db']):
         """
-        obj: identify unlabeled data
+        obj: a single page of `get_table_as_df`, found by its position (keyset pagination) rather than an offset
+        so that every page costs the same regardless of how deep it is
+        :param after: list - [order by value, transaction id] of the last row of the previous page, None for the
+        first page
+        :return: dict - the column names, the rows (lists in the column order), and the `after` of the next page
+        (None if this is the last page)
         """
-        query = f"SELECT * FROM {BankSchema.BANK_TB_NAME}\n" \
-            f"WHERE {BankSchema.SCHEMA_BANK_C1.name} IS NULL OR {BankSchema.SCHEMA_BANK_C2.name}=''"
-        return SqliteHelper.execute_sqlite(query, files['base_db'], as_dataframe=as_dataframe)
+        key_name = BankSchema.SCHEMA_BANK_TRANSACTION_ID.name
+        columns = tuple(Schema.get_names(BankSchema.get_schema_table(table_name)))
+        position, bounds, params = None, (str(date_range.start), str(date_range.end)) if date_range else (), ()
+        if after is not None:
+            after_value, after_key = after
+            position = 'null' if after_value is None else 'value'
+            params = (after_key,) if after_value is None else (after_value, after_value, after_value, after_key)
+            # note: sqlite bounds an index range by only one of several bounds on the same side, so the position
+            # narrows the dates of the range itself rather than being left to a second bound
+            if bounds and after_value is not None and order_by_col_name == BankSchema.SCHEMA_BANK_DATE.name:
+                descending = (order or 'ASC').upper() == 'DESC'
+                bounds = (bounds[0], min(bounds[1], after_value)) if descending else \
+                    (max(bounds[0], after_value), bounds[1])
+        params = bounds + params
+        query = Query.page(table_name, order_by_col_name, key_name, order, columns=columns,
+                           between=BankSchema.SCHEMA_BANK_DATE.name if date_range else None, after=position,
+                           limit=page_size)
+        rows = [list(row) for row in SqliteHelper.query(query, db_path, params)]
+        next_after = None
+        if len(rows) == page_size:
+            last = dict(zip(columns, rows[-1]))
+            next_after = [last[order_by_col_name], last[key_name]]
+        return {'columns': list(columns), 'rows': rows, 'after': next_after}
 
     @staticmethod
-    def update_missing_categories(filled_list_dict, cat_ids, pk_ids):
+    def count_rows(date_range, table_name, db_path=files['base_db']):
         """
-        obj: build a query to update the missing categories in the database
+        obj: number of rows of `get_table_as_df`, without reading them
         """
+        between = BankSchema.SCHEMA_BANK_DATE.name if date_range else None
+        params = (str(date_range.start), str(date_range.end)) if date_range else ()
+        try:
+            return SqliteHelper.query(Query.select(table_name, columns=('COUNT(*)',), between=between),
+                                      db_path, params)[0][0]
+        except Exception:
+            return 0
 
-        def start():
-            query = f"UPDATE {BankSchema.BANK_TB_NAME}\n"
-            query += "SET "
-            return query
+    @staticmethod
+    def update_cells(changes, db_path=files['base_db']):
+        """
+        obj: apply edited cells of the bank table in place, one batched UPDATE per set of edited columns, within a
+        single transaction. only the rollup days and the cached plots whose date range the edited transactions
+        fall on (before or after the edit) are invalidated. nothing is updated if any of the edits is invalid
+        :param changes: list - dict per edited row of its transaction_id and the new value of every edited column
+        :return: int - number of updated rows
+        :raises ValueError: on an unknown column, a date that can not be parsed, or a transaction_id that is not in
+        the table (transaction ids identify the rows and can not be edited themselves)
+        """
+        key_name, date_col = BankSchema.SCHEMA_BANK_TRANSACTION_ID.name, BankSchema.SCHEMA_BANK_DATE.name
+        table_name = BankSchema.BANK_TB_NAME
+        column_types = {sch.name: sch.type for sch in BankSchema.get_schema_table(table_name)}
+        by_columns = defaultdict(list)
+        for change in changes:
+            columns = tuple(sorted(col for col in change if col != key_name))
+            unknown = set(columns) - set(column_types)
+            if unknown:
+                raise ValueError(f'Unknown columns {sorted(unknown)} of table {table_name}.')
+            if key_name not in change or not columns:
+                continue
+            # note: missing values are left as nulls rather than cast into strings
+            values = [None if change[col] is None else column_types[col](change[col]) for col in columns]
+            by_columns[columns].append(values + [change[key_name]])
+        if not by_columns:
+            return 0
 
-        def middle(d, column_ids):
-            return ', '.join(f"{col_name}={SqliteHelper.frmt_sql_val(d[col_name])}"
-                             for col_name in column_ids)
+        # dates are stored as iso strings so they can be range filtered through an index
+        for columns, params in by_columns.items():
+            if date_col in columns:
+                i = columns.index(date_col)
+                for values, iso_date in zip(params, Preprocess.iso_dates(pd.Series([p[i] for p in params]))):
+                    if iso_date is None and values[i] is not None:
+                        raise ValueError(f'Unable to parse the {date_col} {values[i]} of transaction {values[-1]}.')
+                    values[i] = iso_date
+        new_days = {values[columns.index(date_col)] for columns, params in by_columns.items()
+                    if date_col in columns for values in params}
 
-        def end(d, column_ids):
-            query = '\nWHERE\n'
-            query += ' AND '.join(f"{col_name}={SqliteHelper.frmt_sql_val(d[col_name])}"
-                                  for col_name in column_ids)
-            return query + ';\n'
+        updated = 0
+        with Data._write_lock, SqliteHelper.transaction(db_path) as conn:
+            # updated transactions may move away from the days they currently fall on
+            affected_days = Rollup.days_of(conn, [values[-1] for params in by_columns.values() for values in params])
+            for columns, params in by_columns.items():
+                updated += conn.executemany(Query.update(table_name, columns, (key_name,)), params).rowcount
+            n_rows = sum(len(params) for params in by_columns.values())
+            if updated < n_rows:
+                raise ValueError(f'{n_rows - updated} of the {n_rows} edited rows are not in {table_name}.')
+            affected_days |= new_days
+            Rollup.refresh_days(conn, affected_days)
+            PlotCache.carry_forward(conn, affected_days)
+            DataVersion.bump(conn)
+        Data._notify_change(db_path)
+        logger.info(f'Updated {updated} rows of {table_name} across {len(affected_days)} days.')
+        return updated
 
-        all_queries = ''.join(start() + middle(d, pk_ids) + end(d, cat_ids) for d in filled_list_dict)
-        SqliteHelper.execute_sqlite(all_queries, files['base_db'])
+    @staticmethod
+    def get_missing_categories(as_dataframe=True):
+        """
+        obj: identify unlabeled data
+        """
+        query = f"SELECT * FROM {BankSchema.BANK_TB_NAME}\n" \
+            f"WHERE {BankSchema.SCHEMA_BANK_C1.name} IS NULL OR {BankSchema.SCHEMA_BANK_C2.name}=?"
+        return SqliteHelper.query(query, files['base_db'], ('',), as_dataframe=as_dataframe)
+
+    @staticmethod
+    def update_missing_categories(filled_list_dict, cat_ids, pk_ids):
+        """
+        obj: update the missing categories in the database, one batched statement for all the rows
+        :param filled_list_dict: list - dict of column name to value for every row
+        :param cat_ids: list - columns that identify a row
+        :param pk_ids: list - columns that are set
+        """
+        query = Query.update(BankSchema.BANK_TB_NAME, tuple(pk_ids), tuple(cat_ids))
+        date_col = BankSchema.SCHEMA_BANK_DATE.name
+        with Data._write_lock, SqliteHelper.transaction(files['base_db']) as conn:
+            conn.executemany(query, ([d[col_name] for col_name in list(pk_ids) + list(cat_ids)]
+                                     for d in filled_list_dict))
+            if date_col in cat_ids:
+                Rollup.refresh_days(conn, {d[date_col] for d in filled_list_dict})
+            else:
+                Rollup.rebuild(conn)
+            DataVersion.bump(conn)
+        Data._notify_change(files['base_db'])
 
     @staticmethod
     def get_most_recent_transaction_date(tb_name, db_path):
-        sql_query = f"SELECT {BankSchema.SCHEMA_BANK_DATE.name} FROM {tb_name}" \
-            f" ORDER BY DATE({BankSchema.SCHEMA_BANK_DATE.name}) DESC LIMIT 1"
-        df = SqliteHelper.execute_sqlite(sql_query, db_path, as_dataframe=True)
+        sql_query = Data._most_recent_transaction_date_query(tb_name)
+        rows = SqliteHelper.query(sql_query, db_path)
         # empty table - no most recent transaction
-        if df.shape[0] != 1:
-            return None
-        return df[BankSchema.SCHEMA_BANK_DATE.name][0]
+        return rows[0][0] if rows else None
+
+    @staticmethod
+    def _most_recent_transaction_date_query(tb_name):
+        return Query.select(tb_name, columns=(BankSchema.SCHEMA_BANK_DATE.name,),
+                            order_by=BankSchema.SCHEMA_BANK_DATE.name, order='DESC', limit=1)
+
+    @staticmethod
+    def get_html_from_id(image_id, start_date, end_date, data_version=None, db_path=files['base_db']):
+        """
+        obj: plot of `image_id` drawn for the date range against the current data, None if it was not drawn yet
+        :param start_date: str - iso formatted, see `DateRange.key`
+        :param end_date: str - iso formatted
+        :param data_version: int - current data version, looked up when not provided
+        """
+        if data_version is None:
+            data_version = DataVersion.get(db_path)
+        return PlotCache.hit(image_id, start_date, end_date, data_version, db_path)
 
     @staticmethod
-    def get_most_recent_html_from_id(image_id, db_path=files['base_db']):
-        sql_query = f"SELECT {BankSchema.SCHEMA_PLOT_CACHE_HTML.name} FROM {BankSchema.PLOT_CACHE_TB_NAME}" \
-            f" WHERE {BankSchema.SCHEMA_PLOT_CACHE_FULL_TITLE.name}='{image_id}'" \
-            f" ORDER BY {BankSchema._SCHEMA_PLOT_CACHE_TIMESTAMP.name} DESC LIMIT 1"
-        df = SqliteHelper.execute_sqlite(sql_query, db_path, as_dataframe=True)
-        return None if df is None or df.shape[0] <= 0 else df[BankSchema.SCHEMA_PLOT_CACHE_HTML.name][0]
+    def _heatmap_query(drop_null_coordinates=True):
+        bank, location = BankSchema.BANK_TB_NAME, BankSchema.LOCATION_TB_NAME
+        lat, lon = BankSchema.SCHEMA_LOCATION_LAT.name, BankSchema.SCHEMA_LOCATION_LON.name
+        transaction_id = BankSchema.SCHEMA_BANK_TRANSACTION_ID.name
+        query = f"SELECT {location}.{lat}, {location}.{lon}, {bank}.{BankSchema.SCHEMA_BANK_AMOUNT.name}\n" \
+            f"FROM {bank} INNER JOIN {location} ON {location}.{transaction_id} = {bank}.{transaction_id}\n" \
+            f"WHERE {bank}.{BankSchema.SCHEMA_BANK_DATE.name} BETWEEN ? AND ?"
+        if drop_null_coordinates:
+            query += f"\nAND {location}.{lat} IS NOT NULL AND {location}.{lon} IS NOT NULL"
+        return query
 
     @staticmethod
-    def get_heatmap_df(date_range, db_path=files['base_db']):
-        sql_query = f"""
-        SELECT {BankSchema.SCHEMA_LOCATION_LON.name}, {BankSchema.SCHEMA_LOCATION_LAT.name}, {BankSchema.SCHEMA_BANK_AMOUNT.name}
-        FROM {BankSchema.BANK_TB_NAME} INNER JOIN {BankSchema.LOCATION_TB_NAME} ON {BankSchema.BANK_TB_NAME}.{BankSchema.SCHEMA_BANK_TRANSACTION_ID.name}
-        WHERE DATE({BankSchema.SCHEMA_BANK_DATE.name}) BETWEEN '{date_range.start}' AND '{date_range.end}'
+    def get_heatmap_arrays(date_range, drop_null_coordinates=True, db_path=files['base_db']):
+        """
+        obj: coordinates and amounts of the located transactions within `date_range`
+        :return: (np.array, np.array, np.array) - lat, lon and amount, or None if nothing was found
         """
-        df = SqliteHelper.execute_sqlite(sql_query, db_path, as_dataframe=True)
-        return None if df is None or df.shape[0] <= 0 else df
+        rows = SqliteHelper.query(Data._heatmap_query(drop_null_coordinates), db_path,
+                                  (str(date_range.start), str(date_range.end)))
+        if not rows:
+            return None
+        lat, lon, amount = np.array(rows, dtype=float).T
+        return lat, lon, amount
 
     @staticmethod
     def invalidate_cache(db_path=files['base_db']):
         logging.info('Invalidating plot cache by clearing contents.')
-        sql_query = f"""
-        DELETE FROM {BankSchema.PLOT_CACHE_TB_NAME};
-        """
-        SqliteHelper.execute_sqlite(sql_query, db_path)
+        PlotCache.invalidate(db_path)
 
     @staticmethod
     def cast_df_to_schema(df, table_id):
@@ -0,0 +1,49 @@
+import logging
+
+from config.files import files
+from self_finance.back_end.query import Query
+from self_finance.back_end.sqlite_helper import SqliteHelper
+from self_finance.constants import BankSchema
+
+logger = logging.getLogger(__name__)
+
+
+class DataVersion:
+    """
+    obj: monotonically increasing version of the bank data. every write to the bank tables bumps it within
+    the same transaction, so anything derived from the data (such as cached plots) can be keyed on it
+    """
+
+    @staticmethod
+    def get(db_path=files['base_db']):
+        sql_query = Query.select(BankSchema._DATA_VERSION_TB_NAME,
+                                 columns=(BankSchema._SCHEMA_DATA_VERSION_VERSION.name,),
+                                 equals=(BankSchema._SCHEMA_DATA_VERSION_ID.name,))
+        rows = SqliteHelper.query(sql_query, db_path, (0,))
+        return rows[0][0] if rows else 0
+
+    @staticmethod
+    def current(conn):
+        """
+        obj: the version as seen through the callers connection (and transaction)
+        """
+        sql_query = Query.select(BankSchema._DATA_VERSION_TB_NAME,
+                                 columns=(BankSchema._SCHEMA_DATA_VERSION_VERSION.name,),
+                                 equals=(BankSchema._SCHEMA_DATA_VERSION_ID.name,))
+        return conn.execute(sql_query, (0,)).fetchone()[0]
+
+    @staticmethod
+    def bump(conn):
+        """
+        obj: increment the version through the callers connection (and transaction), and drop the plots
+        cached for older versions since they can no longer be hit
+        :return: int - the new version
+        """
+        version_col = BankSchema._SCHEMA_DATA_VERSION_VERSION.name
+        conn.execute(f"UPDATE {BankSchema._DATA_VERSION_TB_NAME} SET {version_col}={version_col} + 1 "
+                     f"WHERE {BankSchema._SCHEMA_DATA_VERSION_ID.name}=?", (0,))
+        version = DataVersion.current(conn)
+        conn.execute(f"DELETE FROM {BankSchema.PLOT_CACHE_TB_NAME} "
+                     f"WHERE {BankSchema.SCHEMA_PLOT_CACHE_DATA_VERSION.name} < ?", (version,))
+        logger.info(f'Bank data changed, now at data version {version}.')
+        return version
@@ -1,62 +1,92 @@
 import datetime
 import re
+import threading
 
+from self_finance.constants import BankSchema
 from self_finance.utils import RegexDict
 
 
 class DateRange:
     """
-    obj: wrapper on top of datetime with the intention of having human level interpretability
+    obj: wrapper on top of datetime with the intention of having human level interpretability. human dates are
+    resolved when the range is created (against the current day, rather than the day the module was imported),
+    and `key` gives the absolute dates that anything derived from a range is cached by
     """
     _human_date = RegexDict({
-        'min': datetime.date.min,
-        'max': datetime.date.max,
-        'today': datetime.date.today(),
-        'yesterday': datetime.date.today() - datetime.timedelta(days=1),
-
-        '\d+ year.? ago': lambda y: datetime.date.today() - datetime.timedelta(days=y * 365),
-        '\d+ month.? ago': lambda m: datetime.date.today() - datetime.timedelta(days=m * 30),
-        '\d+ week.? ago': lambda w: datetime.date.today() - datetime.timedelta(weeks=w),
-        '\d+ day.? ago': lambda d: datetime.date.today() - datetime.timedelta(days=d),
-
-        '\d+ year.? ahead': lambda y: datetime.date.today() + datetime.timedelta(days=y * 365),
-        '\d+ month.? ahead': lambda m: datetime.date.today() + datetime.timedelta(days=m * 30),
-        '\d+ week.? ahead': lambda w: datetime.date.today() + datetime.timedelta(weeks=w),
-        '\d+ day.? ahead': lambda d: datetime.date.today() + datetime.timedelta(days=d),
+        'min': lambda today, n: datetime.date.min,
+        'max': lambda today, n: datetime.date.max,
+        'today': lambda today, n: today,
+        'yesterday': lambda today, n: today - datetime.timedelta(days=1),
+
+        '\d+ year.? ago': lambda today, y: today - datetime.timedelta(days=y * 365),
+        '\d+ month.? ago': lambda today, m: today - datetime.timedelta(days=m * 30),
+        '\d+ week.? ago': lambda today, w: today - datetime.timedelta(weeks=w),
+        '\d+ day.? ago': lambda today, d: today - datetime.timedelta(days=d),
+
+        '\d+ year.? ahead': lambda today, y: today + datetime.timedelta(days=y * 365),
+        '\d+ month.? ahead': lambda today, m: today + datetime.timedelta(days=m * 30),
+        '\d+ week.? ahead': lambda today, w: today + datetime.timedelta(weeks=w),
+        '\d+ day.? ahead': lambda today, d: today + datetime.timedelta(days=d),
     })
 
+    # human date to its date, as resolved on `_resolved_day`. ranges are resolved on every request, and the
+    # memo is dropped as soon as the day changes
+    _lock = threading.Lock()
+    _resolved = {}
+    _resolved_day = None
+
     def __init__(self, start, end):
         self._org_start, self._org_end = start, end
-        # prioritize the human date if the type is a string
-        # then prioritize the raw value itself, which presumable is a datetime
-        # any misspellings will be handled by the regex pattern match ValueError
-        _start = self._human_date[start] or start if isinstance(start, str) else start
-        _end = self._human_date[end] or end if isinstance(end, str) else end
+        # human dates (and iso formatted dates) are resolved, anything else presumably is a date already. any
+        # misspellings raise a KeyError
+        self.start = DateRange.resolve(start) if isinstance(start, str) else start
+        self.end = DateRange.resolve(end) if isinstance(end, str) else end
+
+    @staticmethod
+    def resolve(human_date):
+        """
+        obj: the absolute date of a human date (e.g. '5 months ago') or of an iso formatted date, as of today
+        :return: datetime.date
+        """
+        today = datetime.date.today()
+        with DateRange._lock:
+            if DateRange._resolved_day != today:
+                DateRange._resolved, DateRange._resolved_day = {}, today
+            date = DateRange._resolved.get(human_date)
+        if date is None:
+            date = DateRange._resolve(human_date, today)
+            with DateRange._lock:
+                if DateRange._resolved_day == today:
+                    DateRange._resolved[human_date] = date
+        return date
+
+    @staticmethod
+    def _resolve(human_date, today):
+        try:
+            return datetime.datetime.strptime(human_date, BankSchema.DATE_FORMAT2).date()
+        except ValueError:
+            pass
+        to_date = DateRange._human_date[human_date]
+        first_num = re.search(r'\d+', human_date)
+        return to_date(today, int(first_num.group()) if first_num else None)
 
-        # at this point the values are a datetime or lambda (and guaranteed not a string!)
-        # but it only can be a lambda if the original type was a string
-        self.start = self._apply_call(start, _start) if isinstance(start, str) else _start
-        self.end = self._apply_call(end, _end) if isinstance(end, str) else _end
+    @property
+    def key(self):
+        """
+        obj: canonical key of the range, its absolute dates as iso formatted strings. ranges that cover the same
+        dates share a key however they were written, and the key of a relative range moves along with the days
+        :return: (str, str)
+        """
+        return str(self.start), str(self.end)
 
     def __repr__(self):
         return f'start: {self.start} | end: {self.end}'
 
     def __eq__(self, other):
-        return other and self._org_start == other._org_start \
-               and self._org_end == other._org_end
+        return other and self.key == other.key
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
     def __hash__(self):
-        return hash((self._org_start, self._org_end))
-
-    def _apply_call(self, key, value):
-        if callable(value):
-            try:
-                first_num = int(re.search(r'\d+', key).group())
-                return value(first_num)
-            except AttributeError:
-                raise AttributeError("No identified integer found at the start of the date range time.")
-        else:
-            return value
+        return hash(self.key)
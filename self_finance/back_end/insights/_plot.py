@@ -2,15 +2,17 @@ import logging
 import operator
 from collections import Counter
 from collections import defaultdict
-from functools import reduce
 
 import folium
 import matplotlib.dates as mdates
-import matplotlib.pyplot as plt
+import matplotlib.style
 import numpy as np
 import pandas as pd
 import seaborn as sns
 from folium.plugins import HeatMap
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.ticker import MaxNLocator
 
 from config.files import files
 from self_finance.back_end.data import Data
@@ -22,38 +24,114 @@ logger = logging.getLogger(__name__)
 
 class _PlotHelper:
     @staticmethod
-    def cumsum_by_conditional_group(values, corresponding_categories):
-        unique_groups = list(set(corresponding_categories))
-        group_cumsum, group_curr_cumsum = defaultdict(list), defaultdict(int)
-        for val, cat in zip(values, corresponding_categories):
-            group_curr_cumsum[cat] += val
-            for group in unique_groups:
-                group_cumsum[group].append(group_curr_cumsum[group])
-        return group_cumsum
+    def subplots(figsize=None):
+        """
+        obj: figure and axes through the object oriented api. unlike pyplot, nothing is registered in global
+        state, so figures can be drawn concurrently (e.g. across processes) and are garbage collected as usual
+        """
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+        return fig, fig.add_subplot(111)
 
     @staticmethod
-    def cumsum_line_plot_by_group(main_df, fig, ax, hue, title, x=BankSchema.SCHEMA_BANK_DATE.name,
-                                  y=BankSchema.SCHEMA_BANK_AMOUNT.name, ndate_labels=10):
-        df_y, df_hue = list(main_df[y].values), list(main_df[hue].values)
-        cumsum_hue = _PlotHelper.cumsum_by_conditional_group(df_y, df_hue)
-        tmp_df = pd.DataFrame({y: reduce(lambda l1, l2: l1 + l2, cumsum_hue.values()),
-                               hue: reduce(lambda l1, l2: l1 + l2,
-                                           [[group] * len(values) for group, values in cumsum_hue.items()]),
-                               x: list(main_df[x].values) * len(cumsum_hue)})
+    def group_cumsums(values, groups):
+        """
+        obj: running total of every group at every row, `sums[g, i]` is the sum of the values of group `g`
+        within rows 0..i. a single scatter and cumulative sum, rows without a group are left out
+        :return: (np.array, np.array) - groups in order of first appearance, and their (groups x rows) totals
+        """
+        codes, uniques = pd.factorize(groups)
+        in_group = codes >= 0
+        sums = np.zeros((len(uniques), len(codes)))
+        sums[codes[in_group], np.flatnonzero(in_group)] = np.asarray(values, dtype=float)[in_group]
+        np.cumsum(sums, axis=1, out=sums)
+        return np.asarray(uniques, dtype=object), sums
+
+    @staticmethod
+    def long_form(x_values, groups, sums, x, y, hue):
+        """
+        obj: long form frame of `group_cumsums` for seaborn, one row per (group, row) pair ordered by group.
+        the groups are categorical (every category is present) which avoids an object column of groups x rows
+        """
+        n_groups, n_rows = sums.shape
+        hue_values = pd.Categorical.from_codes(np.arange(n_groups).repeat(n_rows), categories=list(groups))
+        return pd.DataFrame({x: np.tile(np.asarray(x_values), n_groups), y: sums.ravel(), hue: hue_values},
+                            columns=[x, y, hue])
+
+    @staticmethod
+    def lttb(x_values, y_values, n_out):
+        """
+        obj: largest triangle three buckets downsampling of a line that is sorted by x. the first and last points
+        are kept and every bucket in between keeps the point that forms the largest triangle with the previously
+        kept point and the average of the next bucket, which preserves the visual shape of the line
+        :return: np.array - indices of the kept points
+        """
+        n = len(x_values)
+        if n_out >= n or n_out < 3:
+            return np.arange(n)
+        edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+        kept = np.empty(n_out, dtype=int)
+        kept[0], kept[-1] = 0, n - 1
+        a = 0
+        for i in range(n_out - 2):
+            start, end = edges[i], edges[i + 1]
+            next_end = edges[i + 2] if i + 2 < len(edges) else n
+            avg_x, avg_y = x_values[end:next_end].mean(), y_values[end:next_end].mean()
+            area = np.abs((x_values[a] - avg_x) * (y_values[start:end] - y_values[a]) -
+                          (x_values[a] - x_values[start:end]) * (avg_y - y_values[a]))
+            a = start + int(np.argmax(area))
+            kept[i + 1] = a
+        return kept
+
+    @staticmethod
+    def downsampled_long_form(x_values, groups, sums, x, y, hue, max_points=None):
+        """
+        obj: `long_form` within a budget of `max_points` per group. the totals of a group are first averaged per
+        day (what seaborn would estimate for repeated dates) and then reduced with `lttb`. x becomes a datetime
+        :param x_values: list - dates in ascending order
+        :param max_points: int - points per group, no downsampling if None
+        """
+        if max_points is None or sums.shape[1] == 0:
+            return _PlotHelper.long_form(x_values, groups, sums, x, y, hue)
+        dates = pd.to_datetime(pd.Series(x_values)).values
+        day_starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]])
+        daily = np.add.reduceat(sums, day_starts, axis=1) / np.diff(np.r_[day_starts, len(dates)])
+        days = dates[day_starts]
+        days_numeric = days.astype('int64').astype(float)
 
+        kept = [_PlotHelper.lttb(days_numeric, group_daily, max_points) for group_daily in daily]
+        hue_values = pd.Categorical.from_codes(np.arange(len(groups)).repeat([len(k) for k in kept]),
+                                               categories=list(groups))
+        return pd.DataFrame({x: np.concatenate([days[k] for k in kept]),
+                             y: np.concatenate([group_daily[k] for group_daily, k in zip(daily, kept)]),
+                             hue: hue_values}, columns=[x, y, hue])
+
+    @staticmethod
+    def line_plot(fig, ax, tmp_df, x, y, hue, ndate_labels=10):
+        sns.lineplot(x=x, y=y, hue=hue, data=tmp_df, ax=ax)
         # ensure x label for datetime is not overcrowded
-        xloc = plt.MaxNLocator(ndate_labels)
+        if np.issubdtype(tmp_df[x].dtype, np.datetime64):
+            xloc = mdates.AutoDateLocator(maxticks=ndate_labels)
+            ax.xaxis.set_major_formatter(mdates.AutoDateFormatter(xloc))
+        else:
+            xloc = MaxNLocator(ndate_labels)
         ax.xaxis.set_major_locator(xloc)
-        sns.lineplot(x=x, y=y, hue=hue, data=tmp_df)
         fig.autofmt_xdate()
-        plt.title(title)
+
+    @staticmethod
+    def cumsum_line_plot_by_group(main_df, fig, ax, hue, title, x=BankSchema.SCHEMA_BANK_DATE.name,
+                                  y=BankSchema.SCHEMA_BANK_AMOUNT.name, ndate_labels=10, max_points=None):
+        groups, sums = _PlotHelper.group_cumsums(main_df[y].values, main_df[hue].values)
+        tmp_df = _PlotHelper.downsampled_long_form(main_df[x].values, groups, sums, x, y, hue, max_points)
+        _PlotHelper.line_plot(fig, ax, tmp_df, x, y, hue, ndate_labels)
+        ax.set_title(title)
 
 
 class _Plot:
     """
     obj: all drawing / plot logic
     """
-    plt.style.use('ggplot')
+    matplotlib.style.use('ggplot')
     sns.set_palette(sns.color_palette("bright"))
     sns.set_context("paper")
 
@@ -64,32 +142,29 @@ class _Plot:
         """
         plot_type, figsize, title = kwargs.get('plot_type', None), kwargs.get('figsize', None), \
                                     kwargs.get('title', None)
+        max_points = kwargs.get('max_points', None)
 
-        fig, ax = plt.subplots(figsize=figsize)
+        fig, ax = _PlotHelper.subplots(figsize)
         if plot_type == 'line':
-            df_amount = list(df[BankSchema.SCHEMA_BANK_AMOUNT.name].values)
-            df_type = list(df[BankSchema.SCHEMA_BANK_INC_OR_EXP.name].values)
-            cum_sum_inc_or_exp = _PlotHelper.cumsum_by_conditional_group(df_amount, df_type)
-            cum_sum_income, cum_sum_expense = cum_sum_inc_or_exp['income'], cum_sum_inc_or_exp['expense']
-            cum_sum_profit = [inc - abs(exp) for inc, exp in zip(cum_sum_income, cum_sum_expense)]
-            tmp_df = pd.DataFrame({BankSchema.SCHEMA_BANK_AMOUNT.name: cum_sum_expense + cum_sum_income + cum_sum_profit,
-                                   'type': ['expense'] * len(cum_sum_expense) + ['income'] * len(cum_sum_income) +
-                                           ['net'] * len(cum_sum_profit),
-                                   BankSchema.SCHEMA_BANK_DATE.name: list(
-                                       df[BankSchema.SCHEMA_BANK_DATE.name].values) * 3})
-            # ensure x label for datetime is not overcrowded
-            xloc = plt.MaxNLocator(10)
-            ax.xaxis.set_major_locator(xloc)
-            sns.lineplot(x=BankSchema.SCHEMA_BANK_DATE.name, y=BankSchema.SCHEMA_BANK_AMOUNT.name,
-                         hue='type', data=tmp_df)
-            fig.autofmt_xdate()
+            groups, sums = _PlotHelper.group_cumsums(df[BankSchema.SCHEMA_BANK_AMOUNT.name].values,
+                                                     df[BankSchema.SCHEMA_BANK_INC_OR_EXP.name].values)
+            totals = dict(zip(groups, sums))
+            cum_sum_income = totals.get('income', np.zeros(df.shape[0]))
+            cum_sum_expense = totals.get('expense', np.zeros(df.shape[0]))
+            cum_sum_profit = cum_sum_income - np.abs(cum_sum_expense)
+            tmp_df = _PlotHelper.downsampled_long_form(
+                df[BankSchema.SCHEMA_BANK_DATE.name].values, ['expense', 'income', 'net'],
+                np.vstack([cum_sum_expense, cum_sum_income, cum_sum_profit]),
+                BankSchema.SCHEMA_BANK_DATE.name, BankSchema.SCHEMA_BANK_AMOUNT.name, 'type', max_points)
+            _PlotHelper.line_plot(fig, ax, tmp_df, BankSchema.SCHEMA_BANK_DATE.name, BankSchema.SCHEMA_BANK_AMOUNT.name,
+                                  'type')
         elif plot_type == 'violin':
             sns.violinplot(x=BankSchema.SCHEMA_BANK_INC_OR_EXP.name, y=BankSchema.SCHEMA_BANK_AMOUNT.name,
-                           hue=BankSchema.SCHEMA_BANK_INC_OR_EXP.name, data=df, showfliers=False)
+                           hue=BankSchema.SCHEMA_BANK_INC_OR_EXP.name, data=df, showfliers=False, ax=ax)
         elif plot_type == 'bar':
             sns.barplot(x=BankSchema.SCHEMA_BANK_INC_OR_EXP.name, y=BankSchema.SCHEMA_BANK_AMOUNT.name,
-                        data=df, estimator=np.sum)
-        plt.title(title)
+                        data=df, estimator=np.sum, ax=ax)
+        ax.set_title(title)
         return fig
 
     @staticmethod
@@ -119,22 +194,24 @@ class _Plot:
         """
         plot_type, figsize, title = kwargs.get('plot_type', None), kwargs.get('figsize', None), \
                                     kwargs.get('title', None)
+        max_points = kwargs.get('max_points', None)
 
-        fig, ax = plt.subplots(figsize=figsize)
+        fig, ax = _PlotHelper.subplots(figsize)
         df = df[df[BankSchema.SCHEMA_BANK_INC_OR_EXP.name] == inc_or_exp.lower()]
         if plot_type == 'line':
             df = _Plot._filter_df_by_n_highest_aggregates(df, BankSchema.SCHEMA_BANK_C1.name)
-            _PlotHelper.cumsum_line_plot_by_group(df, fig, ax, BankSchema.SCHEMA_BANK_C1.name, 'Income by Category')
+            _PlotHelper.cumsum_line_plot_by_group(df, fig, ax, BankSchema.SCHEMA_BANK_C1.name, 'Income by Category',
+                                                  max_points=max_points)
         elif plot_type == 'violin':
             df = _Plot._filter_df_by_n_highest_aggregates(df, BankSchema.SCHEMA_BANK_C1.name, n=4)
             sns.violinplot(x=BankSchema.SCHEMA_BANK_C1.name, y=BankSchema.SCHEMA_BANK_AMOUNT.name,
-                           hue=BankSchema.SCHEMA_BANK_C2.name, data=df, showfliers=False)
+                           hue=BankSchema.SCHEMA_BANK_C2.name, data=df, showfliers=False, ax=ax)
         elif plot_type == 'bar':
             df = _Plot._filter_df_by_n_highest_aggregates(df, BankSchema.SCHEMA_BANK_C1.name, n=4)
             sns.barplot(x=BankSchema.SCHEMA_BANK_C1.name, y=BankSchema.SCHEMA_BANK_AMOUNT.name,
-                        hue=BankSchema.SCHEMA_BANK_C2.name, data=df, estimator=np.sum)
-        plt.legend(loc="upper left", bbox_to_anchor=(1, 1))
-        plt.title(title)
+                        hue=BankSchema.SCHEMA_BANK_C2.name, data=df, estimator=np.sum, ax=ax)
+        ax.legend(loc="upper left", bbox_to_anchor=(1, 1))
+        ax.set_title(title)
         return fig
 
     @staticmethod
@@ -161,26 +238,28 @@ class _Plot:
         logging.info('Plotting transactional_frequency_over_time plot')
         plot_type, figsize, title = kwargs.get('plot_type', None), kwargs.get('figsize', None), \
                                     kwargs.get('title', None)
+        max_points = kwargs.get('max_points', None)
 
-        fig, ax = plt.subplots(figsize=figsize)
+        fig, ax = _PlotHelper.subplots(figsize)
         tmp_const = 'count'
-        df[tmp_const] = [1 for _ in range(0, df.shape[0])]
+        df[tmp_const] = 1
         if plot_type == 'line':
             df = _Plot._filter_df_by_n_highest_frequency(df, BankSchema.SCHEMA_BANK_C1.name)
-            _PlotHelper.cumsum_line_plot_by_group(df, fig, ax, BankSchema.SCHEMA_BANK_C1.name, title, y=tmp_const)
+            _PlotHelper.cumsum_line_plot_by_group(df, fig, ax, BankSchema.SCHEMA_BANK_C1.name, title, y=tmp_const,
+                                                  max_points=max_points)
         elif plot_type == 'bar':
             df = _Plot._filter_df_by_n_highest_frequency(df, BankSchema.SCHEMA_BANK_C1.name, 4)
             sns.barplot(x=BankSchema.SCHEMA_BANK_C1.name, y=tmp_const, hue=BankSchema.SCHEMA_BANK_C2.name, data=df,
-                        estimator=np.sum)
-        plt.legend(loc="upper left", bbox_to_anchor=(1, 1))
-        plt.title(title)
+                        estimator=np.sum, ax=ax)
+        ax.legend(loc="upper left", bbox_to_anchor=(1, 1))
+        ax.set_title(title)
         return fig
 
     @staticmethod
     def _inc_or_exp_by_month(inc_or_exp, df, **kwargs):
         plot_type, figsize, title = kwargs.get('plot_type', None), kwargs.get('figsize', None), \
                                     kwargs.get('title', None)
-        fig, ax = plt.subplots(figsize=figsize)
+        fig, ax = _PlotHelper.subplots(figsize)
         ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m'))
 
         df = df[df[BankSchema.SCHEMA_BANK_INC_OR_EXP.name] == inc_or_exp.lower()]
@@ -189,12 +268,12 @@ class _Plot:
         df.groupby(
             [BankSchema.SCHEMA_BANK_C1.name, pd.Grouper(key=BankSchema.SCHEMA_BANK_DATE.name, freq='M')]).count().reset_index()
         sns.barplot(x=BankSchema.SCHEMA_BANK_DATE.name, y=BankSchema.SCHEMA_BANK_AMOUNT.name,
-                    hue=BankSchema.SCHEMA_BANK_C1.name, data=df, estimator=np.sum)
-        xloc = plt.MaxNLocator(10)
+                    hue=BankSchema.SCHEMA_BANK_C1.name, data=df, estimator=np.sum, ax=ax)
+        xloc = MaxNLocator(10)
         ax.xaxis.set_major_locator(xloc)
-        plt.legend(loc="upper left", bbox_to_anchor=(1, 1))
+        ax.legend(loc="upper left", bbox_to_anchor=(1, 1))
         fig.autofmt_xdate()
-        plt.title(title)
+        ax.set_title(title)
         return fig
 
     @staticmethod
@@ -210,15 +289,12 @@ class _Plot:
     @staticmethod
     def spending_heatmap(date_range, db_path=files['base_db'], **kwargs):
         logging.info('Plotting spending_heatmap plot')
-        hm_df = Data.get_heatmap_df(date_range, db_path)
-        if hm_df is None:
-            logging.warning('Query for heatmap dataframe returned as empty, ignoring plot.')
+        hm_arrays = Data.get_heatmap_arrays(date_range, db_path=db_path)
+        if hm_arrays is None:
+            logging.warning('Query for heatmap coordinates returned as empty, ignoring plot.')
             return None
-        hm_df = hm_df.dropna()
         hmap = folium.Map(zoom_start=6, location=Visuals.HM_START_LAT_LON)
-        hm_wide = HeatMap(list(zip(hm_df[BankSchema.SCHEMA_LOCATION_LAT.name].values,
-                                   hm_df[BankSchema.SCHEMA_LOCATION_LON.name].values,
-                                   hm_df[BankSchema.SCHEMA_BANK_AMOUNT.name].values)),
+        hm_wide = HeatMap(np.column_stack(hm_arrays).tolist(),
                           min_opacity=0.2,
                           radius=17, blur=15,
                           max_zoom=1)
@@ -1,7 +1,6 @@
 import logging
 import re
 
-from self_finance.back_end.data import Data
 from self_finance.constants import Data as ConstData
 from self_finance.constants import Html
 
@@ -17,16 +16,6 @@ class HTMLHelper:
         return html_df.replace(HTMLHelper._TABLE_CELL_TAG,
                                HTMLHelper._TABLE_CELL_EDITABLE_TAG)
 
-    @staticmethod
-    def as_html_form_from_sql(table_name, date_range, order_by_col_name, order, table_id=None,
-                              replace_default_data_frame_class_with=None):
-        rddfcw = replace_default_data_frame_class_with
-        df = Data.get_table_as_df(date_range, table_name, order_by_col_name, order)
-        if df is None or df.shape[0] == 0:
-            return None
-        return HTMLHelper.as_html_form_from_df(df, table_id, make_editable=True,
-                                               replace_default_data_frame_class_with=rddfcw)
-
     # TODO - kind of bad thing to but the style directly in here, its a poor assumption - should put in css
     @staticmethod
     def as_html_form_from_df(df, table_id=None, make_editable=False, replace_default_data_frame_class_with=None):
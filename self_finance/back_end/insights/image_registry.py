@@ -1,11 +1,12 @@
-import datetime
 import logging
-from io import StringIO
-from threading import BoundedSemaphore
-from threading import Lock
-from threading import Thread
+import multiprocessing
+import tempfile
+from io import BytesIO
 
+from config.files import files
+from self_finance.back_end.data_version import DataVersion
 from self_finance.back_end.date_range import DateRange
+from self_finance.back_end.frame_snapshot import FrameSnapshot
 from self_finance.back_end.insights._plot import _Plot
 from self_finance.back_end.plot_cache import PlotCache
 from self_finance.constants import BankSchema
@@ -19,27 +20,30 @@ class ImageRegistry:
     obj: interaction class that maps human friendly string and parameters
     to Plot
     """
-    __global_lock = Lock()
     _plot_interface = {
         'Income vs Expenses Over Time': {
             'func': _Plot.income_vs_expenses_over_time,
             'supported_plots': {'line', 'bar', 'violin'},
-            'figsize': (11, 8)
+            'figsize': (11, 8),
+            'max_points': Visuals.PLOT_MAX_POINTS
         },
         'Income by Category': {
             'func': _Plot.income_by_category,
             'supported_plots': {'line', 'bar', 'violin'},
-            'figsize': (11, 5)
+            'figsize': (11, 5),
+            'max_points': Visuals.PLOT_MAX_POINTS
         },
         'Expenses by Category': {
             'func': _Plot.expenses_by_category,
             'supported_plots': {'line', 'bar', 'violin'},
-            'figsize': (11, 5)
+            'figsize': (11, 5),
+            'max_points': Visuals.PLOT_MAX_POINTS
         },
         'Frequency of Transactions by Category': {
             'func': _Plot.transactional_frequency_over_time,
             'supported_plots': {'line', 'bar'},
-            'figsize': (11, 5)
+            'figsize': (11, 5),
+            'max_points': Visuals.PLOT_MAX_POINTS
         },
         'Income by Month': {
             'func': _Plot.income_by_month,
@@ -81,6 +85,16 @@ class ImageRegistry:
         except KeyError:
             return None
 
+    @staticmethod
+    def get_plot_max_points(plot_key):
+        """
+        obj: point budget per line of a time series plot, None if the plot is not downsampled
+        """
+        try:
+            return ImageRegistry._plot_interface[plot_key].get('max_points')
+        except KeyError:
+            return None
+
     @staticmethod
     def get_all_plot_ids():
         plot_ids = []
@@ -95,68 +109,115 @@ class ImageRegistry:
         return sorted(plot_ids)
 
     @staticmethod
-    def plot_all(plot_ids, df, start_date, end_date):
-        threads = []
-        df = df.sort_values(by=BankSchema.SCHEMA_BANK_DATE.name)
-        semaphor_pool = BoundedSemaphore(value=Visuals.PLOT_MAX_THREADS)
-        logging.info(f'Beginning plotting using {Visuals.PLOT_MAX_THREADS} threads.')
+    def plot_all(plot_ids, df, start_date, end_date, workers=None, progress=None, data_version=None,
+                 db_path=files['base_db']):
+        """
+        obj: draw every plot in `plot_ids` that is not already cached, and cache it
+        :param workers: int - number of rendering processes, `Visuals.PLOT_WORKERS` if None
+        :param progress: callable - see `render_all`
+        :param data_version: int - version of the data `df` was read at, the current version if None
+        :return: int - number of plots drawn
+        """
+        # plots drawn against the same data are re-used, regardless of the day they were drawn on
+        data_version = DataVersion.get(db_path) if data_version is None else data_version
+        missed_plot_ids = []
         for plt_id in plot_ids:
-            semaphor_pool.acquire()
-            t = Thread(target=ImageRegistry._plot, args=(plt_id, start_date, end_date, df))
-            threads.append(t)
-            t.start()
-            semaphor_pool.release()
-        # wait for all of them to finish
-        for x in threads:
-            x.join()
+            title = ImageRegistry._make_plot_key_title(*ImageRegistry._parse_plot_id(plt_id))
+            if PlotCache.hit(title, start_date, end_date, data_version, db_path) is None:
+                logging.info(f'Plot cache miss for plot: {title}, replotting.')
+                missed_plot_ids.append(plt_id)
+            else:
+                logging.info(f'Plot cache hit for plot: {title}, ignoring replotting.')
+
+        rendered = ImageRegistry.render_all(missed_plot_ids, df, start_date, end_date, workers, progress, db_path)
+        for title, html in rendered.items():
+            PlotCache.add_cache_miss(title, start_date, end_date, data_version, html, db_path)
+        return len(rendered)
 
     @staticmethod
-    def _plot(plt_id, start_date, end_date, df):
-        # the logic here is put in place also handle the case when we want to plot heat map
-        plot_branch = [s.strip() for s in plt_id.split('-')]
-        is_matplotlib = len(plot_branch) == 2
-        if is_matplotlib:
-            plot_basis, plot_type = plot_branch
-            plot_type = plot_type.lower()
-            ImageRegistry.__plot(plot_basis, start_date, end_date, plot_type, df)
-        else:
-            plot_basis = plot_branch[0].strip()
-            ImageRegistry.__plot(plot_basis, start_date, end_date)
+    def render_all(plot_ids, df, start_date, end_date, workers=None, progress=None, db_path=files['base_db']):
+        """
+        obj: render plots, bypassing the plot cache. matplotlib is not thread safe, so plots are drawn by a pool
+        of processes. `df` is handed to them as a memory mapped snapshot, and every plot is drawn from its own
+        frame of the snapshot, so plots are free to modify the frame they are given. the processes are started
+        by a fork server (see `_pool_context`) rather than forked from this multithreaded process
+        :param workers: int - number of rendering processes, `Visuals.PLOT_WORKERS` if None. with a single
+        worker the plots are drawn in this process
+        :param progress: callable - called with the number of plots drawn so far, the number of plots and the
+        title of the last drawn plot, as every plot is drawn
+        :param db_path: str - database the spending heatmap is drawn from, it reads the database rather than `df`
+        :return: dict - plot title to its html, plots that could not be drawn (or failed to) are left out
+        """
+        if not plot_ids:
+            return {}
+        df = df.sort_values(by=BankSchema.SCHEMA_BANK_DATE.name)
+        workers = min(workers or Visuals.PLOT_WORKERS, len(plot_ids))
+        jobs = [(plt_id, start_date, end_date, db_path) for plt_id in plot_ids]
+        logging.info(f'Beginning plotting of {len(plot_ids)} plots using {workers} processes.')
+        with tempfile.TemporaryDirectory(prefix='plot_snapshot_') as snapshot_dir:
+            snapshot = FrameSnapshot.create(df, snapshot_dir)
+            if workers <= 1:
+                rendered = ImageRegistry._collect((_render_from_snapshot(snapshot, job) for job in jobs),
+                                                  len(jobs), progress)
+            else:
+                with _pool_context().Pool(workers, initializer=_init_worker, initargs=(snapshot,)) as pool:
+                    rendered = ImageRegistry._collect(pool.imap(_render_in_worker, jobs, chunksize=1),
+                                                      len(jobs), progress)
+        return {title: svg_or_html.decode('utf-8') for title, svg_or_html in rendered if svg_or_html is not None}
 
     @staticmethod
-    def __plot(plot_basis, start_date, end_date, plot_type=None, df=None):
-        # check if we've plotted this same plot in the past before
-        kwargs = {}
-        now = datetime.datetime.now().strftime(BankSchema.DATE_FORMAT2)
+    def _collect(rendered, n_plots, progress):
+        """
+        obj: exhaust the rendered plots as they come in, reporting each one to `progress`
+        """
+        collected = []
+        for title, svg_or_html in rendered:
+            collected.append((title, svg_or_html))
+            if progress is not None:
+                progress(len(collected), n_plots, title)
+        return collected
+
+    @staticmethod
+    def render(plt_id, start_date, end_date, df=None, db_path=files['base_db']):
+        """
+        obj: draw a single plot
+        :param db_path: str - database the spending heatmap is drawn from
+        :return: (str, bytes) - plot title and its svg (or html for the heatmap), None if nothing was drawn
+        """
+        plot_basis, plot_type = ImageRegistry._parse_plot_id(plt_id)
         title = ImageRegistry._make_plot_key_title(plot_basis, plot_type)
-        plot_cache_result = PlotCache.hit(title, start_date, end_date, now)
-        if plot_cache_result is None:
-            logging.info(f'Plot cache miss for plot: {title}, replotting.')
-            if plot_type and plot_type not in ImageRegistry.get_supported_plots(plot_basis):
-                raise KeyError(f"Provided plot type {plot_type} is not supported.")
-            kwargs['plot_type'] = plot_type
-            kwargs['title'] = title
-            kwargs['figsize'] = ImageRegistry.get_plot_figsize(plot_basis)
-            with ImageRegistry.__global_lock:
-                if df is not None:
-                    fig_or_html = ImageRegistry.get_plot_func(plot_basis)(df, **kwargs)
-                else:
-                    # heatmap
-                    fig_or_html = ImageRegistry.get_plot_func(plot_basis)(DateRange(start_date, end_date), **kwargs)
-            # is figure
-            if fig_or_html is not None and not isinstance(fig_or_html, str):
-                stream_reader = StringIO()
-                fig_or_html.savefig(stream_reader, format='svg', bbox_inches='tight')
-                stream_reader.seek(0)
-                html = stream_reader.getvalue()
-                PlotCache.add_cache_miss(title, start_date, end_date, now, html)
-            elif fig_or_html is None:
-                logging.warning(f'Ignoring plot for {plot_basis}.')
-            else:
-                # heat-map plot
-                PlotCache.add_cache_miss(title, start_date, end_date, now, fig_or_html)
+        if plot_type and plot_type not in ImageRegistry.get_supported_plots(plot_basis):
+            raise KeyError(f"Provided plot type {plot_type} is not supported.")
+        kwargs = {'plot_type': plot_type, 'title': title, 'figsize': ImageRegistry.get_plot_figsize(plot_basis),
+                  'max_points': ImageRegistry.get_plot_max_points(plot_basis)}
+        if plot_type is not None:
+            fig_or_html = ImageRegistry.get_plot_func(plot_basis)(df, **kwargs)
         else:
-            logging.info(f'Plot cache hit for plot: {title}, ignoring replotting.')
+            # heatmap
+            fig_or_html = ImageRegistry.get_plot_func(plot_basis)(DateRange(start_date, end_date), db_path=db_path,
+                                                                  **kwargs)
+
+        if fig_or_html is None:
+            logging.warning(f'Ignoring plot for {plot_basis}.')
+            return title, None
+        # heat-map plot
+        if isinstance(fig_or_html, str):
+            return title, fig_or_html.encode('utf-8')
+        stream = BytesIO()
+        fig_or_html.savefig(stream, format='svg', bbox_inches='tight')
+        return title, stream.getvalue()
+
+    @staticmethod
+    def _parse_plot_id(plt_id):
+        """
+        obj: split a plot id into its basis and (lower cased) type, the type is None for plots without types
+        """
+        # the logic here is put in place also handle the case when we want to plot heat map
+        plot_branch = [s.strip() for s in plt_id.split('-')]
+        if len(plot_branch) == 2:
+            plot_basis, plot_type = plot_branch
+            return plot_basis, plot_type.lower()
+        return plot_branch[0], None
 
     @staticmethod
     def _make_plot_key_title(plot_basis, plot_type):
@@ -164,3 +225,48 @@ class ImageRegistry:
             return plot_basis
         else:
             return f"{plot_basis} - {plot_type.capitalize()}"
+
+
+def _pool_context():
+    """
+    obj: start method of the rendering processes. forking a process that runs threads (the web server and the
+    job workers) can copy a lock that another thread holds into the child, so the processes are forked from a
+    single threaded fork server that has the plotting modules loaded instead, or spawned where there is none
+    """
+    if Visuals.PLOT_START_METHOD in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context(Visuals.PLOT_START_METHOD)
+    else:
+        context = multiprocessing.get_context('spawn')
+    if context.get_start_method() == 'forkserver':
+        context.set_forkserver_preload([__name__])
+    return context
+
+
+# state of a rendering process, the snapshot is received once when the process starts rather than with every plot
+_worker_snapshot = None
+
+
+def _init_worker(snapshot):
+    global _worker_snapshot
+    _worker_snapshot = snapshot
+
+
+def _render_from_snapshot(snapshot, job):
+    """
+    obj: draw a single plot of the snapshot, a plot that fails is logged and left out rather than failing the
+    other plots of the same redraw
+    :return: (str, bytes) - see `ImageRegistry.render`
+    """
+    plt_id, start_date, end_date, db_path = job
+    try:
+        # note: the heatmap reads the database rather than the frame
+        df = snapshot.to_frame() if ImageRegistry._parse_plot_id(plt_id)[1] is not None else None
+        return ImageRegistry.render(plt_id, start_date, end_date, df=df, db_path=db_path)
+    except Exception:
+        title = ImageRegistry._make_plot_key_title(*ImageRegistry._parse_plot_id(plt_id))
+        logger.exception(f'Failed to draw plot {title} from {start_date} to {end_date}.')
+        return title, None
+
+
+def _render_in_worker(job):
+    return _render_from_snapshot(_worker_snapshot, job)
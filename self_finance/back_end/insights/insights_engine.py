@@ -0,0 +1,81 @@
+import logging
+import time
+from collections import OrderedDict
+
+from config.files import files
+from self_finance.back_end.insights.raw_insights import RawInsights
+
+logger = logging.getLogger(__name__)
+
+
+class InsightsEngine:
+    """
+    obj: produce every insight of a date range from two scans, one grouped pass over the daily rollup (that the
+    top categories and the monthly sums are derived from) and one pass over the numeric columns of the table
+    (that the summary statistics are computed from). only the scans that the requested insights need are run
+    """
+    BANK_SUMMARY = 'bank_summary'
+    TOP_INC_CAT = 'top_inc_cat'
+    TOP_EXP_CAT = 'top_exp_cat'
+    THIS_MONTH_VS_LAST_MONTH = 'this_month_vs_last_month'
+    THIS_MONTH_VS_LAST_MONTH_AS_STR = 'this_month_vs_last_month_as_str'
+
+    DYNAMIC = (BANK_SUMMARY, TOP_INC_CAT, TOP_EXP_CAT)
+    STATIC = (THIS_MONTH_VS_LAST_MONTH, THIS_MONTH_VS_LAST_MONTH_AS_STR)
+    ALL = DYNAMIC + STATIC
+
+    _NEEDS_TOTALS = {TOP_INC_CAT, TOP_EXP_CAT, THIS_MONTH_VS_LAST_MONTH, THIS_MONTH_VS_LAST_MONTH_AS_STR}
+
+    @staticmethod
+    def run(date_range, table_name, insights=ALL, n=5, db_path=files['base_db']):
+        """
+        obj: compute `insights` of `table_name` within `date_range`
+        :param insights: tuple - insight names, any of `InsightsEngine.ALL`
+        :param n: int - number of top income and expense categories
+        :return: (OrderedDict, OrderedDict) - insight name to its result (None if there is no data), and the
+        seconds spent per insight, along with the shared scans
+        """
+        unknown = set(insights) - set(InsightsEngine.ALL)
+        if unknown:
+            raise ValueError(f'Unknown insights {sorted(unknown)}, expected any of {list(InsightsEngine.ALL)}.')
+        results, timings = OrderedDict(), OrderedDict()
+
+        def timed(name, func):
+            start = time.perf_counter()
+            try:
+                return func()
+            finally:
+                timings[name] = time.perf_counter() - start
+
+        totals, summary_df, sum_dict = None, None, None
+        if InsightsEngine._NEEDS_TOTALS & set(insights):
+            totals = timed('scan:monthly_category_totals',
+                           lambda: RawInsights.monthly_category_totals(date_range, db_path))
+
+        if InsightsEngine.BANK_SUMMARY in insights:
+            results[InsightsEngine.BANK_SUMMARY] = timed(InsightsEngine.BANK_SUMMARY, lambda: (
+                RawInsights.Dynammic.table_summary_statistics(table_name, date_range, db_path)))
+        for name, inc_or_exp in ((InsightsEngine.TOP_INC_CAT, 'income'), (InsightsEngine.TOP_EXP_CAT, 'expense')):
+            if name in insights:
+                results[name] = timed(name, lambda: (
+                    RawInsights.Dynammic.top_n_categories_from_totals(totals, inc_or_exp, n)))
+
+        if set(InsightsEngine.STATIC) & set(insights):
+            summary_df = timed('monthly_summary', lambda: RawInsights.Static.monthly_summary_from_totals(totals))
+            if summary_df is not None:
+                sum_dict = timed(InsightsEngine.THIS_MONTH_VS_LAST_MONTH, lambda: (
+                    RawInsights.Static.get_money_gain_and_spent_this_month_vs_last_month(
+                        date_range, table_name, db_path=db_path, summary_df=summary_df)))
+        if InsightsEngine.THIS_MONTH_VS_LAST_MONTH in insights:
+            results[InsightsEngine.THIS_MONTH_VS_LAST_MONTH] = None if sum_dict is None else (
+                RawInsights.Static.as_single_row_df(sum_dict))
+        if InsightsEngine.THIS_MONTH_VS_LAST_MONTH_AS_STR in insights:
+            results[InsightsEngine.THIS_MONTH_VS_LAST_MONTH_AS_STR] = None if sum_dict is None else timed(
+                InsightsEngine.THIS_MONTH_VS_LAST_MONTH_AS_STR, lambda: (
+                    RawInsights.Static.summarize_this_and_last_months_spending(
+                        date_range, table_name, db_path=db_path, sum_dict=sum_dict)))
+
+        logger.info(f'Computed {len(results)} insights in {sum(timings.values()):.3f}s: ' +
+                    ', '.join(f'{name} {seconds * 1000:.1f}ms' for name, seconds in timings.items()))
+        return results, timings
+
@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from config.files import files
+from self_finance.back_end.data import Data
+from self_finance.back_end.data_version import DataVersion
+from self_finance.back_end.date_range import DateRange
+from self_finance.back_end.insights.image_registry import ImageRegistry
+from self_finance.back_end.jobs import JobRunner
+from self_finance.constants import BankSchema
+from self_finance.constants import Defaults
+from self_finance.constants import Jobs
+from self_finance.constants import Visuals
+
+logger = logging.getLogger(__name__)
+
+
+class PlotWarmer:
+    """
+    obj: draw plots into the plot cache ahead of time, so that the visuals are (almost always) a cache hit. after
+    every change of the data a low priority job draws the plots of the default date range and of the most
+    recently drawn date ranges, once the data has not changed for `Visuals.PLOT_WARM_QUIET_SECONDS`. the quiet
+    period is waited out by a timer rather than by a job worker, and the job gives its worker up between plots
+    whenever a job of a higher priority is queued
+    """
+    _lock = threading.Lock()
+    # (start, end) of the most recently drawn date ranges to the plot ids drawn for them, most recent last
+    _recent = OrderedDict()
+    # database path to the timer that queues its plots once its data has been quiet
+    _timers = {}
+
+    @staticmethod
+    def record(start_date, end_date, plot_ids):
+        """
+        obj: remember the plots drawn for a date range, for them to be drawn again after the data changes
+        """
+        with PlotWarmer._lock:
+            PlotWarmer._recent.pop((start_date, end_date), None)
+            PlotWarmer._recent[(start_date, end_date)] = list(plot_ids)
+            while len(PlotWarmer._recent) > Visuals.PLOT_WARM_RECENT_RANGES:
+                PlotWarmer._recent.popitem(last=False)
+
+    @staticmethod
+    def ranges():
+        """
+        obj: the date ranges to draw, as of today. that is the default date range (with the most recently drawn
+        plots, or every plot if none were drawn yet) followed by the most recently drawn date ranges. ranges that
+        cover the same dates are only drawn once
+        :return: list - (start, end, plot ids), the dates are iso formatted (see `DateRange.key`)
+        """
+        with PlotWarmer._lock:
+            recent = list(reversed(PlotWarmer._recent.items()))
+        default = (Defaults.DATE_RANGE_START_DEFAULT, Defaults.DATE_RANGE_END_DEFAULT)
+        default_plot_ids = recent[0][1] if recent else ImageRegistry.get_all_plot_ids()
+        ranges = OrderedDict()
+        for date_range, plot_ids in [(default, default_plot_ids)] + recent:
+            ranges.setdefault(DateRange(*date_range).key, plot_ids)
+        return [(*key, plot_ids) for key, plot_ids in ranges.items()]
+
+    @staticmethod
+    def schedule(db_path=files['base_db']):
+        """
+        obj: data change listener, (re)start the quiet period of `db_path`. its plots are queued to be drawn once
+        the quiet period passes without another change, so a burst of changes (e.g. the items of a sync) is only
+        drawn once
+        """
+        timer = threading.Timer(Visuals.PLOT_WARM_QUIET_SECONDS, PlotWarmer._submit, (db_path,))
+        timer.daemon = True
+        with PlotWarmer._lock:
+            previous = PlotWarmer._timers.get(db_path)
+            if previous is not None:
+                previous.cancel()
+            PlotWarmer._timers[db_path] = timer
+            timer.start()
+
+    @staticmethod
+    def wait_idle(db_path=files['base_db']):
+        """
+        obj: block until the plots of every change of `db_path` so far have been drawn (or the data changed again
+        while they were drawn)
+        """
+        while True:
+            with PlotWarmer._lock:
+                timer = PlotWarmer._timers.get(db_path)
+            if timer is not None:
+                timer.join()
+                continue
+            job = JobRunner.get_by_key(PlotWarmer._key(db_path))
+            if job is None:
+                return
+            job.wait()
+
+    @staticmethod
+    def _key(db_path):
+        return 'plot_warm', db_path
+
+    @staticmethod
+    def _submit(db_path):
+        """
+        obj: queue the plots to be drawn. plots queued while the job is queued are coalesced into it, and those
+        queued while it runs into its follow-up (see `JobRunner.submit`)
+        :return: Job
+        """
+        job = JobRunner.submit('Drawing visuals ahead of time', lambda job: PlotWarmer.warm(job, db_path),
+                               key=PlotWarmer._key(db_path), priority=Jobs.LOW_PRIORITY)
+        # note: only once the job is known to the runner, for `wait_idle` to find one or the other
+        with PlotWarmer._lock:
+            if PlotWarmer._timers.get(db_path) is threading.current_thread():
+                del PlotWarmer._timers[db_path]
+        return job
+
+    @staticmethod
+    def warm(job=None, db_path=files['base_db']):
+        """
+        obj: draw every plot of `ranges` that is not cached yet. drawing stops once the data changes, since the
+        change schedules the plots of the new data. when a job of a higher priority is queued the plots left
+        are queued as a follow-up of `job`, and drawn (past the plots drawn so far, which are cache hits) once
+        the worker has run the other job
+        :param job: Job - the job the plots are drawn by, if any, to report its progress to and to give up
+        the worker of
+        :return: dict - number of date ranges, of plots drawn and the seconds it took
+        """
+        start = time.perf_counter()
+        ranges = PlotWarmer.ranges()
+        # note: read before the data, so that plots drawn from newer data can only be cached under an older version
+        data_version = DataVersion.get(db_path)
+        stats = {'ranges': len(ranges), 'plots': 0, 'seconds': 0.}
+        for i, (start_date, end_date, plot_ids) in enumerate(ranges):
+            if DataVersion.get(db_path) != data_version:
+                logger.info(f'Data changed while drawing visuals ahead of time, at version {data_version}.')
+                break
+            if job is not None:
+                job.progress(i, len(ranges), f'{start_date} to {end_date}')
+            df = Data.get_table_as_df(DateRange(start_date, end_date), BankSchema.BANK_TB_NAME, db_path=db_path)
+            if df is None or df.shape[0] == 0:
+                continue
+            if PlotWarmer._draw(job, plot_ids, df, start_date, end_date, data_version, db_path, stats):
+                logger.info(f'Yielded to a job of a higher priority after drawing {stats["plots"]} plots.')
+                PlotWarmer._submit(db_path)
+                break
+        stats['seconds'] = time.perf_counter() - start
+        logger.info(f"Drew {stats['plots']} plots of {stats['ranges']} date ranges ahead of time in "
+                    f"{stats['seconds']:.2f}s.")
+        return stats
+
+    @staticmethod
+    def _draw(job, plot_ids, df, start_date, end_date, data_version, db_path, stats):
+        """
+        obj: draw the plots of a date range one at a time, counting them into `stats`
+        :return: bool - whether the plots were left to give the worker up to a job of a higher priority
+        """
+        for plt_id in plot_ids:
+            if job is not None and JobRunner.waiting(job.priority):
+                return True
+            stats['plots'] += ImageRegistry.plot_all([plt_id], df, start_date, end_date, Visuals.PLOT_WARM_WORKERS,
+                                                     data_version=data_version, db_path=db_path)
+        return False
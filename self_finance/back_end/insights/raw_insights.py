@@ -1,37 +1,67 @@
 import datetime
 import logging
+from collections import defaultdict
 from math import nan
-from collections import Counter
 
 import pandas as pd
 
 from config.files import files
-from self_finance.back_end.data import Data
+from self_finance.back_end.query import Query
+from self_finance.back_end.rollup import Rollup
+from self_finance.back_end.sqlite_helper import SqliteHelper
 from self_finance.constants import BankSchema
 
 logger = logging.getLogger(__name__)
 
 
 class RawInsights:
+    @staticmethod
+    def monthly_category_totals(date_range, db_path=files['base_db']):
+        """
+        obj: `Rollup.monthly_category_totals`, that every insight of the rollup is derived from
+        :return: list - None if there is no database to begin with
+        """
+        try:
+            return Rollup.monthly_category_totals(date_range, db_path)
+        except Exception:
+            return None
+
     class Dynammic:
         @staticmethod
-        def _agg_top_n_income_and_expense_categories(df, n):
-            counter = Counter(list(df[BankSchema.SCHEMA_BANK_C1.name].values))
-            return counter.most_common(n)
+        def _top_n_categories(inc_or_exp, date_range, table_name, n, db_path):
+            # note: read from the daily rollup of `table_name`, rather than every transaction
+            totals = RawInsights.monthly_category_totals(date_range, db_path)
+            return RawInsights.Dynammic.top_n_categories_from_totals(totals, inc_or_exp, n)
 
         @staticmethod
-        def _top_n_categories(inc_or_exp, date_range, table_name, n, db_path):
-            df = Data.get_table_as_df(date_range, table_name, db_path=db_path)
-            if df is None or df.shape[0] == 0:
+        def top_n_categories_from_totals(totals, inc_or_exp, n=5):
+            """
+            obj: the `n` most frequent categories of incomes or expenses, from the rows of
+            `Rollup.monthly_category_totals` rather than another query
+            """
+            frequencies = defaultdict(int)
+            for _, row_inc_or_exp, category, frequency, _, _ in totals or ():
+                if row_inc_or_exp == inc_or_exp:
+                    frequencies[category] += frequency
+            if not frequencies:
                 return None
-            df_filter = df[df[BankSchema.SCHEMA_BANK_INC_OR_EXP.name] == inc_or_exp]
-            most_common_filter = RawInsights.Dynammic._agg_top_n_income_and_expense_categories(df_filter, n)
-            return pd.DataFrame(most_common_filter, columns=['category', 'frequency'])
+            # note: descending frequency and then nulls before categories
+            most_common = sorted(frequencies.items(), key=lambda kv: (-kv[1], kv[0] is not None, kv[0] or ''))[:n]
+            return pd.DataFrame(most_common, columns=['category', 'frequency'])
 
         @staticmethod
         def table_summary_statistics(table_name, date_range, db_path=files['base_db']):
             pd.options.html.border = 0
-            summary_df = Data.get_table_as_df(date_range, table_name, db_path=db_path)
+            # note: only the numeric columns are summarized, so only they are read
+            numeric_columns = tuple(schema.name for schema in BankSchema.get_schema_table(table_name)
+                                    if schema.type in (int, float))
+            try:
+                query = Query.select(table_name, columns=numeric_columns or None,
+                                     between=BankSchema.SCHEMA_BANK_DATE.name if date_range else None)
+                params = (str(date_range.start), str(date_range.end)) if date_range else ()
+                summary_df = SqliteHelper.query(query, db_path, params, as_dataframe=True)
+            except Exception:
+                summary_df = None
             if summary_df is None or summary_df.shape[0] == 0:
                 logger.debug('Unable to instantiate summary statistics table. The database is probably empty.')
                 return None
@@ -48,46 +78,75 @@ class RawInsights:
 
     class Static:
         @staticmethod
-        def _agg_income_and_expenses_by_month(df, month):
-            sum_income, sum_expenses = 0, 0
-            for index, row in df.iterrows():
-                if row[BankSchema.SCHEMA_BANK_DATE.name].month == month:
-                    if row[BankSchema.SCHEMA_BANK_AMOUNT.name] > 0:
-                        sum_income += row[BankSchema.SCHEMA_BANK_AMOUNT.name]
-                    else:
-                        sum_expenses += row[BankSchema.SCHEMA_BANK_AMOUNT.name]
-            return sum_income, sum_expenses
+        def monthly_summary(date_range, db_path=files['base_db']):
+            """
+            obj: income, expenses and their net for every month within `date_range`, from a single grouped query
+            :return: pd.DataFrame - indexed by (year, month) in ascending order, None if there are no transactions
+            """
+            totals = RawInsights.monthly_category_totals(date_range, db_path)
+            return RawInsights.Static.monthly_summary_from_totals(totals)
+
+        @staticmethod
+        def monthly_summary_from_totals(totals):
+            """
+            obj: `monthly_summary` from the rows of `Rollup.monthly_category_totals` rather than another query
+            """
+            sums = defaultdict(lambda: [0., 0.])
+            # note: split on the sign of the amounts rather than on inc_or_exp
+            for month, _, _, _, income, expenses in totals or ():
+                sums[month][0] += income
+                sums[month][1] += expenses
+            return RawInsights.Static._as_monthly_summary([(month, *sums[month]) for month in sorted(sums)])
+
+        @staticmethod
+        def _as_monthly_summary(rows):
+            if not rows:
+                return None
+            summary_df = pd.DataFrame(rows, columns=['month', 'income', 'expenses'])
+            summary_df['net'] = summary_df['income'] + summary_df['expenses']
+            year_month = summary_df.pop('month').str.split('-', expand=True).astype(int)
+            summary_df.index = pd.MultiIndex.from_arrays([year_month[0], year_month[1]], names=['year', 'month'])
+            return summary_df
 
         @staticmethod
         def get_money_gain_and_spent_this_month_vs_last_month(date_range, table_name, _overide_month=None,
-                                                              as_dataframe=False, db_path=files['base_db']):
-            df = Data.get_table_as_df(date_range, table_name, db_path=db_path)
-            if df is None or df.shape[0] == 0:
+                                                              as_dataframe=False, db_path=files['base_db'],
+                                                              summary_df=None):
+            # note: read from the monthly summary of `table_name`, rather than every transaction
+            if summary_df is None:
+                summary_df = RawInsights.Static.monthly_summary(date_range, db_path)
+            if summary_df is None:
                 return None
-            df[BankSchema.SCHEMA_BANK_DATE.name] = pd.to_datetime(df[BankSchema.SCHEMA_BANK_DATE.name])
-            this_month = _overide_month or datetime.date.today().month
-            last_month = this_month - 1 or 12
+            today = datetime.date.today()
+            this_month = (today.year, _overide_month or today.month)
+            last_month = (this_month[0], this_month[1] - 1) if this_month[1] > 1 else (this_month[0] - 1, 12)
+
+            def income_and_expenses(year_month):
+                if year_month not in summary_df.index:
+                    return 0, 0
+                return summary_df.loc[year_month, 'income'], summary_df.loc[year_month, 'expenses']
 
-            inc_this_month, exp_this_month = RawInsights.Static._agg_income_and_expenses_by_month(df, this_month)
-            sum_income_last_month, exp_last_month = RawInsights.Static._agg_income_and_expenses_by_month(df, last_month)
+            inc_this_month, exp_this_month = income_and_expenses(this_month)
+            sum_income_last_month, exp_last_month = income_and_expenses(last_month)
             as_dict = {
                 'inc_this_month': "{0:.2f}".format(inc_this_month),
                 'exp_this_month': "{0:.2f}".format(exp_this_month),
                 'inc_last_month': "{0:.2f}".format(sum_income_last_month),
                 'exp_last_month': "{0:.2f}".format(exp_last_month)
             }
-            if not as_dataframe:
-                return as_dict
-            else:
-                # convert to a single row dataframe
-                _temp_df = pd.DataFrame(list(as_dict.values())).T
-                _temp_df.columns = list(as_dict.keys())
-                return _temp_df
+            return as_dict if not as_dataframe else RawInsights.Static.as_single_row_df(as_dict)
+
+        @staticmethod
+        def as_single_row_df(as_dict):
+            _temp_df = pd.DataFrame(list(as_dict.values())).T
+            _temp_df.columns = list(as_dict.keys())
+            return _temp_df
 
         @staticmethod
-        def summarize_this_and_last_months_spending(date_range, table_name, db_path=files['base_db']):
-            sum_dict = RawInsights.Static.get_money_gain_and_spent_this_month_vs_last_month(date_range, table_name,
-                                                                                            db_path=db_path)
+        def summarize_this_and_last_months_spending(date_range, table_name, db_path=files['base_db'], sum_dict=None):
+            if sum_dict is None:
+                sum_dict = RawInsights.Static.get_money_gain_and_spent_this_month_vs_last_month(date_range, table_name,
+                                                                                                db_path=db_path)
             if sum_dict is None:
                 return None
             diff_income = float(sum_dict['inc_this_month']) - float(sum_dict['inc_this_month'])
@@ -0,0 +1,219 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from self_finance.constants import Jobs
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """
+    obj: a unit of background work along with its progress. the job function is given the job itself, and
+    reports its progress and the messages meant for the user (once it has finished) through it
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, job_id, name, func, key=None, priority=Jobs.PRIORITY):
+        """
+        :param name: str - human friendly description of the job
+        :param func: callable - does the work given the job, its return value is kept as the result of the job
+        :param key: hashable - jobs submitted with the same key while one is queued are coalesced into it, and
+        jobs of the same key never run at the same time
+        :param priority: int - queued jobs of a lower value run first
+        """
+        self.id = job_id
+        self.name = name
+        self.func = func
+        self.key = key
+        self.priority = priority
+        self.status = Job.QUEUED
+        self.done = 0
+        self.total = None
+        self.message = None
+        self.messages = []
+        self.result = None
+        self.coalesced = 0
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._finished = threading.Event()
+
+    def progress(self, done, total=None, message=None):
+        """
+        obj: progress callback of the job function
+        :param done: int - units of work done so far
+        :param total: int - units of work of the whole job, None if it is not known upfront
+        :param message: str - what is being worked on
+        """
+        self.done, self.total = done, total
+        if message is not None:
+            self.message = message
+
+    def report(self, message, category='info'):
+        """
+        obj: leave a message for the user, shown (with its flash category) once the job has finished
+        """
+        self.messages.append((message, category))
+
+    @property
+    def finished(self):
+        return self.status in (Job.DONE, Job.FAILED)
+
+    def wait(self, timeout=None):
+        """
+        :return: bool - whether the job finished within `timeout` seconds
+        """
+        return self._finished.wait(timeout)
+
+    def as_dict(self):
+        end = self.finished_at or time.time()
+        return {'id': self.id, 'name': self.name, 'status': self.status, 'finished': self.finished,
+                'done': self.done, 'total': self.total, 'fraction': self.done / self.total if self.total else None,
+                'message': self.message, 'messages': list(self.messages), 'coalesced': self.coalesced,
+                'seconds': end - (self.started_at or end)}
+
+
+class JobRunner:
+    """
+    obj: in process priority queue of background jobs, run by a small pool of worker threads (started with the
+    first job) so that requests hand off their heavy work and return right away. the progress of a job is polled
+    by its id. a job submitted with the key of a job that is still queued is coalesced into it. a job submitted
+    with the key of a running job is held back as its follow-up, queued once the running job finishes (since it
+    may have read its input already), and every other job of that key is coalesced into the follow-up
+    """
+    _lock = threading.Lock()
+    # (priority, submission order, job)
+    _queue = queue.PriorityQueue()
+    _workers = []
+    _ids = itertools.count(1)
+    # job id to job, in the order they were submitted
+    _jobs = OrderedDict()
+    # key to its queued (or held back) job, and to its running job
+    _active = {}
+    _running = {}
+    # key to the follow-up of its running job, see `submit`
+    _held = {}
+    # finished jobs whose messages have not been shown yet
+    _unreported = []
+
+    @staticmethod
+    def submit(name, func, key=None, priority=Jobs.PRIORITY):
+        """
+        obj: queue `func` to be run in the background, see `Job`
+        :return: Job - the new job, or the queued job of `key`
+        """
+        with JobRunner._lock:
+            if key is not None and key in JobRunner._active:
+                job = JobRunner._active[key]
+                job.coalesced += 1
+                logger.info(f'Coalesced {name} into job {job.id} ({job.status}).')
+                return job
+            seq = next(JobRunner._ids)
+            job = Job(str(seq), name, func, key, priority)
+            JobRunner._jobs[job.id] = job
+            if key is not None:
+                JobRunner._active[key] = job
+            running = JobRunner._running.get(key) if key is not None else None
+            if running is not None:
+                JobRunner._held[key] = (priority, seq, job)
+            JobRunner._start_workers()
+        if running is not None:
+            logger.info(f'Held back job {job.id} ({name}) until job {running.id} finishes.')
+        else:
+            JobRunner._queue.put((priority, seq, job))
+            logger.info(f'Queued job {job.id} ({name}).')
+        return job
+
+    @staticmethod
+    def get(job_id):
+        """
+        :return: Job - None if there is no such job, or it has long finished
+        """
+        with JobRunner._lock:
+            return JobRunner._jobs.get(job_id)
+
+    @staticmethod
+    def get_by_key(key):
+        """
+        :return: Job - the queued (or held back) job of `key`, otherwise its running job, None if there is neither
+        """
+        with JobRunner._lock:
+            return JobRunner._active.get(key) or JobRunner._running.get(key)
+
+    @staticmethod
+    def waiting(priority):
+        """
+        obj: lets a long running job give its worker up to the jobs that should run before it
+        :return: bool - whether a job of a higher priority (lower value) than `priority` is queued
+        """
+        with JobRunner._queue.mutex:
+            return bool(JobRunner._queue.queue) and JobRunner._queue.queue[0][0] < priority
+
+    @staticmethod
+    def pop_messages():
+        """
+        obj: the messages of every job that finished since the last call, in the order they finished
+        :return: list - (message, flash category)
+        """
+        with JobRunner._lock:
+            unreported, JobRunner._unreported = JobRunner._unreported, []
+        return [message for job in unreported for message in job.messages]
+
+    @staticmethod
+    def _start_workers():
+        if JobRunner._workers:
+            return
+        for i in range(Jobs.WORKERS):
+            worker = threading.Thread(target=JobRunner._work, name=f'job-worker-{i}', daemon=True)
+            worker.start()
+            JobRunner._workers.append(worker)
+
+    @staticmethod
+    def _work():
+        while True:
+            JobRunner._run(JobRunner._queue.get()[-1])
+
+    @staticmethod
+    def _run(job):
+        with JobRunner._lock:
+            job.status, job.started_at = Job.RUNNING, time.time()
+            if job.key is not None:
+                # note: a job submitted from now on may miss what this one reads, and is held back instead
+                del JobRunner._active[job.key]
+                JobRunner._running[job.key] = job
+        logger.info(f'Running job {job.id} ({job.name}).')
+        status = Job.DONE
+        try:
+            job.result = job.func(job)
+        except Exception as e:
+            logger.exception(f'Job {job.id} ({job.name}) failed.')
+            job.report(f'{job.name} failed. {e}', 'warning')
+            status = Job.FAILED
+        job.finished_at = time.time()
+
+        with JobRunner._lock:
+            job.status = status
+            held = None
+            if job.key is not None:
+                del JobRunner._running[job.key]
+                held = JobRunner._held.pop(job.key, None)
+            JobRunner._unreported.append(job)
+            JobRunner._forget_finished()
+        job._finished.set()
+        logger.info(f'Job {job.id} ({job.name}) {status} in {job.finished_at - job.started_at:.2f}s.')
+        if held is not None:
+            JobRunner._queue.put(held)
+            logger.info(f'Queued job {held[-1].id} ({held[-1].name}).')
+
+    @staticmethod
+    def _forget_finished():
+        finished = [job_id for job_id, job in JobRunner._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - Jobs.MAX_FINISHED)]:
+            del JobRunner._jobs[job_id]
@@ -0,0 +1,176 @@
+import datetime
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+
+import pandas as pd
+
+from config.files import files
+from self_finance.back_end.data import Data
+from self_finance.back_end.query import Query
+from self_finance.back_end.sqlite_helper import SqliteHelper
+from self_finance.constants import BankSchema
+from self_finance.constants import Plaid
+
+logger = logging.getLogger(__name__)
+
+
+class PlaidSync:
+    """
+    obj: incremental sync of the transactions of a plaid item into the bank tables. only the days after the
+    item's watermark (the last day it has been fully synced through) are requested, at the largest page size.
+    once the first page tells the total number of transactions the remaining pages are requested concurrently,
+    and every item is merged once, in its own batch (a single transaction and data version), after all of its
+    pages have arrived. this deliberately replaces merging every page as soon as it arrives, which left an item
+    partially merged across several data versions. every linked item (one per institution) is kept along with
+    its access token, and `sync_all` syncs all of them at once. the plaid client is passed in, so any object with
+    the `Item.get` and `Transactions.get` methods of `plaid.Client` will do
+    """
+
+    @staticmethod
+    def add_item(item_id, access_token, db_path=files['base_db']):
+        """
+        obj: link a plaid item, or replace the access token of an already linked one
+        """
+        sql_query = Query.insert(BankSchema._PLAID_ITEM_TB_NAME, (BankSchema._SCHEMA_PLAID_ITEM_ITEM_ID.name,
+                                                                  BankSchema._SCHEMA_PLAID_ITEM_ACCESS_TOKEN.name),
+                                 or_clause='REPLACE')
+        SqliteHelper.query(sql_query, db_path, (item_id, access_token))
+        logger.info(f'Linked plaid item {item_id}.')
+
+    @staticmethod
+    def get_items(db_path=files['base_db']):
+        """
+        :return: list - (item id, access token) of every linked item, oldest first
+        """
+        sql_query = Query.select(BankSchema._PLAID_ITEM_TB_NAME,
+                                 columns=(BankSchema._SCHEMA_PLAID_ITEM_ITEM_ID.name,
+                                          BankSchema._SCHEMA_PLAID_ITEM_ACCESS_TOKEN.name),
+                                 order_by=((BankSchema._SCHEMA_PLAID_ITEM_CREATED_AT.name, 'ASC'), ('rowid', 'ASC')))
+        return SqliteHelper.query(sql_query, db_path)
+
+    @staticmethod
+    def get_watermark(item_id, db_path=files['base_db']):
+        """
+        :return: datetime.date - the last day the item has been fully synced through, None if it never was
+        """
+        sql_query = Query.select(BankSchema.PLAID_SYNC_TB_NAME, columns=(BankSchema.SCHEMA_PLAID_SYNC_WATERMARK.name,),
+                                 equals=(BankSchema.SCHEMA_PLAID_SYNC_ITEM_ID.name,))
+        rows = SqliteHelper.query(sql_query, db_path, (item_id,))
+        return datetime.datetime.strptime(rows[0][0], BankSchema.DATE_FORMAT2).date() if rows else None
+
+    @staticmethod
+    def _set_watermark(item_id, watermark, db_path):
+        sql_query = Query.insert(BankSchema.PLAID_SYNC_TB_NAME, (BankSchema.SCHEMA_PLAID_SYNC_ITEM_ID.name,
+                                                                 BankSchema.SCHEMA_PLAID_SYNC_WATERMARK.name),
+                                 or_clause='REPLACE')
+        SqliteHelper.query(sql_query, db_path, (item_id, watermark.isoformat()))
+
+    @staticmethod
+    def _pages(client, access_token, start_date, end_date, page_size, workers):
+        """
+        obj: every page of transactions between the two dates, in the order they arrive
+        :return: generator - (total number of transactions, list of transactions) per page
+        """
+        def get(offset):
+            return client.Transactions.get(access_token, start_date=start_date, end_date=end_date,
+                                           count=page_size, offset=offset)
+
+        first = get(0)
+        total = first['total_transactions']
+        yield total, first['transactions']
+        offsets = range(page_size, total, page_size)
+        if not offsets:
+            return
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(offsets)))) as pool:
+            for future in as_completed([pool.submit(get, offset) for offset in offsets]):
+                yield total, future.result()['transactions']
+
+    @staticmethod
+    def sync(client, access_token, item_id=None, end_date=None, page_size=Plaid.PAGE_SIZE,
+             workers=Plaid.SYNC_WORKERS, db_path=files['base_db']):
+        """
+        obj: sync the transactions of the item of `access_token` from `Plaid.SYNC_OVERLAP_DAYS` before the day
+        after its watermark through `end_date`. the pages are requested concurrently and merged at once, within a
+        single transaction, once they have all arrived. the watermark is only moved forward once every transaction
+        has been merged, and never past yesterday, since transactions of the current day may still come in
+        :param client: plaid.Client - or an object with the same `Item.get` and `Transactions.get` methods
+        :param item_id: str - item of `access_token`, requested from plaid if None
+        :param end_date: datetime.date - today if None
+        :return: dict - the item id, the synced dates, the number of pages, transactions and merged rows, and the
+        seconds it took
+        """
+        clock = time.perf_counter()
+        today = datetime.date.today()
+        end_date = end_date or today
+        item_id = item_id or client.Item.get(access_token)['item']['item_id']
+        watermark = PlaidSync.get_watermark(item_id, db_path)
+        overlap = datetime.timedelta(days=Plaid.SYNC_OVERLAP_DAYS - 1)
+        start_date = watermark - overlap if watermark else datetime.date.min
+        summary = {'item_id': item_id, 'start_date': start_date, 'end_date': end_date, 'pages': 0,
+                   'transactions': 0, 'row_counts': {}, 'seconds': 0.}
+        if watermark is not None and watermark >= end_date:
+            logger.info(f'Plaid item {item_id} is already synced through {watermark}.')
+            summary['seconds'] = time.perf_counter() - clock
+            return summary
+
+        transactions, total = [], 0
+        # note: iso formatted, since `DATE_FORMAT` does not zero pad the years of `datetime.date.min`
+        pages = PlaidSync._pages(client, access_token, start_date.isoformat(), end_date.isoformat(), page_size, workers)
+        for total, page in pages:
+            summary['pages'] += 1
+            transactions.extend(page)
+        # note: one merge per item rather than per page, so that the data version (along with the plot cache)
+        # changes once per item, and the pages of the items that are synced at once do not interleave
+        if transactions:
+            df = pd.DataFrame(transactions).drop_duplicates(BankSchema.SCHEMA_FULL_TRANSACTION_ID.name, keep='last')
+            summary['transactions'] = df.shape[0]
+            summary['row_counts'] = Data.merge(df, db_path)
+
+        # note: transactions that come in while paging shift the offsets, in which case some may have been missed
+        # (or arrived twice)
+        if summary['transactions'] < total:
+            logger.warning(f'Synced {summary["transactions"]} of {total} transactions of plaid item {item_id}, '
+                           f'keeping its watermark at {watermark}.')
+        else:
+            PlaidSync._set_watermark(item_id, min(end_date, today - datetime.timedelta(days=1)), db_path)
+        summary['seconds'] = time.perf_counter() - clock
+        logger.info(f'Synced plaid item {item_id} from {start_date} through {end_date}: {summary["pages"]} pages, '
+                    f'{summary["transactions"]} transactions in {summary["seconds"]:.2f}s.')
+        return summary
+
+    @staticmethod
+    def sync_all(client, end_date=None, item_workers=Plaid.ITEM_WORKERS, workers=Plaid.SYNC_WORKERS,
+                 db_path=files['base_db'], progress=None):
+        """
+        obj: sync every linked item, `item_workers` of them at once. an item that fails to sync does not stop
+        the others, its summary holds the error instead
+        :param progress: callable - called with the number of items synced so far, the number of items and the
+        id of the last synced item (None to begin with), as every item finishes
+        :return: list - `sync` summary of every item, in the order the items were linked
+        """
+        items = PlaidSync.get_items(db_path)
+        if not items:
+            return []
+
+        def sync_item(item):
+            item_id, access_token = item
+            try:
+                return PlaidSync.sync(client, access_token, item_id, end_date, workers=workers, db_path=db_path)
+            except Exception as e:
+                logger.exception(f'Unable to sync plaid item {item_id}.')
+                return {'item_id': item_id, 'error': str(e)}
+
+        with ThreadPoolExecutor(max_workers=max(1, min(item_workers, len(items)))) as pool:
+            futures = [pool.submit(sync_item, item) for item in items]
+            if progress is not None:
+                progress(0, len(items), None)
+            for n_synced, future in enumerate(as_completed(futures), 1):
+                if progress is not None:
+                    progress(n_synced, len(items), future.result()['item_id'])
+            summaries = [future.result() for future in futures]
+        failed = [summary['item_id'] for summary in summaries if 'error' in summary]
+        logger.info(f'Synced {len(summaries) - len(failed)} of {len(summaries)} plaid items'
+                    f'{", failed: " + ", ".join(failed) if failed else ""}.')
+        return summaries
@@ -1,35 +1,236 @@
+import logging
+import sqlite3
+import threading
+import zlib
+from bisect import bisect_left
+from collections import OrderedDict
+
 from config.files import files
+from self_finance.back_end.data_version import DataVersion
+from self_finance.back_end.date_range import DateRange
+from self_finance.back_end.query import Query
 from self_finance.back_end.sqlite_helper import SqliteHelper
 from self_finance.constants import BankSchema
 from self_finance.constants import Schema
+from self_finance.constants import Visuals
+
+logger = logging.getLogger(__name__)
+
+
+class _MemoryTier:
+    """
+    obj: process local, thread safe LRU cache of plot html that is bounded by the total size of its entries
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def get(self, key):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return html
 
+    def put(self, key, html):
+        size = len(html)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            self._entries[key] = html
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._size, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
 
 
 class PlotCache:
+    """
+    obj: previously drawn plots, an in memory LRU tier sits in front of the `plot_cache` table. plots are
+    keyed on the data version (see `DataVersion`) so they are re-used until the bank data changes
+    """
+    _memory = _MemoryTier(Visuals.PLOT_MEMORY_CACHE_MAX_BYTES)
+    # keys of the plots looked at (from either tier) since their last access was last written, see `_touch`
+    _accessed = set()
+    _accessed_lock = threading.Lock()
+
+    @staticmethod
+    def _key(full_title, start_date, end_date, data_version, db_path):
+        return db_path, full_title, str(start_date), str(end_date), int(data_version)
+
+    @staticmethod
+    def _compress(html):
+        return sqlite3.Binary(zlib.compress(html.encode('utf-8'), Visuals.PLOT_CACHE_COMPRESSION_LEVEL))
+
+    @staticmethod
+    def _decompress(blob):
+        return zlib.decompress(blob).decode('utf-8')
+
+    @staticmethod
+    def _touch(key):
+        """
+        obj: mark a plot as just used, so it is the last to be evicted. hits stay reads, the last access of the
+        plots is written in one batch by the next write of the plot cache table, right before it evicts (see
+        `_write_accessed`) since nothing but eviction reads it
+        """
+        with PlotCache._accessed_lock:
+            PlotCache._accessed.add(key)
+
+    @staticmethod
+    def _write_accessed(conn, db_path):
+        """
+        obj: write the last access of the plots of `db_path` that were looked at since it was last written
+        """
+        with PlotCache._accessed_lock:
+            keys = [key for key in PlotCache._accessed if key[0] == db_path]
+            PlotCache._accessed.difference_update(keys)
+        sql_query = Query.update(BankSchema.PLOT_CACHE_TB_NAME, (BankSchema._SCHEMA_PLOT_CACHE_LAST_ACCESS.name,),
+                                 equals=(BankSchema.SCHEMA_PLOT_CACHE_FULL_TITLE.name,
+                                         BankSchema.SCHEMA_PLOT_CACHE_START_DATE.name,
+                                         BankSchema.SCHEMA_PLOT_CACHE_END_DATE.name,
+                                         BankSchema.SCHEMA_PLOT_CACHE_DATA_VERSION.name))
+        now = conn.execute("SELECT CURRENT_TIMESTAMP").fetchone()[0]
+        conn.executemany(sql_query, [(now, *key[1:]) for key in keys])
+
     @staticmethod
-    def hit(full_title, start_date, end_date, lookup_date, db_path=files['base_db']):
+    def _evict(conn):
         """
-        obj: return the html if it was previously plotted today --
-             - keys: plot name, data range, lookup date
+        obj: drop the plots that were not used within the time to live and then, least recently used
+        first, the plots that do not fit within the maximum size of the table
         """
-        sql_query = f"SELECT {BankSchema.SCHEMA_PLOT_CACHE_HTML.name} FROM {BankSchema.PLOT_CACHE_TB_NAME}" \
-            f" WHERE {BankSchema.SCHEMA_PLOT_CACHE_FULL_TITLE.name}='{full_title}' AND" \
-            f" {BankSchema.SCHEMA_PLOT_CACHE_START_DATE.name}='{start_date}' AND" \
-            f" {BankSchema.SCHEMA_PLOT_CACHE_END_DATE.name}='{end_date}' AND " \
-            f" {BankSchema.SCHEMA_PLOT_CACHE_LOOKUP_DATE.name}='{lookup_date}'"
-        sql_result = SqliteHelper.execute_sqlite(sql_query, db_path, as_dataframe=True)
-        if sql_result is not None and sql_result.shape[0] > 0:
-            return sql_result[BankSchema.SCHEMA_PLOT_CACHE_HTML.name].values[0]
-        else:
+        last_access, size = BankSchema._SCHEMA_PLOT_CACHE_LAST_ACCESS.name, BankSchema.SCHEMA_PLOT_CACHE_SIZE.name
+        expired = conn.execute(f"DELETE FROM {BankSchema.PLOT_CACHE_TB_NAME} WHERE {last_access} < datetime('now', ?)",
+                               (f'-{Visuals.PLOT_CACHE_TTL_DAYS} days',)).rowcount
+        total = conn.execute(f"SELECT TOTAL({size}) FROM {BankSchema.PLOT_CACHE_TB_NAME}").fetchone()[0]
+        evicted = []
+        if total > Visuals.PLOT_CACHE_MAX_BYTES:
+            rows = conn.execute(f"SELECT rowid, {size} FROM {BankSchema.PLOT_CACHE_TB_NAME} "
+                                f"ORDER BY {last_access} ASC, rowid ASC")
+            for rowid, row_size in rows:
+                if total <= Visuals.PLOT_CACHE_MAX_BYTES:
+                    break
+                evicted.append((rowid,))
+                total -= row_size
+            conn.executemany(f"DELETE FROM {BankSchema.PLOT_CACHE_TB_NAME} WHERE rowid=?", evicted)
+        if expired or evicted:
+            logger.info(f'Evicted {expired} expired and {len(evicted)} least recently used plots from the plot cache.')
+
+    @staticmethod
+    def hit(full_title, start_date, end_date, data_version, db_path=files['base_db']):
+        """
+        obj: return the html if it was previously plotted against the same data --
+             - keys: plot name, data range, data version
+        """
+        key = PlotCache._key(full_title, start_date, end_date, data_version, db_path)
+        html = PlotCache._memory.get(key)
+        if html is not None:
+            PlotCache._touch(key)
+            return html
+        sql_query = Query.select(BankSchema.PLOT_CACHE_TB_NAME,
+                                 columns=(BankSchema.SCHEMA_PLOT_CACHE_HTML.name,),
+                                 equals=(BankSchema.SCHEMA_PLOT_CACHE_FULL_TITLE.name,
+                                         BankSchema.SCHEMA_PLOT_CACHE_START_DATE.name,
+                                         BankSchema.SCHEMA_PLOT_CACHE_END_DATE.name,
+                                         BankSchema.SCHEMA_PLOT_CACHE_DATA_VERSION.name), limit=1)
+        rows = SqliteHelper.query(sql_query, db_path, key[1:])
+        if not rows:
             return None
+        html = PlotCache._decompress(rows[0][0])
+        PlotCache._touch(key)
+        PlotCache._memory.put(key, html)
+        return html
+
+    @staticmethod
+    def add_cache_miss(full_title, start_date, end_date, data_version, html, db_path=files['base_db']):
+        schema = tuple(Schema.get_names(BankSchema.get_schema_table(BankSchema.PLOT_CACHE_TB_NAME)))
+        # note: or replace because the same plot may be drawn concurrently for the same data version
+        sql_query = Query.insert(BankSchema.PLOT_CACHE_TB_NAME, schema, or_clause='REPLACE')
+        blob = PlotCache._compress(html)
+        with SqliteHelper.transaction(db_path) as conn:
+            conn.execute(sql_query, (int(data_version), str(end_date), full_title, blob, len(blob), str(start_date)))
+            PlotCache._write_accessed(conn, db_path)
+            PlotCache._evict(conn)
+        PlotCache._memory.put(PlotCache._key(full_title, start_date, end_date, data_version, db_path), html)
+
+    @staticmethod
+    def carry_forward(conn, days):
+        """
+        obj: keep the plots whose date range contains none of `days` (e.g. the days of edited transactions) across
+        the next `DataVersion.bump`, by moving them ahead to the next version. call it through the connection (and
+        transaction) of the edit, right before the bump. plots are cached by the absolute dates of their range (see
+        `DateRange.key`), and those whose range can not be resolved are left to be dropped
+        :param days: set - iso dates
+        :return: int - number of plots carried forward
+        """
+        version = DataVersion.current(conn)
+        days = sorted(day for day in days if day is not None)
+        start_col, end_col = BankSchema.SCHEMA_PLOT_CACHE_START_DATE.name, BankSchema.SCHEMA_PLOT_CACHE_END_DATE.name
+        version_col = BankSchema.SCHEMA_PLOT_CACHE_DATA_VERSION.name
+        rows = conn.execute(Query.select(BankSchema.PLOT_CACHE_TB_NAME, columns=('rowid', start_col, end_col),
+                                         equals=(version_col,)), (version,)).fetchall()
+        carried = []
+        for rowid, start_date, end_date in rows:
+            try:
+                date_range = DateRange(start_date, end_date)
+            except Exception:
+                continue
+            start, end = str(date_range.start), str(date_range.end)
+            # the first edited day on or after the start of the range
+            i = bisect_left(days, start)
+            if i == len(days) or days[i] > end:
+                carried.append((version + 1, rowid))
+        conn.executemany(f"UPDATE {BankSchema.PLOT_CACHE_TB_NAME} SET {version_col}=? WHERE rowid=?", carried)
+        logger.debug(f'Carried {len(carried)} of {len(rows)} cached plots forward to data version {version + 1}.')
+        return len(carried)
+
+    @staticmethod
+    def invalidate(db_path=files['base_db']):
+        """
+        obj: drop every cached plot, from memory and from the database
+        """
+        PlotCache._memory.clear()
+        SqliteHelper.query(Query.delete(BankSchema.PLOT_CACHE_TB_NAME), db_path)
 
     @staticmethod
-    def add_cache_miss(full_title, start_date, end_date, lookup_date, html, db_path=files['base_db']):
-        schema = ', '.join(Schema.get_names(BankSchema.get_schema_table(BankSchema.PLOT_CACHE_TB_NAME)))
-        # a single quote within a sqlite query is escaped with double quotes
-        html = html.replace("'", "''")
-        # note: insert into because the logic flow guarantees that value combination will be unique
-        sql_query = f"INSERT INTO {BankSchema.PLOT_CACHE_TB_NAME} ({schema})" \
-            f" VALUES ('{end_date}', '{full_title}', '{html}', '{lookup_date}', '{start_date}')"
-        # note that delimiter is None because the string field html itself could have ';'
-        SqliteHelper.execute_sqlite(sql_query, db_path, delimiter=None)
+    def invalidate_memory():
+        PlotCache._memory.clear()
+
+    @staticmethod
+    def disk_stats(db_path=files['base_db']):
+        """
+        obj: number of plots and their compressed size in the plot cache table
+        """
+        sql_query = f"SELECT COUNT(*), TOTAL({BankSchema.SCHEMA_PLOT_CACHE_SIZE.name}) " \
+            f"FROM {BankSchema.PLOT_CACHE_TB_NAME}"
+        try:
+            entries, size = SqliteHelper.query(sql_query, db_path)[0]
+        except Exception:
+            entries, size = 0, 0
+        return {'entries': entries, 'bytes': int(size), 'max_bytes': Visuals.PLOT_CACHE_MAX_BYTES}
+
+    @staticmethod
+    def stats():
+        """
+        obj: hit, miss and eviction counters (and size) of the in memory tier
+        """
+        return PlotCache._memory.stats()
@@ -0,0 +1,88 @@
+import ast
+import logging
+
+import dateparser
+import numpy as np
+import pandas as pd
+
+from self_finance.constants import BankSchema
+
+logger = logging.getLogger(__name__)
+
+
+class Preprocess:
+    """
+    obj: columnar (vectorized) building blocks for preprocessing incoming bank tables,
+    every method operates on a whole column at once rather than row by row
+    """
+    # known formats that are attempted before falling back to the (slow) dateparser
+    _FAST_DATE_FORMATS = [BankSchema.DATE_FORMAT2, '%Y-%m-%d %H:%M:%S', '%m/%d/%Y']
+
+    @staticmethod
+    def parse_dates(column):
+        """
+        obj: parse a column of dates into `datetime.date` objects. known iso formats are parsed
+        in a single vectorized pass, and only the unique values that fail are handed to dateparser
+        """
+        column = pd.Series(column)
+        parsed = pd.Series(pd.NaT, index=column.index)
+        for date_format in Preprocess._FAST_DATE_FORMATS:
+            missing = parsed.isnull() & column.notnull()
+            if not missing.any():
+                break
+            parsed[missing] = pd.to_datetime(column[missing].astype(str), format=date_format, errors='coerce')
+
+        # slow path - only for the rows that none of the known formats could handle
+        missing = parsed.isnull() & column.notnull()
+        if missing.any():
+            unique_missing = column[missing].astype(str).unique()
+            logger.debug(f'Falling back to dateparser for {len(unique_missing)} unique date values.')
+            fallback = {value: dateparser.parse(value) for value in unique_missing}
+            parsed[missing] = pd.to_datetime(column[missing].astype(str).map(fallback))
+        return pd.Series(parsed.dt.date, index=column.index)
+
+    @staticmethod
+    def iso_dates(column):
+        """
+        obj: normalize a column of dates into iso (YYYY-MM-DD) strings, as they are stored in the database
+        """
+        dates = Preprocess.parse_dates(column)
+        return dates.map(lambda d: None if pd.isnull(d) else BankSchema.DATE_FORMAT.format(d))
+
+    @staticmethod
+    def parse_literals(column):
+        """
+        obj: safely evaluate a column of python literal strings (lists and dicts as written out
+        by a csv export). each unique string is only parsed once and shared across the rows
+        """
+        column = pd.Series(column)
+        is_str = column.map(lambda elm: isinstance(elm, str))
+        if not is_str.any():
+            return list(column)
+        unique_strs = column[is_str].unique()
+        parsed = {s: ast.literal_eval(s) for s in unique_strs}
+        return [parsed[elm] if flag else elm for elm, flag in zip(column, is_str)]
+
+    @staticmethod
+    def inc_or_exp(amounts):
+        """
+        obj: label every amount as an expense (negative) or income (otherwise)
+        """
+        return np.where(pd.Series(amounts).values < 0, 'expense', 'income')
+
+    @staticmethod
+    def split_categories(column, n):
+        """
+        obj: break a column of category lists into `n` columns, padding with None
+        """
+        categories = Preprocess.parse_literals(column)
+        unique_split = {}
+        split_rows = []
+        for category in categories:
+            # lists are not hashable, so share the work through their tuple form
+            key = tuple(category) if isinstance(category, list) else category
+            if key not in unique_split:
+                padded = list(key)[:n] if isinstance(key, tuple) else []
+                unique_split[key] = padded + [None] * (n - len(padded))
+            split_rows.append(unique_split[key])
+        return [list(col) for col in zip(*split_rows)] if split_rows else [[] for _ in range(n)]
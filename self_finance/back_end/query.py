@@ -0,0 +1,127 @@
+from functools import lru_cache
+
+
+class Query:
+    """
+    obj: build parameterized sqlite statements. identifiers (tables, columns and orderings) are written
+    into the statement while every value is bound through a `?` placeholder, so a statement is built once
+    per shape and its text is re-used as the key of sqlite3's per connection prepared statement cache
+    """
+    _ORDERS = {'ASC', 'DESC'}
+
+    @staticmethod
+    def _where(equals=(), between=None):
+        clauses = [f"{col}=?" for col in equals]
+        if between:
+            clauses.append(f"{between} BETWEEN ? AND ?")
+        return f" WHERE {' AND '.join(clauses)}" if clauses else ''
+
+    @staticmethod
+    def _order(order):
+        order = (order or 'ASC').upper()
+        if order not in Query._ORDERS:
+            raise ValueError(f'Invalid order {order}, expected one of {sorted(Query._ORDERS)}.')
+        return order
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def select(table_name, columns=None, equals=(), between=None, order_by=None, order=None, limit=None):
+        """
+        obj: SELECT statement, bind the `equals` values first and then the two `between` bounds
+        :param columns: tuple - columns to select, all if None
+        :param equals: tuple - columns that are matched for equality
+        :param between: str - column (or expression) that is bound by an inclusive range
+        :param order_by: str or tuple - column to order by, or (column, order) pairs to order by one after another
+        :param order: str - ASC or DESC, the order of a single `order_by` column
+        :param limit: int - maximum number of rows
+        """
+        query = f"SELECT {', '.join(columns) if columns else '*'} FROM {table_name}"
+        query += Query._where(equals, between)
+        if order_by:
+            if isinstance(order_by, str):
+                order_by = ((order_by, order),)
+            query += " ORDER BY " + ', '.join(f'{col} {Query._order(col_order)}' for col, col_order in order_by)
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        return query
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def insert(table_name, columns, or_clause=None):
+        """
+        obj: INSERT statement for a single row, bind one value per column
+        :param or_clause: str - conflict resolution, e.g. REPLACE or IGNORE
+        """
+        verb = f"INSERT OR {or_clause}" if or_clause else 'INSERT'
+        return f"{verb} INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def upsert(table_name, columns, key_column):
+        """
+        obj: INSERT statement for a single row that updates the other columns of the row in place when
+        `key_column` collides with an existing row, bind one value per column
+        """
+        updates = ', '.join(f'{col}=excluded.{col}' for col in columns if col != key_column)
+        return Query.insert(table_name, columns) + f" ON CONFLICT({key_column}) DO UPDATE SET {updates}"
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def select_in(table_name, column, n_values, columns=None):
+        """
+        obj: SELECT statement of the rows whose `column` is any of the `n_values` bound values
+        :param columns: tuple - columns to select, all if None
+        """
+        return f"SELECT {', '.join(columns) if columns else '*'} FROM {table_name} " \
+            f"WHERE {column} IN ({', '.join('?' * int(n_values))})"
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def update(table_name, set_columns, equals=()):
+        """
+        obj: UPDATE statement, bind the `set_columns` values first and then the `equals` values
+        """
+        return f"UPDATE {table_name} SET {', '.join(f'{col}=?' for col in set_columns)}" + Query._where(equals)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def delete(table_name, equals=(), between=None):
+        """
+        obj: DELETE statement, bind the `equals` values first and then the two `between` bounds
+        """
+        return f"DELETE FROM {table_name}" + Query._where(equals, between)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def page(table_name, order_by, key_column, order='ASC', columns=None, between=None, after=None, limit=None):
+        """
+        obj: keyset paginated SELECT statement, ordered by `order_by` and then by the unique `key_column` so that
+        every row has a distinct position. bind the two `between` bounds first, then the position of the last
+        row of the previous page: its `order_by` value three times (unless it is null) followed by its `key_column`
+        value. the position bounds `order_by` on its own as well, so that an index on (`order_by`, `key_column`)
+        starts the page at the position rather than at the start of the range
+        :param columns: tuple - columns to select, all if None
+        :param after: str - None for the first page, otherwise 'null' or 'value' depending on whether the
+        `order_by` value of the last row of the previous page is null (sqlite puts nulls first in ascending order)
+        """
+        order = Query._order(order)
+        op = '>' if order == 'ASC' else '<'
+        clauses = [f"{between} BETWEEN ? AND ?"] if between else []
+        # the rows after a value in descending order include the nulls, unless the range leaves them out
+        with_nulls = order == 'DESC' and between != order_by
+        if after == 'null':
+            position = f"{order_by} IS NULL AND {key_column} {op} ?"
+            clauses.append(f"(({position}) OR {order_by} IS NOT NULL)" if order == 'ASC' else f"({position})")
+        elif after == 'value':
+            bound = f"{order_by} {op}= ?"
+            clauses.append(f"({bound} OR {order_by} IS NULL)" if with_nulls else bound)
+            position = f"{order_by} {op} ? OR ({order_by} = ? AND {key_column} {op} ?)"
+            clauses.append(f"({position} OR {order_by} IS NULL)" if with_nulls else f"({position})")
+        elif after is not None:
+            raise ValueError(f"Invalid page position {after}, expected None, 'null' or 'value'.")
+        query = f"SELECT {', '.join(columns) if columns else '*'} FROM {table_name}"
+        query += f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        query += f" ORDER BY {order_by} {order}, {key_column} {order}"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        return query
@@ -0,0 +1,97 @@
+import logging
+
+from config.files import files
+from self_finance.back_end.sqlite_helper import SqliteHelper
+from self_finance.constants import BankSchema
+
+logger = logging.getLogger(__name__)
+
+
+class Rollup:
+    """
+    obj: maintain and read the `bank_daily` rollup. the rollup holds the count, sum (also of the positive and of the
+    negative amounts on their own), min and max of the amounts per (date, account_id, inc_or_exp, c1, c2), and is
+    refreshed one affected day at a time within the transaction that writes to the bank table
+    """
+    _KEY_COLUMNS = [BankSchema.SCHEMA_DAILY_DATE.name, BankSchema.SCHEMA_DAILY_ACCOUNT_ID.name,
+                    BankSchema.SCHEMA_DAILY_INC_OR_EXP.name, BankSchema.SCHEMA_DAILY_C1.name,
+                    BankSchema.SCHEMA_DAILY_C2.name]
+    _AGGREGATES = {
+        BankSchema.SCHEMA_DAILY_AMOUNT_COUNT.name: 'COUNT(*)',
+        BankSchema.SCHEMA_DAILY_AMOUNT_MAX.name: f'MAX({BankSchema.SCHEMA_BANK_AMOUNT.name})',
+        BankSchema.SCHEMA_DAILY_AMOUNT_MIN.name: f'MIN({BankSchema.SCHEMA_BANK_AMOUNT.name})',
+        BankSchema.SCHEMA_DAILY_AMOUNT_NEG_SUM.name: f'TOTAL(CASE WHEN {BankSchema.SCHEMA_BANK_AMOUNT.name} <= 0 '
+                                                     f'THEN {BankSchema.SCHEMA_BANK_AMOUNT.name} END)',
+        BankSchema.SCHEMA_DAILY_AMOUNT_POS_SUM.name: f'TOTAL(CASE WHEN {BankSchema.SCHEMA_BANK_AMOUNT.name} > 0 '
+                                                     f'THEN {BankSchema.SCHEMA_BANK_AMOUNT.name} END)',
+        BankSchema.SCHEMA_DAILY_AMOUNT_SUM.name: f'SUM({BankSchema.SCHEMA_BANK_AMOUNT.name})',
+    }
+    _DAYS_TB_NAME = 'temp._rollup_days'
+    _IDS_TB_NAME = 'temp._rollup_transaction_ids'
+
+    @staticmethod
+    def _aggregate_query(where):
+        columns = Rollup._KEY_COLUMNS + list(Rollup._AGGREGATES.keys())
+        return f"INSERT INTO {BankSchema.BANK_DAILY_TB_NAME} ({', '.join(columns)})\n" \
+            f"SELECT {', '.join(Rollup._KEY_COLUMNS + list(Rollup._AGGREGATES.values()))}\n" \
+            f"FROM {BankSchema.BANK_TB_NAME}{where}\n" \
+            f"GROUP BY {', '.join(Rollup._KEY_COLUMNS)}"
+
+    @staticmethod
+    def _fill_temp(conn, table_name, column, values):
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({column} TEXT PRIMARY KEY)")
+        conn.execute(f"DELETE FROM {table_name}")
+        conn.executemany(f"INSERT OR IGNORE INTO {table_name} ({column}) VALUES (?)", ((v,) for v in values))
+
+    @staticmethod
+    def days_of(conn, transaction_ids):
+        """
+        obj: the days that `transaction_ids` currently fall on, e.g. before they are updated
+        :return: set - iso dates
+        """
+        id_col, date_col = BankSchema.SCHEMA_BANK_TRANSACTION_ID.name, BankSchema.SCHEMA_BANK_DATE.name
+        Rollup._fill_temp(conn, Rollup._IDS_TB_NAME, id_col, transaction_ids)
+        rows = conn.execute(f"SELECT DISTINCT {date_col} FROM {BankSchema.BANK_TB_NAME} "
+                            f"WHERE {id_col} IN (SELECT {id_col} FROM {Rollup._IDS_TB_NAME})")
+        return {row[0] for row in rows}
+
+    @staticmethod
+    def refresh_days(conn, days):
+        """
+        obj: re-aggregate the given days from the bank table, through the callers connection (and transaction)
+        """
+        date_col = BankSchema.SCHEMA_DAILY_DATE.name
+        days = {day for day in days if day is not None}
+        if not days:
+            return
+        Rollup._fill_temp(conn, Rollup._DAYS_TB_NAME, date_col, days)
+        where = f" WHERE {date_col} IN (SELECT {date_col} FROM {Rollup._DAYS_TB_NAME})"
+        conn.execute(f"DELETE FROM {BankSchema.BANK_DAILY_TB_NAME}{where}")
+        conn.execute(Rollup._aggregate_query(where))
+        logger.debug(f'Refreshed {len(days)} days of the {BankSchema.BANK_DAILY_TB_NAME} rollup.')
+
+    @staticmethod
+    def rebuild(conn):
+        """
+        obj: re-aggregate the whole bank table
+        """
+        conn.execute(f"DELETE FROM {BankSchema.BANK_DAILY_TB_NAME}")
+        conn.execute(Rollup._aggregate_query(''))
+
+    @staticmethod
+    def monthly_category_totals(date_range, db_path=files['base_db']):
+        """
+        obj: number of the amounts and the total of the positive and of the negative amounts per (year, month,
+        inc_or_exp, c1) within `date_range`, a single grouped query that both the top categories and the monthly
+        sums can be derived from
+        :return: list - (YYYY-MM, inc_or_exp, category, frequency, income, expenses) tuples
+        """
+        date_col, inc_or_exp = BankSchema.SCHEMA_DAILY_DATE.name, BankSchema.SCHEMA_DAILY_INC_OR_EXP.name
+        c1, count = BankSchema.SCHEMA_DAILY_C1.name, BankSchema.SCHEMA_DAILY_AMOUNT_COUNT.name
+        pos_sum, neg_sum = BankSchema.SCHEMA_DAILY_AMOUNT_POS_SUM.name, BankSchema.SCHEMA_DAILY_AMOUNT_NEG_SUM.name
+        query = f"SELECT SUBSTR({date_col}, 1, 7) AS month, {inc_or_exp}, {c1}, SUM({count}), TOTAL({pos_sum}), " \
+            f"TOTAL({neg_sum})\n" \
+            f"FROM {BankSchema.BANK_DAILY_TB_NAME}\n" \
+            f"WHERE {date_col} BETWEEN ? AND ?\n" \
+            f"GROUP BY month, {inc_or_exp}, {c1}"
+        return SqliteHelper.query(query, db_path, (str(date_range.start), str(date_range.end)))
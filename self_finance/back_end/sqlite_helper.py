@@ -1,16 +1,96 @@
 import logging
 import os
 import sqlite3
+import threading
+from contextlib import contextmanager
 from numbers import Number
 
 import pandas as pd
 
 from config.files import ROOT
+from self_finance.back_end.query import Query
+from self_finance.constants import Sqlite
 
 log = logging.getLogger(__name__)
 
 
 class SqliteHelper:
+    # pooled connections keyed by (thread id, db path), every thread owns its own connection
+    _pool = {}
+    _pool_lock = threading.Lock()
+    _pool_pid = os.getpid()
+    # total number of connections opened by this process, useful for profiling
+    connections_opened = 0
+
+    @staticmethod
+    def _open(db_path):
+        """
+        obj: open and tune a new connection
+        """
+        # note: the pool hands a connection to a single thread only, but it may be closed by another
+        conn = sqlite3.connect(db_path, check_same_thread=False, cached_statements=Sqlite.CACHED_STATEMENTS)
+        conn.execute(f"PRAGMA journal_mode={Sqlite.JOURNAL_MODE}")
+        conn.execute(f"PRAGMA synchronous={Sqlite.SYNCHRONOUS}")
+        conn.execute(f"PRAGMA cache_size={Sqlite.CACHE_SIZE}")
+        conn.execute(f"PRAGMA mmap_size={Sqlite.MMAP_SIZE}")
+        SqliteHelper.connections_opened += 1
+        return conn
+
+    @staticmethod
+    def _prune():
+        """
+        obj: close the pooled connections of threads that are no longer alive, caller holds the pool lock
+        """
+        alive = {t.ident for t in threading.enumerate()}
+        for key in [key for key in SqliteHelper._pool if key[0] not in alive]:
+            SqliteHelper._pool.pop(key).close()
+
+    @staticmethod
+    def connect(db_path):
+        """
+        obj: return the calling thread's pooled connection to `db_path`, opening one if needed.
+        when pooling is disabled every call opens a new connection, which the caller must close
+        """
+        if not Sqlite.POOL_CONNECTIONS:
+            return SqliteHelper._open(db_path)
+        key = (threading.get_ident(), db_path)
+        with SqliteHelper._pool_lock:
+            # connections are not safe to share with a forked process, start over with a new pool
+            if SqliteHelper._pool_pid != os.getpid():
+                SqliteHelper._pool, SqliteHelper._pool_pid = {}, os.getpid()
+            conn = SqliteHelper._pool.get(key)
+            if conn is None:
+                SqliteHelper._prune()
+                conn = SqliteHelper._pool[key] = SqliteHelper._open(db_path)
+        return conn
+
+    @staticmethod
+    def close_all():
+        """
+        obj: close every pooled connection, for example before the database file is removed
+        """
+        with SqliteHelper._pool_lock:
+            for conn in SqliteHelper._pool.values():
+                conn.close()
+            SqliteHelper._pool = {}
+
+    @staticmethod
+    @contextmanager
+    def transaction(db_path):
+        """
+        obj: connection that commits once the block exits cleanly and rolls back otherwise
+        """
+        conn = SqliteHelper.connect(db_path)
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            if not Sqlite.POOL_CONNECTIONS:
+                conn.close()
+
     @staticmethod
     def execute_sqlite(q_str_or_file, db_path, delimiter=';', as_dataframe=False):
         """
@@ -29,6 +109,63 @@ class SqliteHelper:
             return SqliteHelper._execute_sql_from_string(db_path=db_path, query_string=q_str_or_file,
                                                          delimiter=delimiter, as_dataframe=as_dataframe)
 
+    @staticmethod
+    def query(query, db_path, params=(), as_dataframe=False):
+        """
+        obj: execute a single parameterized query, see `Query` for building one
+        :param query: str - query with `?` placeholders
+        :param params: sequence - values bound to the placeholders
+        :return: list of row tuples, or a dataframe
+        """
+        with SqliteHelper.transaction(db_path) as conn:
+            if as_dataframe:
+                return pd.read_sql_query(query, conn, params=params)
+            return conn.execute(query, params).fetchall()
+
+    @staticmethod
+    def execute_many(query, seq_of_params, db_path):
+        """
+        obj: execute a single parameterized statement once per parameter set, within one transaction
+        :return: int - number of modified rows
+        """
+        with SqliteHelper.transaction(db_path) as conn:
+            return conn.executemany(query, seq_of_params).rowcount
+
+    @staticmethod
+    def migrate(migrations_dir, db_path):
+        """
+        obj: apply the numbered migrations (`<number>_<name>.sql`) in `migrations_dir` that are newer than the
+        database's user_version. every migration is applied together with its version bump in one transaction
+        :return: int - the database version after migrating
+        """
+        conn = SqliteHelper.connect(db_path)
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            migrations = sorted((int(fn.split('_')[0]), fn) for fn in os.listdir(migrations_dir) if fn.endswith('.sql'))
+            for number, fn in migrations:
+                if number <= version:
+                    continue
+                log.info(f'Applying database migration {fn}.')
+                with open(os.path.join(migrations_dir, fn), 'r') as sqlite_file:
+                    script = sqlite_file.read()
+                try:
+                    conn.executescript(f"BEGIN;\n{script}\nPRAGMA user_version={number};\nCOMMIT;")
+                except Exception:
+                    conn.rollback()
+                    raise
+                version = number
+        finally:
+            if not Sqlite.POOL_CONNECTIONS:
+                conn.close()
+        return version
+
+    @staticmethod
+    def explain_query_plan(query, db_path, params=()):
+        """
+        obj: sqlite's plan for a query, one line of detail per step (e.g. `SEARCH bank USING INDEX ...`)
+        """
+        return [row[-1] for row in SqliteHelper.query(f"EXPLAIN QUERY PLAN {query}", db_path, params)]
+
     @staticmethod
     def _execute_sql_from_file(**kwargs):
         """
@@ -44,30 +181,27 @@ class SqliteHelper:
         """
         obj: execute sql string, kwargs taken from `execute_sql_from_file`
         """
-        conn = sqlite3.connect(kwargs.get('db_path'))
-        c = conn.cursor()
-
-        # automatically handle multiple queries
-        ret = []
-        query_string = kwargs.get('query_string')
-        # only delimit the query if specified to do so
-        query_strings = query_string.split(kwargs.get('delimiter')) if kwargs.get('delimiter') else [query_string]
+        with SqliteHelper.transaction(kwargs.get('db_path')) as conn:
+            c = conn.cursor()
 
-        # filter an invalid queries
-        query_strings = [q for q in query_strings if q]
+            # automatically handle multiple queries
+            ret = []
+            query_string = kwargs.get('query_string')
+            # only delimit the query if specified to do so
+            query_strings = query_string.split(kwargs.get('delimiter')) if kwargs.get('delimiter') else [query_string]
 
-        for query_str in query_strings:
-            # make a standard query, or store as dataframe
-            if kwargs.get('as_dataframe'):
-                _df = pd.read_sql_query(query_str, conn)
-                ret.append(_df)
-            else:
-                query_result = c.execute(query_str)
-                if query_result.rowcount > 0:
-                    ret.append(query_result)
+            # filter an invalid queries
+            query_strings = [q for q in query_strings if q]
 
-        conn.commit()
-        conn.close()
+            for query_str in query_strings:
+                # make a standard query, or store as dataframe
+                if kwargs.get('as_dataframe'):
+                    _df = pd.read_sql_query(query_str, conn)
+                    ret.append(_df)
+                else:
+                    query_result = c.execute(query_str)
+                    if query_result.rowcount > 0:
+                        ret.append(query_result)
 
         # gracefully handle returns
         return ret[0] if len(ret) == 1 else ret
@@ -80,3 +214,37 @@ class SqliteHelper:
             return value
         elif value is None:
             return "NULL"
+
+    @staticmethod
+    def df_to_rows(df):
+        """
+        obj: lazily convert a dataframe into rows that sqlite3 is able to bind, missing values become NULL
+        """
+        columns = []
+        for column_name in df.columns:
+            values = df[column_name].values.astype(object)
+            values[pd.isnull(values)] = None
+            columns.append(values)
+        return zip(*columns)
+
+    @staticmethod
+    def upsert_many(conn, table_name, column_names, rows, key_column):
+        """
+        obj: bulk upsert `rows` into `table_name` through the callers connection (and transaction), rows
+        whose `key_column` collides with an existing row update it in place and everything else is inserted
+        :param column_names: list - column name of every position within a row
+        :param rows: iterable - rows as returned by `df_to_rows`, keys are expected to be unique
+        :param key_column: str - primary key of the table
+        :return: (int, int) - number of inserted and updated rows
+        """
+        rows = list(rows)
+        key_index = list(column_names).index(key_column)
+        keys = [row[key_index] for row in rows]
+        # only the keys of the rows at hand are looked up, rather than counting the whole table
+        n_existing = 0
+        for i in range(0, len(keys), Sqlite.MAX_BOUND_VALUES):
+            batch = keys[i:i + Sqlite.MAX_BOUND_VALUES]
+            sql_query = Query.select_in(table_name, key_column, len(batch), columns=(key_column,))
+            n_existing += len(conn.execute(sql_query, batch).fetchall())
+        conn.executemany(Query.upsert(table_name, tuple(column_names), key_column), rows)
+        return len(rows) - n_existing, n_existing
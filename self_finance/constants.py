@@ -36,6 +36,43 @@ class App:
     PLAID_SECRET_ENV_VAR_KEY = 'PLAID_SECRET'
 
 
+class Sqlite:
+    # keep one open connection per thread rather than opening one for every query
+    POOL_CONNECTIONS = True
+    JOURNAL_MODE = 'WAL'
+    SYNCHRONOUS = 'NORMAL'
+    # negative values are in KiB, so ~64MB of page cache per connection
+    CACHE_SIZE = -64000
+    MMAP_SIZE = 256 * 1024 * 1024
+    # prepared statements kept per connection, keyed by the query text
+    CACHED_STATEMENTS = 256
+    # bound values per statement, the default limit of older sqlite versions
+    MAX_BOUND_VALUES = 999
+
+
+class Plaid:
+    # transactions per request, the maximum plaid allows
+    PAGE_SIZE = 500
+    # number of pages requested at once per item, once the total number of transactions is known
+    SYNC_WORKERS = 4
+    # number of items synced at once
+    ITEM_WORKERS = 4
+    # days before the watermark that are synced over again, for the transactions that post late. those already
+    # merged are updated in place (by their transaction id)
+    SYNC_OVERLAP_DAYS = 14
+
+
+class Jobs:
+    # number of background jobs run at once
+    WORKERS = 2
+    # jobs of a lower priority (higher value) only run once no other job is queued
+    PRIORITY = 0
+    LOW_PRIORITY = 10
+    # finished jobs kept around for their progress to be polled, the oldest are forgotten first
+    MAX_FINISHED = 100
+    POLL_MILLISECONDS = 500
+
+
 class Defaults:
     DATE_RANGE_START_DEFAULT = '5 months ago'
     DATE_RANGE_END_DEFAULT = 'today'
@@ -48,18 +85,37 @@ class Flash:
 
 class Visuals:
     HM_START_LAT_LON = [36.778259, -119.417931]
-    PLOT_MAX_THREADS = 10
+    # number of processes that plots are rendered by, 1 renders them within the application process
+    PLOT_WORKERS = 4
+    # start method of the rendering processes, spawn where it is not available
+    PLOT_START_METHOD = 'forkserver'
+    # the plots of the default and of this many of the most recently drawn date ranges are drawn ahead of time
+    # after every change of the data, by this many processes, once the data has not changed for a few seconds
+    PLOT_WARM_RECENT_RANGES = 3
+    PLOT_WARM_WORKERS = 1
+    PLOT_WARM_QUIET_SECONDS = 2
+    # default point budget per line of the time series plots, lines with more points are downsampled
+    PLOT_MAX_POINTS = 500
+    # upper bound on the plot html kept in memory in front of the plot cache table
+    PLOT_MEMORY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    # upper bound on the (compressed) plot html in the plot cache table, least recently used plots go first
+    PLOT_CACHE_MAX_BYTES = 128 * 1024 * 1024
+    # plots that have not been looked at for this long are dropped from the plot cache table
+    PLOT_CACHE_TTL_DAYS = 30
+    PLOT_CACHE_COMPRESSION_LEVEL = 6
 
 
 class Data:
     FILE_NAME_DOWNLOAD = 'bank_data.csv'
     BANK_DATA_TABLE_ID = 'bank_data_df'
+    # number of csv rows preprocessed and merged at a time when streaming an upload
+    IMPORT_CHUNK_ROWS = 5000
+    # rows of the data table fetched per page, and the most a single request may ask for
+    TABLE_PAGE_ROWS = 25
+    TABLE_PAGE_MAX_ROWS = 500
 
 
 class Insights:
-    # 15 days -- TODO - this is hard hack between it assumes the interview of the static plots (which are 1 months time)
-    STATIC_TIME_CACHE_REFRESH_MINUTES = 1 * 60 * 60 * 24 * 15
-
     BANK_SUMMARY_TABLE_ID = 'bank_summary_df'
     TOP_INC_TABLE_ID = 'top_inc_df'
     TOP_EXP_TABLE_ID = 'top_exp_df'
@@ -84,6 +140,12 @@ class BankSchema:
     LOCATION_TB_NAME = 'location'
     PAYMENT_META_TB_NAME = 'payment_meta'
     PLOT_CACHE_TB_NAME = 'plot_cache'
+    PLAID_SYNC_TB_NAME = 'plaid_sync'
+    # rollups of the bank table, see `Rollup`
+    BANK_DAILY_TB_NAME = 'bank_daily'
+    # hidden, so it survives truncating all of the tables
+    _DATA_VERSION_TB_NAME = 'data_version'
+    _PLAID_ITEM_TB_NAME = 'plaid_item'
 
     # original table - untouched
     SCHEMA_FULL_ACCOUNT_ID = Schema('account_id', str)
@@ -134,13 +196,42 @@ class BankSchema:
     SCHEMA_PAYMENT_META_REASON = Schema('reason', str)
     SCHEMA_PAYMENT_META_TRANSACTION_ID = Schema('transaction_id', int)
 
+    # daily rollup of the bank table, keyed by (date, account_id, inc_or_exp, c1, c2)
+    SCHEMA_DAILY_ACCOUNT_ID = Schema('account_id', str)
+    SCHEMA_DAILY_AMOUNT_COUNT = Schema('amount_count', int)
+    SCHEMA_DAILY_AMOUNT_MAX = Schema('amount_max', float)
+    SCHEMA_DAILY_AMOUNT_MIN = Schema('amount_min', float)
+    SCHEMA_DAILY_AMOUNT_NEG_SUM = Schema('amount_neg_sum', float)
+    SCHEMA_DAILY_AMOUNT_POS_SUM = Schema('amount_pos_sum', float)
+    SCHEMA_DAILY_AMOUNT_SUM = Schema('amount_sum', float)
+    SCHEMA_DAILY_C1 = Schema('c1', str)
+    SCHEMA_DAILY_C2 = Schema('c2', str)
+    SCHEMA_DAILY_DATE = Schema('date', str)
+    SCHEMA_DAILY_INC_OR_EXP = Schema('inc_or_exp', str)
+
     # plot cache
+    SCHEMA_PLOT_CACHE_DATA_VERSION = Schema('data_version', int)
     SCHEMA_PLOT_CACHE_END_DATE = Schema('end_date', str)
     SCHEMA_PLOT_CACHE_FULL_TITLE = Schema('full_title', str)
-    SCHEMA_PLOT_CACHE_HTML = Schema('html', str)
-    SCHEMA_PLOT_CACHE_LOOKUP_DATE = Schema('lookup_date', str)
+    SCHEMA_PLOT_CACHE_HTML = Schema('html', bytes)
+    SCHEMA_PLOT_CACHE_SIZE = Schema('size', int)
     SCHEMA_PLOT_CACHE_START_DATE = Schema('start_date', str)
     _SCHEMA_PLOT_CACHE_TIMESTAMP = Schema('timestamp', str)
+    _SCHEMA_PLOT_CACHE_LAST_ACCESS = Schema('last_access', str)
+
+    # plaid sync watermark per item
+    SCHEMA_PLAID_SYNC_ITEM_ID = Schema('item_id', str)
+    SCHEMA_PLAID_SYNC_SYNCED_AT = Schema('synced_at', str)
+    SCHEMA_PLAID_SYNC_WATERMARK = Schema('watermark', str)
+
+    # linked plaid items
+    _SCHEMA_PLAID_ITEM_ACCESS_TOKEN = Schema('access_token', str)
+    _SCHEMA_PLAID_ITEM_CREATED_AT = Schema('created_at', str)
+    _SCHEMA_PLAID_ITEM_ITEM_ID = Schema('item_id', str)
+
+    # data version
+    _SCHEMA_DATA_VERSION_ID = Schema('id', int)
+    _SCHEMA_DATA_VERSION_VERSION = Schema('version', int)
 
     # misc
     # note - this date format is nessessary for datetime to be able to parse
@@ -158,6 +249,8 @@ class BankSchema:
             BankSchema.PAYMENT_META_TB_NAME: 'SCHEMA_PAYMENT_META',
             BankSchema.BANK_TB_NAME: 'SCHEMA_BANK',
             BankSchema.PLOT_CACHE_TB_NAME: 'SCHEMA_PLOT_CACHE',
+            BankSchema.BANK_DAILY_TB_NAME: 'SCHEMA_DAILY',
+            BankSchema.PLAID_SYNC_TB_NAME: 'SCHEMA_PLAID_SYNC',
             'all_tables': 'TB_NAME'
         }[key]
 
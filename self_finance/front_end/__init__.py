@@ -9,5 +9,5 @@ bootstrap = Bootstrap(app)
 app.secret_key = App.SECRET_KEY
 app._static_folder = dirs['static']
 
-from self_finance.front_end.routes import index, data, insights, visuals, settings, reference
+from self_finance.front_end.routes import index, data, insights, visuals, settings, reference, jobs
 from self_finance.front_end.routes import errors
@@ -1,6 +1,7 @@
 from flask import flash
 
 from self_finance.back_end.date_range import DateRange
+from self_finance.back_end.jobs import JobRunner
 from self_finance.constants import Flash
 
 
@@ -11,3 +12,11 @@ def valid_dr(start, end):
     except KeyError:
         flash(Flash.DATE_RANGE_FILTER_KEY_ERROR.msg, Flash.DATE_RANGE_FILTER_KEY_ERROR.type)
         return False
+
+
+def flash_finished_jobs():
+    """
+    obj: flash the messages of the background jobs that finished since the last rendered page
+    """
+    for message, category in JobRunner.pop_messages():
+        flash(message, category)
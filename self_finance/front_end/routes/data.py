@@ -1,24 +1,25 @@
-import io
+import json
 import logging
 import os
 import tempfile
 
 import pandas as pd
-from flask import render_template, request, flash, send_from_directory
+from flask import render_template, request, flash, jsonify, send_from_directory, url_for
 from werkzeug.utils import secure_filename
 
+from config.files import dirs
 from self_finance.back_end.data import Data
 from self_finance.back_end.date_range import DateRange
-from self_finance.back_end.insights.html_helper import HTMLHelper
+from self_finance.back_end.jobs import JobRunner
 from self_finance.constants import Data as ConstData
 from self_finance.constants import Defaults
+from self_finance.constants import Html
 from self_finance.constants import BankSchema
 from self_finance.constants import Schema
 from self_finance.front_end import app
+from self_finance.front_end.routes.commons import flash_finished_jobs
 from self_finance.front_end.routes.commons import valid_dr
-from self_finance.front_end.routes.insights import refresh_dynamic_insights
-from self_finance.front_end.routes.insights import refresh_static_insights
-from self_finance.front_end.routes.settings import invalidate_cache
+from self_finance.front_end.routes.state import LazyState
 from self_finance.front_end.routes.state import State
 
 logger = logging.getLogger(__name__)
@@ -28,19 +29,26 @@ class DataState(State):
     order_by_column_name = BankSchema.SCHEMA_BANK_DATE.name
     order_by = Defaults.ORDER_BY_DEFAULT
 
-    html_df = HTMLHelper.as_html_form_from_sql(
-        BankSchema.BANK_TB_NAME, DateRange(State.date_range_start, State.date_range_end),
-        order_by_column_name, order_by, table_id=ConstData.BANK_DATA_TABLE_ID)
+    @LazyState
+    def row_count(cls):
+        return Data.count_rows(DateRange(State.date_range_start, State.date_range_end), BankSchema.BANK_TB_NAME)
 
     @staticmethod
     def as_dict():
         return State.as_dict_helper(DataState, ConstData)
 
 
-def _standard_render():
-    if not DataState.html_df or len(DataState.html_df) == 0:
+def _standard_render(job=None):
+    """
+    :param job: Job - background job submitted by the request, its progress is shown until it finishes
+    """
+    flash_finished_jobs()
+    if not DataState.row_count:
         flash('No data was found in the database table.', 'warning')
-    return render_template("data.html", data_table_id=ConstData.BANK_DATA_TABLE_ID, **DataState.as_dict())
+    return render_template("data.html", data_table_id=ConstData.BANK_DATA_TABLE_ID,
+                           data_table_classes=' '.join(Html.BANK_DATA_TABLE_BS_CLASSES),
+                           job=job.as_dict() if job is not None else None, job_done_url=url_for('data'),
+                           **DataState.as_dict())
 
 
 @app.route('/data')
@@ -48,12 +56,6 @@ def data():
     return _standard_render()
 
 
-def update_html_df():
-    DataState.html_df = HTMLHelper.as_html_form_from_sql(
-        BankSchema.BANK_TB_NAME, DateRange(State.date_range_start, State.date_range_end),
-        DataState.order_by_column_name, DataState.order_by, table_id=ConstData.BANK_DATA_TABLE_ID)
-
-
 @app.route('/data/data_query', methods=['POST', 'GET'])
 def data_query():
     if request.method == 'POST':
@@ -69,16 +71,9 @@ def data_query():
         if not valid_dr(drs, dre):
             return _standard_render()
 
-        # update data range and order by states
+        # update data range and order by states, the table is re-rendered on its next access
         DataState.order_by_column_name, DataState.order_by = obcn, o
         State.date_range_start, State.date_range_end = drs, dre
-
-        # combine everything together
-        try:
-            update_html_df()
-        except KeyError:
-            flash(f'Invalid column name {DataState.order_by_column_name}', 'danger')
-            return _standard_render()
         flash(f'Data filtered between dates {State.date_range_start} and {State.date_range_end}.\n'
               f'{BankSchema.BANK_TB_NAME} table has had its order updated by '
               f'{DataState.order_by_column_name} {DataState.order_by}', 'info')
@@ -96,47 +91,71 @@ def data_upload():
             if not f or not fn.endswith('.csv'):
                 flash('Not an identified CSV file.', 'warning')
             else:
-                try:
-                    stream = io.StringIO(f.stream.read().decode("UTF8"), newline=None)
-                    stream.seek(0)
-                    input_df = pd.read_csv(stream, index_col=False)
-                    # TODO - necessary?
-                    # input_df = Data.cast_df_to_schema(input_df, Schema.BANK_TB_NAME)
-                    Data.merge(input_df)
-                    update_html_df()
-                    # to ensure visuals and insights take in the most up to date information
-                    invalidate_cache(flash=False)
-                    refresh_dynamic_insights()
-                    refresh_static_insights(ignore_clock=True)
-                except IOError as e:
-                    flash(f'Unable to parse file. {e}', 'warning')
-                flash('Awesome! File processed successfully.', 'success')
+                # the request stream is gone once the request returns, so the upload is spooled to disk and
+                # merged from there in the background
+                fd, csv_path = tempfile.mkstemp(suffix='.csv', dir=dirs['data_scratch'])
+                os.close(fd)
+                f.save(csv_path)
+                job = JobRunner.submit(f'Merging {fn}', lambda job: _merge_upload(job, csv_path))
+                return _standard_render(job)
     return _standard_render()
 
 
-@app.route('/data/update', methods=['POST', 'GET'])
+def _merge_upload(job, csv_path):
+    """
+    obj: background job of `data_upload`, merges the spooled csv file in bounded chunks and then removes it
+    """
+    try:
+        with open(csv_path, encoding='utf8') as stream:
+            row_counts = Data.merge_stream(stream, progress=lambda n_rows: job.progress(
+                n_rows, message=f'{n_rows} rows merged'))
+    except (IOError, UnicodeDecodeError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        job.report(f'Unable to parse file. {e}', 'warning')
+        return None
+    finally:
+        os.remove(csv_path)
+    bank_counts = row_counts.get(BankSchema.BANK_TB_NAME, {})
+    job.report(f"Awesome! File processed successfully. {bank_counts.get('inserted', 0)} new and "
+               f"{bank_counts.get('updated', 0)} updated transactions were merged.", 'success')
+    return row_counts
+
+
+@app.route('/data/page', methods=['GET'])
+def data_page():
+    """
+    obj: a page of the data table as json, in the current date range and order. the `after` argument is the json
+    encoded `after` of the previous page, and is left out for the first page
+    """
+    after = json.loads(request.args['after']) if request.args.get('after') else None
+    page_size = max(1, min(request.args.get('page_size', ConstData.TABLE_PAGE_ROWS, type=int),
+                           ConstData.TABLE_PAGE_MAX_ROWS))
+    try:
+        page = Data.get_table_page(DateRange(State.date_range_start, State.date_range_end), BankSchema.BANK_TB_NAME,
+                                   DataState.order_by_column_name, DataState.order_by, after, page_size)
+    except Exception as e:
+        logger.warning(f'Unable to read a page of the {BankSchema.BANK_TB_NAME} table. {e}')
+        return jsonify(error=str(e)), 400
+    return jsonify(total=DataState.row_count, **page)
+
+
+@app.route('/data/update', methods=['POST'])
 def data_update():
-    if request.method == 'POST':
-        form = request.form
-        update_df = pd.read_html(form['hidden_post_name'], header=0, index_col=0, parse_dates=True)[0]
-        update_df = Data.cast_df_to_schema(update_df, BankSchema.BANK_TB_NAME)
-        Data.merge(update_df)
-        update_html_df()
-        invalidate_cache(flash=False)
-        refresh_dynamic_insights()
-        refresh_static_insights(ignore_clock=True)
-        flash('Data updated with new csv.', 'info')
-    return _standard_render()
+    """
+    obj: apply the edited cells of the data table, posted as json {"changes": [{"transaction_id": id, column name:
+    new value}]} with only the edited columns of every edited row
+    """
+    changes = (request.get_json(silent=True) or {}).get('changes') or []
+    try:
+        updated = Data.update_cells(changes)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(updated=updated)
 
 
 @app.route('/data/truncate', methods=['POST', 'GET'])
 def data_truncate():
     if request.method == 'POST':
         Data.truncate_all_tables()
-        DataState.html_df = None
-        invalidate_cache(flash=False)
-        refresh_dynamic_insights()
-        refresh_static_insights(ignore_clock=True)
         flash(f"{BankSchema.BANK_TB_NAME} table has been fully truncated from the base database.", 'info')
     return _standard_render()
 
@@ -1,22 +1,17 @@
-import datetime
 import logging
 import os
 
-import dateparser
-import pandas as pd
 import plaid
 from flask import jsonify
-from flask import render_template, request, flash
+from flask import render_template, request, url_for
 
-from config.files import files
-from self_finance.back_end.data import Data
-from self_finance.constants import BankSchema
+from self_finance.back_end.jobs import JobRunner
+from self_finance.back_end.plaid_sync import PlaidSync
 from self_finance.constants import App
+from self_finance.constants import BankSchema
 from self_finance.front_end import app
+from self_finance.front_end.routes.commons import flash_finished_jobs
 from self_finance.front_end.routes.state import State
-from self_finance.front_end.routes.data import update_html_df
-from self_finance.front_end.routes.insights import refresh_static_insights
-from self_finance.front_end.routes.insights import refresh_dynamic_insights
 
 
 logger = logging.getLogger(__name__)
@@ -30,15 +25,20 @@ class BankState(State):
     PLAID_PRODUCTS = 'transactions'
     client = plaid.Client(client_id=PLAID_CLIENT_ID, secret=PLAID_SECRET,
                           public_key=PLAID_PUBLIC_KEY, environment=PLAID_ENV)
-    access_token = None
 
 
-def _standard_render():
+def _standard_render(job=None):
+    """
+    :param job: Job - background job submitted by the request, its progress is shown until it finishes
+    """
+    flash_finished_jobs()
     return render_template(
         'index.html',
         plaid_public_key=BankState.PLAID_PUBLIC_KEY,
         plaid_environment=BankState.PLAID_ENV,
-        plaid_products=BankState.PLAID_PRODUCTS
+        plaid_products=BankState.PLAID_PRODUCTS,
+        job=job.as_dict() if job is not None else None,
+        job_done_url=url_for('index')
     )
 
 
@@ -51,71 +51,54 @@ def index():
 @app.route('/index/update_transactions', methods=['POST'])
 def get_access_token_and_update_transaction_history():
     """
-    obj: exchange token flow - exchange a Link public_token for an API access_token
+    obj: exchange token flow - exchange a Link public_token for an API access_token, link its item, and then
+    sync every linked item in the background
+    :return: json - the sync job, or the plaid error
     """
-    if BankState.access_token is None:
-        public_token = request.form['public_token']
-        try:
-            exchange_response = BankState.client.Item.public_token.exchange(public_token)
-        except plaid.errors.PlaidError as e:
-            flash(jsonify(format_error(e)), 'warning')
-            return _standard_render()
-        BankState.access_token = exchange_response['access_token']
-    else:
-        flash('Unable to obtain access token for data.', 'warning')
-        return _standard_render()
-    return update_transaction_history()
+    public_token = request.form['public_token']
+    try:
+        exchange_response = BankState.client.Item.public_token.exchange(public_token)
+    except plaid.errors.PlaidError as e:
+        return jsonify(format_error(e)), 400
+    PlaidSync.add_item(exchange_response['item_id'], exchange_response['access_token'])
+    return jsonify(_submit_sync().as_dict())
 
 
+@app.route('/index/sync', methods=['POST'])
 def update_transaction_history():
-    mrtd_org = Data.get_most_recent_transaction_date(BankSchema.BANK_TB_NAME, files['base_db'])
-    mrtd = BankSchema.DATE_FORMAT.format(dateparser.parse(mrtd_org).date()) if mrtd_org else BankSchema.DATE_FORMAT.format(
-        datetime.date.min)
-
-    # update on transactions only following the mrtd
-    start_date, end_date = mrtd, BankSchema.DATE_FORMAT.format(datetime.datetime.now())
-    full_df = get_transactions(start_date, end_date)
-
-    # TODO - this stuff isn't getting flashed
-    p1 = 'Successfully updated your bank to the latest transaction history.'
-    p2 = '\nNo previous data was found in your database so your entire transactions history was applied.'
-    p3 = f'\nFrom date {str(start_date)} to {str(end_date)}.'
-    p4 = f'No new transactions have been found.'
-    try:
-        if full_df is None or full_df.shape[0] == 0:
-            flash(p4, 'info')
-            return _standard_render()
-        logger.info(f'Merging transactions into {BankSchema.BANK_TB_NAME} database.')
-        Data.merge(full_df, files['base_db'])
-        if not mrtd_org:
-            flash(p1 + p2, 'info')
-        else:
-            flash(p1 + p3, 'info')
-    except Exception as e:
-        flash(e, 'warning')
-
-    # update data-state on /date end
-    if full_df is not None and full_df.shape[0] > 0:
-        # note: need to run from `as_html_form_from_sql` because of the
-        # additional preprocessing that is handled in merge operation
-        update_html_df()
-        refresh_static_insights()
-        refresh_dynamic_insights()
-    return _standard_render()
+    """
+    obj: sync the transactions of every linked item (institution) in the background
+    """
+    return _standard_render(_submit_sync())
+
 
+def _submit_sync():
+    # note: a sync requested while one is queued is coalesced into it. one requested while a sync runs (which
+    # may have read the linked items already) is run once more after it, see `JobRunner.submit`
+    return JobRunner.submit('Syncing transactions', _sync, key='plaid_sync')
 
-def get_transactions(start_date, end_date):
-    response = BankState.client.Transactions.get(BankState.access_token, start_date=start_date, end_date=end_date)
-    transactions = response['transactions']
 
-    # the transactions in the response are paginated, so make multiple calls while increasing the offset to
-    # retrieve all transactions
-    while len(transactions) < response['total_transactions']:
-        response = BankState.client.Transactions.get(BankState.access_token, start_date=start_date, end_date=end_date,
-                                                     offset=len(transactions)
-                                                     )
-        transactions.extend(response['transactions'])
-    return pd.DataFrame.from_dict(transactions)
+def _sync(job):
+    """
+    obj: background job of the sync routes, syncs every linked item at once
+    """
+    summaries = PlaidSync.sync_all(BankState.client, progress=lambda n_synced, n_items, item_id: job.progress(
+        n_synced, n_items, f'Synced item {item_id}' if item_id else None))
+    if not summaries:
+        job.report('No bank has been linked yet.', 'warning')
+    for summary in summaries:
+        if 'error' in summary:
+            job.report(f"Unable to sync item {summary['item_id']}. {summary['error']}", 'warning')
+        elif not summary['transactions']:
+            job.report(f"No new transactions have been found for item {summary['item_id']}.", 'info')
+        else:
+            bank_counts = summary['row_counts'].get(BankSchema.BANK_TB_NAME, {})
+            job.report(f"Successfully updated item {summary['item_id']} to the latest transaction history, from "
+                       f"date {summary['start_date']} to {summary['end_date']}. {bank_counts.get('inserted', 0)} "
+                       f"new and {bank_counts.get('updated', 0)} updated transactions in "
+                       f"{summary['seconds']:.1f}s.", 'info')
+    # note: the data and insights states are recomputed on their next access, now that the data version changed
+    return summaries
 
 
 def format_error(e):
@@ -0,0 +1,26 @@
+import logging
+
+from flask import jsonify
+
+from self_finance.back_end.jobs import JobRunner
+from self_finance.constants import Jobs
+from self_finance.front_end import app
+
+logger = logging.getLogger(__name__)
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_progress(job_id):
+    """
+    obj: the status and progress of a background job as json, polled by the page that submitted it
+    """
+    job = JobRunner.get(job_id)
+    if job is None:
+        return jsonify(error=f'Unknown job {job_id}.'), 404
+    return jsonify(job.as_dict())
+
+
+@app.context_processor
+def job_progress_constants():
+    # note: the job progress is part of the base template, so every page needs these
+    return {'POLL_MILLISECONDS': Jobs.POLL_MILLISECONDS}
@@ -3,13 +3,15 @@ import logging
 from flask import render_template, request, flash
 
 from self_finance.back_end.data import Data
+from self_finance.back_end.plot_cache import PlotCache
 from self_finance.front_end import app
 
 logger = logging.getLogger(__name__)
 
 
 def _standard_render():
-    return render_template("settings.html")
+    return render_template("settings.html", plot_cache_stats=PlotCache.stats(),
+                           plot_cache_disk_stats=PlotCache.disk_stats())
 
 
 @app.route('/settings')
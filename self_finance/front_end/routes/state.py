@@ -1,14 +1,90 @@
+import logging
+import threading
+
+from self_finance.back_end.data_version import DataVersion
+from self_finance.back_end.date_range import DateRange
 from self_finance.constants import Defaults
 
+logger = logging.getLogger(__name__)
+
+
+class LazyState:
+    """
+    obj: memoized class attribute of a route state, computed on first access rather than when the state class
+    is defined (at import). the value is recomputed once the data version or the dates of the date range change
+    (a relative range such as '5 months ago' moves along with the days), or once `depends_on` of the state class
+    does, so routes never have to refresh it themselves. a render reads the data version once for every lazy
+    state it shows, see `State.as_dict_helper`
+    """
+
+    def __init__(self, func, depends_on=None):
+        """
+        :param func: callable - computes the value from the state class
+        :param depends_on: callable - hashable value of the state class that the value also depends on
+        """
+        self.func = func
+        self.depends_on = depends_on
+        self._lock = threading.Lock()
+        self._key = None
+        self._value = None
+
+    @staticmethod
+    def depending_on(depends_on):
+        """
+        obj: decorator form of a lazy state that also depends on `depends_on`
+        """
+        return lambda func: LazyState(func, depends_on)
+
+    @staticmethod
+    def current_key():
+        """
+        obj: what every lazy state depends on, read it once to get any number of lazy states with
+        :return: (int, (str, str)) - the data version and the dates of the date range
+        """
+        try:
+            data_version = DataVersion.get()
+        except Exception:
+            # e.g. there is no database to begin with
+            data_version = None
+        return data_version, State.date_range_key()
+
+    def get(self, owner, current_key=None):
+        """
+        :param current_key: tuple - `current_key`, read here if None
+        """
+        extra = self.depends_on(owner) if self.depends_on is not None else None
+        key = (current_key or LazyState.current_key(), extra)
+        with self._lock:
+            if self._key != key:
+                logger.debug(f'Computing lazy state {self.func.__name__} of {owner.__name__}.')
+                self._value, self._key = self.func(owner), key
+            return self._value
+
+    def __get__(self, instance, owner):
+        return self.get(owner)
+
 
 class State:
     date_range_start = Defaults.DATE_RANGE_START_DEFAULT
     date_range_end = Defaults.DATE_RANGE_END_DEFAULT
 
+    @staticmethod
+    def date_range_key():
+        """
+        :return: (str, str) - the absolute dates of the date range as of today, see `DateRange.key`
+        """
+        try:
+            return DateRange(State.date_range_start, State.date_range_end).key
+        except KeyError:
+            return State.date_range_start, State.date_range_end
+
     @staticmethod
     def as_dict_helper(main_class, secondary_class=None, excluded=None):
         excluded = {} if excluded is None else excluded
         secondary_class = vars(secondary_class) if secondary_class is not None else {}
-        return {k: v for k, v in {**vars(main_class), **secondary_class, **vars(State)}.items()
+        # note: lazy states are computed (or memoized) against the same data version and date range
+        current_key = LazyState.current_key()
+        return {k: v.get(main_class, current_key) if isinstance(v, LazyState) else v
+                for k, v in {**vars(main_class), **secondary_class, **vars(State)}.items()
                 if not k.startswith('_')
                 and k not in excluded}
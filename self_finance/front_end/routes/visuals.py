@@ -1,19 +1,26 @@
 import logging
 
-from flask import render_template, request, flash
+from flask import render_template, request, flash, url_for
 
 from self_finance.back_end.data import Data
+from self_finance.back_end.data_version import DataVersion
 from self_finance.back_end.date_range import DateRange
 from self_finance.back_end.insights.image_registry import ImageRegistry
+from self_finance.back_end.insights.plot_warmer import PlotWarmer
+from self_finance.back_end.jobs import JobRunner
 from self_finance.constants import Html
 from self_finance.constants import BankSchema
 from self_finance.constants import Visuals
 from self_finance.front_end import app
+from self_finance.front_end.routes.commons import flash_finished_jobs
 from self_finance.front_end.routes.commons import valid_dr
 from self_finance.front_end.routes.state import State
 
 logger = logging.getLogger(__name__)
 
+# draw the plots ahead of time after every change of the data, so that the visuals are (almost always) cached
+Data.add_change_listener(PlotWarmer.schedule)
+
 
 class VisualState(State):
     __all_plt_ids = ImageRegistry.get_all_plot_ids()
@@ -34,7 +41,11 @@ def _partition_html_and_xml_docs(image_id_to_html_map):
     return xml_docs, html_docs
 
 
-def _standard_render():
+def _standard_render(job=None):
+    """
+    :param job: Job - background job submitted by the request, its progress is shown until it finishes
+    """
+    flash_finished_jobs()
     image_id_to_html = _get_html_from_ids()
     xml_and_html_docs = {k: v for k, v in image_id_to_html.items() if v is not None}
     xml_docs, html_docs = _partition_html_and_xml_docs(xml_and_html_docs)
@@ -44,13 +55,19 @@ def _standard_render():
         plural = len(xml_and_html_docs) > 1
         flash(f'{len(xml_and_html_docs)} plot{"s" if plural else ""} {"have" if plural else "has"} been identified.',
               'info')
-    return render_template("visuals.html", vis_html=list(html_docs.values()),
-                           vis_xml=list(xml_docs.values()), **VisualState.as_dict())
+    return render_template("visuals.html", vis_html=list(html_docs.values()), vis_xml=list(xml_docs.values()),
+                           job=job.as_dict() if job is not None else None, job_done_url=url_for('visuals'),
+                           **VisualState.as_dict())
 
 
 def _get_html_from_ids():
-    return {image_id: Data.get_most_recent_html_from_id(image_id) for image_id in VisualState.plot_selections.keys()
-            if VisualState.plot_selections[image_id]}
+    """
+    obj: the selected plots as drawn for the current date range, plots that are not drawn yet are None
+    """
+    data_version = DataVersion.get()
+    start_date, end_date = State.date_range_key()
+    return {image_id: Data.get_html_from_id(image_id, start_date, end_date, data_version)
+            for image_id in VisualState.plot_selections.keys() if VisualState.plot_selections[image_id]}
 
 
 @app.route('/visuals')
@@ -70,15 +87,32 @@ def visuals_redraw():
         # update which visuals to draw and redraw them
         requested_plots_to_draw = set(ImageRegistry.get_all_plot_ids()) & set(form.keys())
         _update_requested_plots_to_draw(set(requested_plots_to_draw))
-        df = Data.get_table_as_df(DateRange(State.date_range_start, State.date_range_end),
-                                  table_name=BankSchema.BANK_TB_NAME)
-        if df is None or df.shape[0] == 0:
-            flash(f'No data int table {BankSchema.BANK_TB_NAME} produce diagrams.', 'warning')
-        else:
-            ImageRegistry.plot_all(list(requested_plots_to_draw), df, drs, dre)
+        plot_ids = sorted(requested_plots_to_draw)
+        PlotWarmer.record(drs, dre, plot_ids)
+        # the plots are drawn (and cached) by the absolute dates of the range as of today, so that however the
+        # range was written the same dates share their plots
+        start_date, end_date = DateRange(drs, dre).key
+        # note: redraws of the same plots, dates and data are coalesced into the one already queued, and one
+        # requested while it runs finds the plots it drew in the cache
+        job = JobRunner.submit('Drawing visuals', lambda job: _redraw(job, plot_ids, start_date, end_date),
+                               key=('visuals_redraw', start_date, end_date, tuple(plot_ids), DataVersion.get()))
+        return _standard_render(job)
     return _standard_render()
 
 
+def _redraw(job, plot_ids, start_date, end_date):
+    """
+    obj: background job of `visuals_redraw`, draws (and caches) every requested plot that is not cached yet
+    :param start_date: str - iso formatted, see `DateRange.key`
+    :param end_date: str - iso formatted
+    """
+    df = Data.get_table_as_df(DateRange(start_date, end_date), table_name=BankSchema.BANK_TB_NAME)
+    if df is None or df.shape[0] == 0:
+        job.report(f'No data int table {BankSchema.BANK_TB_NAME} produce diagrams.', 'warning')
+        return
+    ImageRegistry.plot_all(plot_ids, df, start_date, end_date, progress=job.progress)
+
+
 def _update_requested_plots_to_draw(requested_plots_to_draw):
     for plt_id in VisualState.plot_selections.keys():
         if plt_id in requested_plots_to_draw:
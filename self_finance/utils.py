@@ -75,6 +75,8 @@ def func_to_filename(func, params_dict, ext):
 
 def rm_db():
     from config.files import files
+    from self_finance.back_end.sqlite_helper import SqliteHelper
+    SqliteHelper.close_all()
     os.remove(files['base_db'])
 
 
@@ -48,3 +48,6 @@ CREATE TABLE IF NOT EXISTS plot_cache
     timestamp   TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
     UNIQUE (full_title, start_date, end_date, lookup_date)
 );
+
+-- left behind by the former to_sql based merge
+DROP TABLE IF EXISTS __tmp;
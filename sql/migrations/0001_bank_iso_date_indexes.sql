@@ -0,0 +1,10 @@
+-- store every bank date as a plain iso date (YYYY-MM-DD), so that range filters and ordering
+-- can be compared against the raw column and served by an index rather than wrapping it in DATE()
+UPDATE bank
+SET date = DATE(date)
+WHERE DATE(date) IS NOT NULL
+  AND date != DATE(date);
+
+CREATE INDEX IF NOT EXISTS bank_date_idx ON bank (date);
+CREATE INDEX IF NOT EXISTS bank_inc_or_exp_date_idx ON bank (inc_or_exp, date);
+CREATE INDEX IF NOT EXISTS bank_c1_date_idx ON bank (c1, date);
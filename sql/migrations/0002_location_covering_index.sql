@@ -0,0 +1,2 @@
+-- covers the spending heatmap join, which only needs the coordinates of a transaction
+CREATE INDEX IF NOT EXISTS location_transaction_id_lat_lon_idx ON location (transaction_id, lat, lon);
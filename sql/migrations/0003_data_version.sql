@@ -0,0 +1,20 @@
+-- single row counter that is bumped whenever bank data changes, plots are cached per version
+CREATE TABLE IF NOT EXISTS data_version
+(
+    id      INTEGER PRIMARY KEY CHECK (id = 0),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO data_version (id, version) VALUES (0, 0);
+
+-- plots were cached per lookup day, they are now cached per data version. cached plots are disposable
+DROP TABLE IF EXISTS plot_cache;
+CREATE TABLE plot_cache
+(
+    data_version INTEGER,
+    end_date     TEXT,
+    full_title   TEXT,
+    html         TEXT,
+    start_date   TEXT,
+    timestamp    TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    UNIQUE (full_title, start_date, end_date, data_version)
+);
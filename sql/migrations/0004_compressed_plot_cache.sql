@@ -0,0 +1,14 @@
+-- plots are stored zlib compressed, with their compressed size and last access for size and age based eviction
+DROP TABLE IF EXISTS plot_cache;
+CREATE TABLE plot_cache
+(
+    data_version INTEGER,
+    end_date     TEXT,
+    full_title   TEXT,
+    html         BLOB,
+    last_access  TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    size         INTEGER,
+    start_date   TEXT,
+    timestamp    TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    UNIQUE (full_title, start_date, end_date, data_version)
+);
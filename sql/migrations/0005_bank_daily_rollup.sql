@@ -0,0 +1,36 @@
+-- bank amounts pre-aggregated per day and key, kept up to date by every write to the bank table.
+-- aggregate only reads scan (days x keys) rows rather than every transaction
+CREATE TABLE IF NOT EXISTS bank_daily
+(
+    account_id   TEXT,
+    amount_count INTEGER,
+    amount_max   REAL,
+    amount_min   REAL,
+    amount_sum   REAL,
+    c1           TEXT,
+    c2           TEXT,
+    date         TEXT,
+    inc_or_exp   TEXT
+);
+
+CREATE INDEX IF NOT EXISTS bank_daily_date_idx ON bank_daily (date);
+CREATE INDEX IF NOT EXISTS bank_daily_inc_or_exp_date_idx ON bank_daily (inc_or_exp, date);
+
+DELETE FROM bank_daily;
+INSERT INTO bank_daily (account_id, amount_count, amount_max, amount_min, amount_sum, c1, c2, date, inc_or_exp)
+SELECT account_id, COUNT(*), MAX(amount), MIN(amount), SUM(amount), c1, c2, date, inc_or_exp
+FROM bank
+GROUP BY date, account_id, inc_or_exp, c1, c2;
+
+CREATE VIEW IF NOT EXISTS bank_monthly AS
+SELECT account_id,
+       SUM(amount_count)  AS amount_count,
+       MAX(amount_max)    AS amount_max,
+       MIN(amount_min)    AS amount_min,
+       SUM(amount_sum)    AS amount_sum,
+       c1,
+       c2,
+       inc_or_exp,
+       SUBSTR(date, 1, 7) AS month
+FROM bank_daily
+GROUP BY month, account_id, inc_or_exp, c1, c2;
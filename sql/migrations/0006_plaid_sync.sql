@@ -0,0 +1,8 @@
+-- the last day that every transaction of a plaid item has been synced through, so the next sync only
+-- requests the days after it
+CREATE TABLE IF NOT EXISTS plaid_sync
+(
+    item_id   TEXT PRIMARY KEY,
+    synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    watermark TEXT
+);
@@ -0,0 +1,7 @@
+-- every linked plaid item (a login at one institution) and its access token, so all of them can be synced
+CREATE TABLE IF NOT EXISTS plaid_item
+(
+    access_token TEXT NOT NULL,
+    created_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    item_id      TEXT PRIMARY KEY
+);
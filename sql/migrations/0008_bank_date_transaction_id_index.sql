@@ -0,0 +1,4 @@
+-- the data table is paged by (date, transaction_id), so the position of a page is a range of this index. it
+-- serves every lookup of the date index it replaces
+CREATE INDEX IF NOT EXISTS bank_date_transaction_id_idx ON bank (date, transaction_id);
+DROP INDEX IF EXISTS bank_date_idx;
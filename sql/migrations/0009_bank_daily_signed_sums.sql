@@ -0,0 +1,38 @@
+-- the rollup also sums the positive and the negative amounts on their own, so that monthly income and expenses
+-- are split on the sign of the amounts (even after an amount is edited) rather than on inc_or_exp. nothing read
+-- the monthly view, so it is dropped
+DROP VIEW IF EXISTS bank_monthly;
+DROP TABLE IF EXISTS bank_daily;
+CREATE TABLE bank_daily
+(
+    account_id       TEXT,
+    amount_count     INTEGER,
+    amount_max       REAL,
+    amount_min       REAL,
+    amount_neg_sum   REAL,
+    amount_pos_sum   REAL,
+    amount_sum       REAL,
+    c1               TEXT,
+    c2               TEXT,
+    date             TEXT,
+    inc_or_exp       TEXT
+);
+
+CREATE INDEX IF NOT EXISTS bank_daily_date_idx ON bank_daily (date);
+CREATE INDEX IF NOT EXISTS bank_daily_inc_or_exp_date_idx ON bank_daily (inc_or_exp, date);
+
+INSERT INTO bank_daily (account_id, amount_count, amount_max, amount_min, amount_neg_sum, amount_pos_sum, amount_sum,
+                        c1, c2, date, inc_or_exp)
+SELECT account_id,
+       COUNT(*),
+       MAX(amount),
+       MIN(amount),
+       TOTAL(CASE WHEN amount <= 0 THEN amount END),
+       TOTAL(CASE WHEN amount > 0 THEN amount END),
+       SUM(amount),
+       c1,
+       c2,
+       date,
+       inc_or_exp
+FROM bank
+GROUP BY date, account_id, inc_or_exp, c1, c2;
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# note: the synthetic frames and the fake plaid client are shared with the benchmarks
+sys.path[:0] = [_ROOT, os.path.join(_ROOT, 'benchmarks')]
+
+from self_finance.back_end.sqlite_helper import SqliteHelper  # noqa: E402
+
+_SQL_DIR = os.path.join(_ROOT, 'sql')
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """
+    obj: path of a fresh database with its schema brought up to date
+    """
+    path = str(tmp_path / 'test.db')
+    SqliteHelper.execute_sqlite(os.path.join(_SQL_DIR, 'create_db.sql'), path)
+    SqliteHelper.migrate(os.path.join(_SQL_DIR, 'migrations'), path)
+    yield path
+    SqliteHelper.close_all()
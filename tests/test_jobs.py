@@ -0,0 +1,44 @@
+"""
+obj: jobs of the same key are coalesced while queued, and held back as a single follow-up while one runs
+"""
+import threading
+
+from self_finance.back_end.jobs import JobRunner
+
+_TIMEOUT = 10
+
+
+def _blocking(started, release, runs):
+    def func(job):
+        runs.append(job.id)
+        started.set()
+        release.wait(_TIMEOUT)
+        return len(runs)
+    return func
+
+
+def test_submits_while_running_queue_one_follow_up():
+    started, release, runs = threading.Event(), threading.Event(), []
+    func = _blocking(started, release, runs)
+    first = JobRunner.submit('first', func, key='test_follow_up')
+    assert started.wait(_TIMEOUT)
+    # the running job may have read its input already
+    follow_ups = [JobRunner.submit('follow up', func, key='test_follow_up') for _ in range(3)]
+    assert len({job.id for job in follow_ups}) == 1 and follow_ups[0] is not first
+    assert follow_ups[0].coalesced == 2 and not follow_ups[0].finished
+    release.set()
+    assert first.wait(_TIMEOUT) and follow_ups[0].wait(_TIMEOUT)
+    assert runs == [first.id, follow_ups[0].id]
+    assert (first.result, follow_ups[0].result) == (1, 2)
+
+
+def test_submits_while_queued_are_coalesced():
+    started, release, runs = threading.Event(), threading.Event(), []
+    # note: both workers are kept busy so that the keyed jobs stay queued
+    blockers = [JobRunner.submit(f'blocker {i}', _blocking(started, release, []), key=f'test_blocker_{i}')
+                for i in range(2)]
+    jobs = [JobRunner.submit('queued', lambda job: runs.append(job.id), key='test_queued') for _ in range(3)]
+    assert len({job.id for job in jobs}) == 1 and jobs[0].coalesced == 2
+    release.set()
+    assert all(job.wait(_TIMEOUT) for job in blockers + jobs[:1])
+    assert runs == [jobs[0].id]
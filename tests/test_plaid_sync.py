@@ -0,0 +1,85 @@
+"""
+obj: `PlaidSync` against `FakePlaidClient`, merging every item's transactions into a fresh database
+"""
+import datetime
+
+import pytest
+
+from fake_plaid import FakePlaidClient
+from fake_plaid import plaid_transactions
+from self_finance.back_end.data import Data
+from self_finance.back_end.data_version import DataVersion
+from self_finance.back_end.plaid_sync import PlaidSync
+from self_finance.constants import BankSchema
+from self_finance.constants import Plaid
+
+_TODAY = datetime.date.today()
+_YESTERDAY = _TODAY - datetime.timedelta(days=1)
+_N_DAYS = 90
+# transactions per access token, more than a page for the first
+_ROWS = {'token_0': Plaid.PAGE_SIZE + 200, 'token_1': 300}
+
+
+@pytest.fixture
+def client():
+    start = str(_TODAY - datetime.timedelta(days=_N_DAYS))
+    return FakePlaidClient({access_token: (f'item_{i}', plaid_transactions(n_rows, seed=i, start=start,
+                                                                          n_days=_N_DAYS))
+                            for i, (access_token, n_rows) in enumerate(_ROWS.items())}, latency=0)
+
+
+@pytest.fixture
+def linked_db_path(db_path, client):
+    for access_token, (item_id, _) in client.items.items():
+        PlaidSync.add_item(item_id, access_token, db_path)
+    return db_path
+
+
+def _n_bank_rows(db_path):
+    return Data.count_rows(None, BankSchema.BANK_TB_NAME, db_path=db_path)
+
+
+def test_sync_all_merges_every_item(linked_db_path, client):
+    summaries = PlaidSync.sync_all(client, db_path=linked_db_path)
+    assert [summary['item_id'] for summary in summaries] == ['item_0', 'item_1']
+    for summary, n_rows in zip(summaries, _ROWS.values()):
+        assert summary['transactions'] == n_rows, summary
+        assert summary['row_counts'][BankSchema.BANK_TB_NAME] == {'inserted': n_rows, 'updated': 0}, summary
+    assert _n_bank_rows(linked_db_path) == sum(_ROWS.values())
+
+
+def test_sync_merges_an_item_once(db_path, client):
+    version = DataVersion.get(db_path)
+    summary = PlaidSync.sync(client, 'token_0', db_path=db_path)
+    assert summary['pages'] == 2, summary
+    assert DataVersion.get(db_path) == version + 1
+
+
+def test_failing_item_does_not_stop_the_others(linked_db_path, client):
+    # the fake client does not know the access token of this item
+    PlaidSync.add_item('item_unknown', 'token_unknown', linked_db_path)
+    progress = []
+    summaries = PlaidSync.sync_all(client, db_path=linked_db_path,
+                                   progress=lambda done, total, item_id: progress.append((done, total)))
+    by_item = {summary['item_id']: summary for summary in summaries}
+    assert 'error' in by_item['item_unknown']
+    assert PlaidSync.get_watermark('item_unknown', linked_db_path) is None
+    assert [by_item[f'item_{i}']['transactions'] for i in range(len(_ROWS))] == list(_ROWS.values())
+    assert _n_bank_rows(linked_db_path) == sum(_ROWS.values())
+    assert progress[-1] == (3, 3)
+
+
+def test_watermark_advances(db_path, client):
+    assert PlaidSync.get_watermark('item_1', db_path) is None
+    end_date = _TODAY - datetime.timedelta(days=30)
+    PlaidSync.sync(client, 'token_1', end_date=end_date, db_path=db_path)
+    assert PlaidSync.get_watermark('item_1', db_path) == end_date
+
+    summary = PlaidSync.sync(client, 'token_1', db_path=db_path)
+    # the days before the watermark are synced over again, and updated in place
+    assert summary['start_date'] == end_date - datetime.timedelta(days=Plaid.SYNC_OVERLAP_DAYS - 1)
+    assert PlaidSync.get_watermark('item_1', db_path) == _YESTERDAY
+    assert _n_bank_rows(db_path) == _ROWS['token_1']
+
+    summary = PlaidSync.sync(client, 'token_1', end_date=_YESTERDAY, db_path=db_path)
+    assert summary['pages'] == 0, summary
@@ -0,0 +1,68 @@
+"""
+obj: `PlotWarmer` waits out the quiet period without a job worker, and gives its worker up between plots to the
+jobs of a higher priority
+"""
+import threading
+
+import pytest
+
+from synthetic import plaid_frame
+from self_finance.back_end.data import Data
+from self_finance.back_end.insights.image_registry import ImageRegistry
+from self_finance.back_end.insights.plot_warmer import PlotWarmer
+from self_finance.back_end.jobs import JobRunner
+from self_finance.constants import Jobs
+from self_finance.constants import Visuals
+
+_TIMEOUT = 10
+_PLOT_IDS = ['plot a', 'plot b', 'plot c']
+
+
+@pytest.fixture
+def drawn(db_path, monkeypatch):
+    """
+    obj: plots drawn (in order) by the warmer of a merged database, drawing only records the plot
+    """
+    Data.merge(plaid_frame(200), db_path)
+    drawn = []
+    cached = set()
+
+    def plot_all(plot_ids, *args, **kwargs):
+        missed = [plt_id for plt_id in plot_ids if plt_id not in cached]
+        drawn.extend(missed)
+        cached.update(missed)
+        return len(missed)
+
+    monkeypatch.setattr(Visuals, 'PLOT_WARM_QUIET_SECONDS', 0.2)
+    monkeypatch.setattr(PlotWarmer, 'ranges', staticmethod(lambda: [('2000-01-01', '2030-12-31', _PLOT_IDS)]))
+    monkeypatch.setattr(ImageRegistry, 'plot_all', staticmethod(plot_all))
+    return drawn
+
+
+def test_burst_of_changes_is_drawn_once_it_is_quiet(db_path, drawn):
+    for _ in range(3):
+        PlotWarmer.schedule(db_path)
+    # the quiet period holds no job, queued or running
+    assert JobRunner.get_by_key(PlotWarmer._key(db_path)) is None
+    PlotWarmer.wait_idle(db_path)
+    assert drawn == _PLOT_IDS
+
+
+def test_yields_to_a_job_of_a_higher_priority(db_path, drawn, monkeypatch):
+    release = threading.Event()
+    # note: one worker is kept busy, so that the urgent job is queued rather than run by the other worker
+    blocker = JobRunner.submit('blocker', lambda job: release.wait(_TIMEOUT))
+    draw = ImageRegistry.plot_all
+    urgent = []
+
+    def plot_all(plot_ids, *args, **kwargs):
+        if not urgent:
+            urgent.append(JobRunner.submit('urgent', lambda job: drawn.append('urgent'), priority=Jobs.PRIORITY))
+        return draw(plot_ids, *args, **kwargs)
+
+    monkeypatch.setattr(ImageRegistry, 'plot_all', staticmethod(plot_all))
+    PlotWarmer.schedule(db_path)
+    PlotWarmer.wait_idle(db_path)
+    release.set()
+    assert blocker.wait(_TIMEOUT) and urgent[0].wait(_TIMEOUT)
+    assert drawn == ['plot a', 'urgent', 'plot b', 'plot c']
@@ -0,0 +1,51 @@
+"""
+obj: the date filtered queries on the bank table are served by its indexes. a full table scan, a temporary
+b-tree to sort, or a range filter that is not answered by an index SEARCH is a regression
+"""
+import datetime
+
+import pytest
+
+from synthetic import plaid_frame
+from self_finance.back_end.data import Data
+from self_finance.back_end.date_range import DateRange
+from self_finance.back_end.query import Query
+from self_finance.back_end.sqlite_helper import SqliteHelper
+from self_finance.constants import BankSchema
+
+_DATE_RANGE = DateRange(datetime.date(2017, 1, 1), datetime.date(2017, 6, 1))
+_BOUNDS = (str(_DATE_RANGE.start), str(_DATE_RANGE.end))
+_BANK, _DATE = BankSchema.BANK_TB_NAME, BankSchema.SCHEMA_BANK_DATE.name
+
+# name: (query, params, whether the plan must SEARCH an index)
+_PLANNED_QUERIES = {
+    'get_table_as_df': Data._table_query(_DATE_RANGE, _BANK) + (True,),
+    'get_most_recent_transaction_date': (Data._most_recent_transaction_date_query(_BANK), (), False),
+    'inc_or_exp by date': (Query.select(_BANK, equals=(BankSchema.SCHEMA_BANK_INC_OR_EXP.name,), between=_DATE),
+                           ('expense',) + _BOUNDS, True),
+    'c1 by date': (Query.select(_BANK, equals=(BankSchema.SCHEMA_BANK_C1.name,), between=_DATE),
+                   ('Travel',) + _BOUNDS, True),
+    'get_heatmap_arrays': (Data._heatmap_query(), _BOUNDS, True),
+    'get_table_page after a row': (Query.page(_BANK, _DATE, BankSchema.SCHEMA_BANK_TRANSACTION_ID.name, 'DESC',
+                                              between=_DATE, after='value', limit=100),
+                                   _BOUNDS + ('2017-03-01',) * 3 + ('id',), True),
+}
+
+
+@pytest.fixture
+def analyzed_db_path(db_path):
+    Data.merge(plaid_frame(5000), db_path)
+    SqliteHelper.query('ANALYZE', db_path)
+    return db_path
+
+
+@pytest.mark.parametrize('name', sorted(_PLANNED_QUERIES))
+def test_query_plan_uses_index(analyzed_db_path, name):
+    query, params, must_search = _PLANNED_QUERIES[name]
+    plan = SqliteHelper.explain_query_plan(query, analyzed_db_path, params)
+    # e.g. `SCAN bank` or `SCAN TABLE bank` (older sqlite), as opposed to `SCAN bank USING INDEX ...`
+    assert not [detail for detail in plan if detail.startswith('SCAN') and 'USING' not in detail], plan
+    assert not [detail for detail in plan if 'TEMP B-TREE' in detail], plan
+    # walking a whole index in order is still a full scan when the query is meant to filter a range
+    if must_search:
+        assert any(detail.startswith('SEARCH') for detail in plan), plan
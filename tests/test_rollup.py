@@ -0,0 +1,97 @@
+"""
+obj: the `bank_daily` rollup is kept equal to a fresh aggregate of the bank table through every write to it
+"""
+import pytest
+
+from config.files import files
+from synthetic import plaid_frame
+from self_finance.back_end.data import Data
+from self_finance.back_end.date_range import DateRange
+from self_finance.back_end.insights.raw_insights import RawInsights
+from self_finance.back_end.sqlite_helper import SqliteHelper
+from self_finance.constants import BankSchema
+
+_N_ROWS = 2000
+_ALL_DATES = DateRange('2000-01-01', '2030-12-31')
+_AGGREGATE = "SELECT date, account_id, inc_or_exp, c1, c2, COUNT(*), MAX(amount), MIN(amount), " \
+    "TOTAL(CASE WHEN amount <= 0 THEN amount END), TOTAL(CASE WHEN amount > 0 THEN amount END), SUM(amount) " \
+    "FROM bank GROUP BY date, account_id, inc_or_exp, c1, c2"
+_ROLLUP = "SELECT date, account_id, inc_or_exp, c1, c2, amount_count, amount_max, amount_min, amount_neg_sum, " \
+    "amount_pos_sum, amount_sum FROM bank_daily"
+
+
+def _rows(query, db_path):
+    return sorted(SqliteHelper.query(query, db_path), key=repr)
+
+
+def _assert_rollup_is_fresh(db_path):
+    expected = _rows(_AGGREGATE, db_path)
+    assert expected
+    assert _rows(_ROLLUP, db_path) == expected
+
+
+@pytest.fixture
+def merged_db_path(db_path):
+    Data.merge(plaid_frame(_N_ROWS), db_path)
+    return db_path
+
+
+@pytest.fixture
+def base_db_path(merged_db_path, monkeypatch):
+    # note: some writes only ever go to the application database
+    monkeypatch.setitem(files, 'base_db', merged_db_path)
+    return merged_db_path
+
+
+def _transaction_ids(db_path, n):
+    return [row[0] for row in SqliteHelper.query(f"SELECT transaction_id FROM bank ORDER BY rowid LIMIT {n}",
+                                                 db_path)]
+
+
+def test_merge(merged_db_path):
+    _assert_rollup_is_fresh(merged_db_path)
+
+
+def test_remerge_moves_and_changes_rows(merged_db_path):
+    frame = plaid_frame(_N_ROWS).iloc[:300].copy()
+    # the merged rows move to other days, and half of them change sign
+    frame[BankSchema.SCHEMA_FULL_DATE.name] = '2019-12-31'
+    frame.loc[frame.index[::2], BankSchema.SCHEMA_FULL_AMOUNT.name] *= -1
+    Data.merge(frame, merged_db_path)
+    assert SqliteHelper.query("SELECT COUNT(*) FROM bank", merged_db_path)[0][0] == _N_ROWS
+    _assert_rollup_is_fresh(merged_db_path)
+
+
+def test_update_cells_of_amounts_and_dates(merged_db_path):
+    ids = _transaction_ids(merged_db_path, 50)
+    changes = [{'transaction_id': id_, 'amount': 1000. + i, 'date': '2018-01-15' if i % 2 else None}
+               for i, id_ in enumerate(ids)]
+    Data.update_cells([{k: v for k, v in change.items() if v is not None} for change in changes], merged_db_path)
+    _assert_rollup_is_fresh(merged_db_path)
+
+
+def test_monthly_sums_split_on_the_sign_of_the_edited_amounts(merged_db_path):
+    # note: the edit leaves inc_or_exp as it was
+    ids = _transaction_ids(merged_db_path, 100)
+    Data.update_cells([{'transaction_id': id_, 'amount': -500.} for id_ in ids], merged_db_path)
+    expected = SqliteHelper.query("SELECT SUBSTR(date, 1, 7) AS month, TOTAL(CASE WHEN amount > 0 THEN amount END), "
+                                  "TOTAL(CASE WHEN amount <= 0 THEN amount END) FROM bank "
+                                  "WHERE date IS NOT NULL GROUP BY month ORDER BY month", merged_db_path)
+    summary_df = RawInsights.Static.monthly_summary(_ALL_DATES, merged_db_path)
+    assert [f'{year}-{month:02d}' for year, month in summary_df.index] == [row[0] for row in expected]
+    assert list(summary_df['income']) == pytest.approx([row[1] for row in expected])
+    assert list(summary_df['expenses']) == pytest.approx([row[2] for row in expected])
+
+
+@pytest.mark.parametrize('cat_ids', [('transaction_id',), ('transaction_id', 'date')])
+def test_update_missing_categories(base_db_path, cat_ids):
+    rows = SqliteHelper.query("SELECT transaction_id, date FROM bank ORDER BY rowid LIMIT 40", base_db_path)
+    filled = [{'transaction_id': id_, 'date': date, 'c1': 'Filled', 'c2': 'In'} for id_, date in rows]
+    Data.update_missing_categories(filled, list(cat_ids), ['c1', 'c2'])
+    assert SqliteHelper.query("SELECT COUNT(*) FROM bank_daily WHERE c1='Filled'", base_db_path)[0][0] > 0
+    _assert_rollup_is_fresh(base_db_path)
+
+
+def test_truncate(base_db_path):
+    Data.truncate_all_tables()
+    assert SqliteHelper.query("SELECT COUNT(*) FROM bank_daily", base_db_path)[0][0] == 0
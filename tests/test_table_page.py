@@ -0,0 +1,66 @@
+"""
+obj: walking `Data.get_table_page` from the first to the last page returns every row once, in the order of a plain
+ORDER BY, including null and duplicate values of the ordered column
+"""
+import pytest
+
+from synthetic import plaid_frame
+from self_finance.back_end.data import Data
+from self_finance.back_end.date_range import DateRange
+from self_finance.back_end.sqlite_helper import SqliteHelper
+from self_finance.constants import BankSchema
+
+_BANK = BankSchema.BANK_TB_NAME
+_DATE_RANGE = DateRange('2016-01-01', '2017-06-30')
+
+
+@pytest.fixture
+def paged_db_path(db_path):
+    Data.merge(plaid_frame(3000), db_path)
+    # null and (many) duplicate values of the ordered columns
+    SqliteHelper.query("UPDATE bank SET date=NULL WHERE rowid % 37 = 0", db_path)
+    SqliteHelper.query("UPDATE bank SET amount=NULL WHERE rowid % 23 = 0", db_path)
+    SqliteHelper.query("UPDATE bank SET amount=ROUND(amount / 100) * 100 WHERE amount IS NOT NULL", db_path)
+    return db_path
+
+
+def _walk(db_path, date_range, order_by, order, page_size):
+    rows, after, n_pages = [], None, 0
+    while True:
+        page = Data.get_table_page(date_range, _BANK, order_by, order, after, page_size, db_path)
+        key = page['columns'].index(BankSchema.SCHEMA_BANK_TRANSACTION_ID.name)
+        rows += [row[key] for row in page['rows']]
+        n_pages += 1
+        after = page['after']
+        if after is None:
+            return rows, n_pages
+
+
+@pytest.mark.parametrize('date_range', [_DATE_RANGE, None], ids=['date range', 'whole table'])
+@pytest.mark.parametrize('order', ['ASC', 'DESC'])
+@pytest.mark.parametrize('order_by', [BankSchema.SCHEMA_BANK_DATE.name, BankSchema.SCHEMA_BANK_AMOUNT.name])
+def test_pages_follow_order_by(paged_db_path, date_range, order, order_by):
+    where = f" WHERE date BETWEEN '{date_range.start}' AND '{date_range.end}'" if date_range else ''
+    expected = [row[0] for row in SqliteHelper.query(
+        f"SELECT transaction_id FROM {_BANK}{where} ORDER BY {order_by} {order}, transaction_id {order}",
+        paged_db_path)]
+    rows, n_pages = _walk(paged_db_path, date_range, order_by, order, page_size=97)
+    assert rows == expected
+    assert n_pages == len(expected) // 97 + 1
+
+
+def test_date_range_is_narrowed_to_the_position(paged_db_path):
+    # note: the position of a page ordered by date narrows the dates of the range itself
+    first = Data.get_table_page(_DATE_RANGE, _BANK, BankSchema.SCHEMA_BANK_DATE.name, 'DESC', None, 10,
+                                paged_db_path)
+    after = first['after']
+    second = Data.get_table_page(_DATE_RANGE, _BANK, BankSchema.SCHEMA_BANK_DATE.name, 'DESC', after, 10,
+                                 paged_db_path)
+    date = second['columns'].index(BankSchema.SCHEMA_BANK_DATE.name)
+    assert all(_DATE_RANGE.start.isoformat() <= row[date] <= after[0] for row in second['rows'])
+    assert len(second['rows']) == 10
+
+
+def test_last_page_of_an_empty_range(paged_db_path):
+    page = Data.get_table_page(DateRange('1990-01-01', '1990-12-31'), _BANK, db_path=paged_db_path)
+    assert page['rows'] == [] and page['after'] is None
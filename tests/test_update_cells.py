@@ -0,0 +1,81 @@
+"""
+obj: `Data.update_cells` applies every edit or none of them, and carries forward only the cached plots whose date
+range none of the edited transactions fall on
+"""
+import pytest
+
+from synthetic import plaid_frame
+from self_finance.back_end.data import Data
+from self_finance.back_end.data_version import DataVersion
+from self_finance.back_end.plot_cache import PlotCache
+from self_finance.back_end.sqlite_helper import SqliteHelper
+
+_OLD_DAY, _NEW_DAY = '2016-03-10', '2018-07-20'
+
+
+@pytest.fixture
+def merged_db_path(db_path):
+    Data.merge(plaid_frame(500), db_path)
+    return db_path
+
+
+def _rows(db_path, n):
+    return SqliteHelper.query(f"SELECT transaction_id, date, amount, c1 FROM bank ORDER BY rowid LIMIT {n}", db_path)
+
+
+def _snapshot(db_path):
+    return SqliteHelper.query("SELECT * FROM bank ORDER BY rowid", db_path), DataVersion.get(db_path)
+
+
+@pytest.mark.parametrize('bad_change', [
+    {'date': 'not a date'},
+    {'no_such_column': 1},
+], ids=['unparseable date', 'unknown column'])
+def test_invalid_edits_are_rejected(merged_db_path, bad_change):
+    ids = [row[0] for row in _rows(merged_db_path, 3)]
+    before = _snapshot(merged_db_path)
+    changes = [{'transaction_id': ids[0], 'amount': 1.}, {'transaction_id': ids[1], 'c1': 'Edited'},
+               dict(bad_change, transaction_id=ids[2])]
+    with pytest.raises(ValueError):
+        Data.update_cells(changes, merged_db_path)
+    assert _snapshot(merged_db_path) == before
+
+
+def test_unknown_transaction_rolls_back(merged_db_path):
+    ids = [row[0] for row in _rows(merged_db_path, 2)]
+    before = _snapshot(merged_db_path)
+    # note: the known rows are updated by the same statement, before the unknown row is found out
+    changes = [{'transaction_id': ids[0], 'amount': 1.}, {'transaction_id': 'no_such_id', 'amount': 2.},
+               {'transaction_id': ids[1], 'amount': 3.}]
+    with pytest.raises(ValueError):
+        Data.update_cells(changes, merged_db_path)
+    assert _snapshot(merged_db_path) == before
+
+
+def test_valid_edit(merged_db_path):
+    (id_0, _, _, c1_0), (id_1, _, amount_1, _) = _rows(merged_db_path, 2)
+    version = DataVersion.get(merged_db_path)
+    changes = [{'transaction_id': id_0, 'date': 'July 20, 2018', 'amount': '12.5'},
+               {'transaction_id': id_1, 'c1': 'Edited'}]
+    assert Data.update_cells(changes, merged_db_path) == 2
+    (_, date_0, amount_0, c1), (_, _, amount, c1_1) = _rows(merged_db_path, 2)
+    assert (date_0, amount_0, c1, amount, c1_1) == (_NEW_DAY, 12.5, c1_0, amount_1, 'Edited')
+    assert DataVersion.get(merged_db_path) == version + 1
+
+
+def test_carry_forward_keeps_the_plots_away_from_the_edited_days(merged_db_path):
+    id_ = _rows(merged_db_path, 1)[0][0]
+    Data.update_cells([{'transaction_id': id_, 'date': _OLD_DAY}], merged_db_path)
+    version = DataVersion.get(merged_db_path)
+    ranges = {'old day': ('2016-01-01', '2016-12-31'), 'new day': ('2018-07-20', '2018-07-20'),
+              'neither day': ('2017-01-01', '2018-07-19')}
+    for title, (start, end) in ranges.items():
+        PlotCache.add_cache_miss(title, start, end, version, f'<div>{title}</div>', merged_db_path)
+
+    # the transaction moves away from the old day, onto the new day
+    Data.update_cells([{'transaction_id': id_, 'date': _NEW_DAY}], merged_db_path)
+    PlotCache.invalidate_memory()
+    version = DataVersion.get(merged_db_path)
+    hits = {title for title, (start, end) in ranges.items()
+            if PlotCache.hit(title, start, end, version, merged_db_path) is not None}
+    assert hits == {'neither day'}